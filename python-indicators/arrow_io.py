@@ -0,0 +1,252 @@
+"""
+Apache Arrow / Parquet 入出力
+ローソク足の列をnumpy配列として (可能な限りコピーせずに) 読み込み、
+インジケーター結果をArrow IPC / Parquetとして書き出す
+
+pyarrowはオプション依存 (未インストール時は PYARROW_AVAILABLE が False)
+"""
+
+import os
+import tempfile
+import numpy as np
+from typing import Dict, Any, List
+from results import IndicatorResult
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+CANDLE_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+FORMATS = ('arrow', 'parquet')
+
+# timestamp型のtime列を秒に変換するための除数
+_TIMESTAMP_DIVISORS = {'s': 1, 'ms': 1_000, 'us': 1_000_000, 'ns': 1_000_000_000}
+
+
+def _require_pyarrow() -> None:
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required for Arrow/Parquet support (pip install pyarrow)")
+
+
+def resolve_data_path(path: str) -> str:
+    """
+    ファイルパスを INDICATOR_DATA_DIR 配下に制限して解決する
+    (リクエストから任意のファイルを読み書きさせないため)
+
+    Args:
+        path: INDICATOR_DATA_DIR からの相対パス
+
+    Returns:
+        絶対パス
+    """
+    data_dir = os.environ.get('INDICATOR_DATA_DIR')
+    if not data_dir:
+        raise ValueError("File sources are disabled (set INDICATOR_DATA_DIR)")
+
+    root = os.path.realpath(data_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path is outside INDICATOR_DATA_DIR: {path}")
+    return resolved
+
+
+def _column_to_numpy(column: 'pa.ChunkedArray', name: str) -> np.ndarray:
+    """Arrow列をnumpy配列に変換 (単一チャンクでnullがなければゼロコピー)"""
+    array = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+
+    if name == 'time':
+        if pa.types.is_timestamp(array.type):
+            raw = array.cast(pa.int64()).to_numpy(zero_copy_only=False)
+            return raw // _TIMESTAMP_DIVISORS[array.type.unit]
+        if array.null_count == 0 and array.type == pa.int64():
+            return array.to_numpy(zero_copy_only=True)
+        return array.to_numpy(zero_copy_only=False).astype(np.float64)
+
+    if array.null_count == 0 and array.type == pa.float64():
+        return array.to_numpy(zero_copy_only=True)
+    # nullはNaNになり、サニタイズで処理される
+    return array.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def table_to_columns(table: 'pa.Table') -> Dict[str, np.ndarray]:
+    """
+    ArrowテーブルをCandleDataの列に変換 (存在しない列は0)
+
+    Args:
+        table: time, open, high, low, close, volume 列を持つテーブル
+
+    Returns:
+        列名 -> numpy配列
+    """
+    if 'time' not in table.column_names:
+        raise ValueError("time column is required")
+
+    columns = {}
+    for name in CANDLE_COLUMNS:
+        if name in table.column_names:
+            columns[name] = _column_to_numpy(table.column(name), name)
+        else:
+            columns[name] = np.zeros(table.num_rows)
+    return columns
+
+
+def read_arrow(path: str) -> Dict[str, np.ndarray]:
+    """Arrow IPCファイルをメモリマップで読み込む"""
+    _require_pyarrow()
+    # ゼロコピーの配列がマップを参照し続けるため、ここでは閉じない
+    source = pa.memory_map(path, 'r')
+    return table_to_columns(pa.ipc.open_file(source).read_all())
+
+
+def read_parquet(path: str) -> Dict[str, np.ndarray]:
+    """Parquetファイルから必要な列だけを読み込む"""
+    _require_pyarrow()
+    schema = pq.read_schema(path)
+    names = [name for name in CANDLE_COLUMNS if name in schema.names]
+    return table_to_columns(pq.read_table(path, columns=names, memory_map=True))
+
+
+def read_candle_source(source: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    リクエストの candleSource からローソク足の列を読み込む
+
+    Args:
+        source: {'format': 'arrow' | 'parquet', 'path': INDICATOR_DATA_DIRからの相対パス}
+
+    Returns:
+        列名 -> numpy配列
+    """
+    if not isinstance(source, dict):
+        raise ValueError("candleSource must be an object")
+
+    file_format = source.get('format')
+    path = resolve_data_path(source.get('path', ''))
+
+    if file_format == 'arrow':
+        return read_arrow(path)
+    if file_format == 'parquet':
+        return read_parquet(path)
+    raise ValueError(f"candleSource.format must be one of {', '.join(FORMATS)}")
+
+
+def result_to_table(result: Dict[str, Any]) -> 'pa.Table':
+    """
+    インジケーター結果をArrowテーブルに変換
+    全系列のtimeの和集合を行とし、値のない位置はnull
+
+    Args:
+        result: インジケーター結果辞書 ('values' または 'lines') または IndicatorResult
+
+    Returns:
+        time列と系列ごとの列を持つテーブル
+    """
+    _require_pyarrow()
+
+    # (列名, time配列, 値の配列)
+    series: List[tuple] = []
+    if isinstance(result, IndicatorResult):
+        # 配列ベースの結果は辞書に変換せずに列を作る
+        if result.values is not None:
+            series.append((result.metadata.get('indicator', 'value'), result.values.times, result.values.values))
+        for line in result.lines:
+            series.append((line.name.lower(), line.series.times, line.series.values))
+        series = [(name, times[~np.isnan(values)], values[~np.isnan(values)]) for name, times, values in series]
+    else:
+        if isinstance(result.get('values'), list):
+            series.append((result.get('metadata', {}).get('indicator', 'value'), result['values']))
+        for line in result.get('lines', []):
+            series.append((line['name'].lower(), line['values']))
+        series = [
+            (
+                name,
+                np.fromiter((point['time'] for point in values), dtype=np.int64, count=len(values)),
+                np.fromiter((point['value'] for point in values), dtype=np.float64, count=len(values))
+            )
+            for name, values in series
+        ]
+
+    times = np.unique(np.concatenate([
+        series_times for _, series_times, _ in series
+    ])) if series else np.empty(0, dtype=np.int64)
+
+    arrays = {'time': pa.array(times, type=pa.int64())}
+    for name, series_times, values in series:
+        column = np.full(len(times), np.nan)
+        column[np.searchsorted(times, series_times)] = values
+        arrays[name] = pa.array(column, mask=np.isnan(column))
+
+    return pa.table(arrays)
+
+
+def write_result(result: Dict[str, Any], sink: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    リクエストの resultSink に従って結果をファイルに書き出す
+
+    Args:
+        result: インジケーター結果辞書
+        sink: {'format': 'arrow' | 'parquet', 'path': INDICATOR_DATA_DIRからの相対パス,
+               'compression': Parquetの圧縮方式 (省略時 'zstd')}
+
+    Returns:
+        書き出したファイルの情報
+    """
+    if not isinstance(sink, dict):
+        raise ValueError("resultSink must be an object")
+
+    file_format = sink.get('format')
+    if file_format not in FORMATS:
+        raise ValueError(f"resultSink.format must be one of {', '.join(FORMATS)}")
+
+    path = resolve_data_path(sink.get('path', ''))
+    table = result_to_table(result)
+
+    # 書き込み途中のファイルを読まれないよう、一時ファイルから置き換える
+    # (一時ファイル名は一意なので、同じ出力先に複数スレッドが書いても衝突しない)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    os.close(fd)
+    try:
+        if file_format == 'arrow':
+            with pa.OSFile(temp_path, 'wb') as output:
+                with pa.ipc.new_file(output, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            pq.write_table(table, temp_path, compression=sink.get('compression', 'zstd'))
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    return {
+        'format': file_format,
+        'path': sink.get('path'),
+        'rows': table.num_rows,
+        'columns': table.column_names
+    }
+
+
+def write_columns(columns: Dict[str, np.ndarray], path: str, file_format: str = 'parquet') -> None:
+    """
+    列 (ローソク足など) をそのままArrow IPC / Parquetに書き出す
+
+    Args:
+        columns: 列名 -> numpy配列
+        path: 出力パス
+        file_format: 'arrow' または 'parquet'
+    """
+    _require_pyarrow()
+    table = pa.table({name: pa.array(values) for name, values in columns.items()})
+
+    if file_format == 'arrow':
+        with pa.OSFile(path, 'wb') as output:
+            with pa.ipc.new_file(output, table.schema) as writer:
+                writer.write_table(table)
+    elif file_format == 'parquet':
+        pq.write_table(table, path)
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+バックエンドのキャリブレーション
+各関数・各入力サイズでバックエンド (TA-Lib / numba / numpy) の実行時間を計測し、
+最速のものを TALibWrapper が読むプロファイル (JSON) に保存する
+
+使い方:
+    python backend_calibration.py                      # 計測して保存
+    python backend_calibration.py --sizes 1000 100000  # サイズクラスを指定
+    python backend_calibration.py --dry-run            # 保存せずに表示
+
+プロファイルの形式:
+    {
+        "sizes": [1000, 100000, 1000000],
+        "functions": {"SMA": {"1000": "talib", ...}, ...},
+        "measurements": {"SMA": {"1000": {"talib": 秒, ...}, ...}, ...}
+    }
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import numpy as np
+from typing import Any, Callable, Dict, List, Tuple
+
+import talib_wrapper
+from talib_wrapper import available_backends, call_backend
+
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+# 関数ごとのベンチマーク引数 (TALibWrapper のデフォルト値に近い設定)
+BENCHMARK_ARGS: Dict[str, Callable[[Dict[str, np.ndarray]], Tuple]] = {
+    'SMA': lambda c: (c['close'], 20),
+    'EMA': lambda c: (c['close'], 20),
+    'BBANDS': lambda c: (c['close'], 20, 2.0, 2.0, 0),
+    'RSI': lambda c: (c['close'], 14),
+    'MACD': lambda c: (c['close'], 12, 26, 9),
+    'STOCH': lambda c: (c['high'], c['low'], c['close'], 14, 3, 0, 3, 0),
+    'ATR': lambda c: (c['high'], c['low'], c['close'], 14),
+}
+
+
+def synthetic_candles(size: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """ランダムウォークのローソク足 (計測用)"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, size))
+    spread = np.abs(rng.normal(0, 0.5, size))
+    return {
+        'high': close + spread,
+        'low': close - spread,
+        'close': close
+    }
+
+
+def measure(fn: Callable, args: Tuple, repeat: int) -> float:
+    """repeat回実行して最短時間 (秒) を返す"""
+    # 初回はJITコンパイル等を含むので計測しない
+    fn(*args)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _outputs(result) -> Tuple:
+    return result if isinstance(result, tuple) else (result,)
+
+
+def equivalent_backends(function: str, args: Tuple) -> List[str]:
+    """
+    デフォルトのバックエンドと同じ結果を返すバックエンド
+    (初期値など計算方法の異なる実装には切り替えない)
+    """
+    backends = available_backends(function)
+    reference = _outputs(call_backend(function, backends[0], *args))
+
+    equivalent = [backends[0]]
+    for backend in backends[1:]:
+        outputs = _outputs(call_backend(function, backend, *args))
+        if len(outputs) == len(reference) and all(
+            np.allclose(output, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+            for output, expected in zip(outputs, reference)
+        ):
+            equivalent.append(backend)
+    return equivalent
+
+
+def calibrate(sizes: List[int], repeat: int = 5, functions: List[str] = None) -> Dict[str, Any]:
+    """
+    全関数・全サイズでバックエンドを計測
+
+    Args:
+        sizes: 入力サイズクラス
+        repeat: 計測回数 (最短時間を採用)
+        functions: 対象の関数名 (省略時は全関数)
+
+    Returns:
+        プロファイル辞書
+    """
+    functions = functions or list(BENCHMARK_ARGS)
+    profile: Dict[str, Any] = {
+        'sizes': sizes,
+        'functions': {},
+        'measurements': {},
+        'host': platform.node(),
+        'created': int(time.time())
+    }
+
+    # 結果が一致するかは小さい入力で確認する
+    sample = synthetic_candles(min(sizes[0], 5_000), seed=1)
+    candidates = {
+        function: equivalent_backends(function, BENCHMARK_ARGS[function](sample))
+        for function in functions
+    }
+
+    for size in sizes:
+        candles = synthetic_candles(size)
+        for function in functions:
+            args = BENCHMARK_ARGS[function](candles)
+            timings = {
+                backend: measure(lambda *a: call_backend(function, backend, *a), args, repeat)
+                for backend in candidates[function]
+            }
+            profile['measurements'].setdefault(function, {})[str(size)] = timings
+            profile['functions'].setdefault(function, {})[str(size)] = min(timings, key=timings.get)
+
+    return profile
+
+
+def save_profile(profile: Dict[str, Any], path: str) -> None:
+    """プロファイルを書き出す (一時ファイルから置き換え)"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark indicator backends and persist the fastest per size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--functions', nargs='+', choices=list(BENCHMARK_ARGS))
+    parser.add_argument('--output', default=None, help='profile path (default: INDICATOR_BACKEND_PROFILE or ~/.cache/aiblack)')
+    parser.add_argument('--dry-run', action='store_true', help='print the profile without saving it')
+    args = parser.parse_args()
+
+    profile = calibrate(sorted(args.sizes), args.repeat, args.functions)
+
+    for function, choices in profile['functions'].items():
+        summary = ', '.join(f"{size}: {backend}" for size, backend in choices.items())
+        print(f"{function:7s} {summary}", file=sys.stderr)
+
+    if args.dry_run:
+        print(json.dumps(profile, indent=2))
+        return
+
+    path = args.output or talib_wrapper.profile_path()
+    save_profile(profile, path)
+    print(f"Saved backend profile to {path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,524 @@
+"""
+ベクトル化バックテスト
+standard/ のインジケーターの出力とエントリー・エグジット条件から、ポジション・損益・
+ドローダウン・トレード一覧を計算する。パラメータと閾値のグリッド (全組み合わせ) と
+複数銘柄を1リクエストで評価する
+
+- インジケーターは別名 × パラメータの組み合わせごとに一度だけ計算する
+- 条件判定・ポジション・損益は (組み合わせ × 足) の2次元配列で、組み合わせをチャンクに
+  分けて一括計算する (Pythonのループは銘柄とチャンクだけ)
+- トレード一覧は上位の組み合わせだけ再計算して返す
+
+リクエスト例 ({'_mode': 'backtest'} で IndicatorRuntime に送る):
+    {
+        '_mode': 'backtest',
+        'symbols': [{'symbol': 'AAPL', 'candleData': [...]}, ...],   # または 'candleData' で1銘柄
+        'indicators': {
+            'rsi': {'name': 'rsi', 'params': {'period': [7, 14, 21]}},
+            'fast': {'name': 'sma', 'params': {'period': [10, 20]}},
+            'slow': {'name': 'sma', 'params': {'period': [50, 100]}}
+        },
+        'entry': [{'left': 'rsi', 'op': 'crossBelow', 'right': [20, 25, 30]}],
+        'exit': [{'left': 'fast', 'op': 'crossBelow', 'right': 'slow'}],
+        'side': 'long',          # 'long' または 'short'
+        'fee': 0.0005,           # 片道の手数料 (約定額に対する割合)
+        'rankBy': 'sharpe',      # 並べ替える指標
+        'top': 10,               # 返す組み合わせ数 (トレード一覧付き)
+        'includeAll': false      # 全組み合わせの指標を列形式で返す
+    }
+
+パラメータの値を配列にするとその値すべてを、条件の 'right' を数値の配列にすると
+その閾値すべてを試す。'left' / 'right' の系列は 'close' 等の価格列、単一系列の
+インジケーターの別名 ('rsi')、複数系列の別名と系列名 ('macd.Signal') で指定する。
+
+条件はすべて満たした足の終値で約定し、次の足から損益に反映する。エントリーと
+エグジットが同じ足で成立した場合はエグジットを優先する。
+"""
+
+import time
+import itertools
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from indicator_interface import IndicatorBase, CandleColumns
+from results import IndicatorResult
+from thread_pool import parallel_map
+from scheduler import checkpoint
+from request_limits import check_output_points
+
+
+OPERATORS = ('lt', 'le', 'gt', 'ge', 'crossAbove', 'crossBelow')
+SIDES = ('long', 'short')
+RANK_METRICS = ('totalReturn', 'sharpe', 'maxDrawdown', 'winRate', 'trades', 'exposure')
+PRICE_SERIES = ('open', 'high', 'low', 'close', 'volume')
+# 1チャンクの (組み合わせ × 足) の要素数の上限
+CHUNK_ELEMENTS = 4_000_000
+MAX_COMBINATIONS = 1_000_000
+DEFAULT_TOP = 10
+YEAR_SECONDS = 365 * 24 * 60 * 60
+
+
+class _Axis:
+    """グリッドの1軸 (インジケーターのパラメータまたは条件の閾値)"""
+
+    __slots__ = ('label', 'values')
+
+    def __init__(self, label: str, values: List[Any]):
+        self.label = label
+        self.values = values
+
+
+class _Operand:
+    """
+    条件の片側
+    values: (変種 × 足) または (変種 × 1) の配列、axes: 変種を決める軸の番号
+    """
+
+    __slots__ = ('values', 'axes')
+
+    def __init__(self, values: np.ndarray, axes: List[int]):
+        self.values = values
+        self.axes = axes
+
+    def gather(self, axis_index: np.ndarray, sizes: List[int], chunk: slice) -> np.ndarray:
+        """組み合わせのチャンクに対応する行 (チャンク × 足 または チャンク × 1)"""
+        if not self.axes:
+            return self.values[:1]
+        rows = np.ravel_multi_index(
+            tuple(axis_index[axis][chunk] for axis in self.axes),
+            tuple(sizes[axis] for axis in self.axes)
+        )
+        return self.values[rows]
+
+
+class Backtest:
+    """1リクエスト分のグリッドと条件"""
+
+    def __init__(self, request: Dict[str, Any], indicators: Dict[str, IndicatorBase]):
+        self.request = request
+        self.indicators = indicators
+
+        self.side = request.get('side', 'long')
+        if self.side not in SIDES:
+            raise ValueError(f"side must be one of {', '.join(SIDES)}")
+
+        self.fee = request.get('fee', 0.0)
+        if isinstance(self.fee, bool) or not isinstance(self.fee, (int, float)) or not 0 <= self.fee < 1:
+            raise ValueError("fee must be a number in [0, 1)")
+
+        self.rank_by = request.get('rankBy', 'sharpe')
+        if self.rank_by not in RANK_METRICS:
+            raise ValueError(f"rankBy must be one of {', '.join(RANK_METRICS)}")
+
+        self.top = request.get('top', DEFAULT_TOP)
+        if isinstance(self.top, bool) or not isinstance(self.top, int) or self.top < 0:
+            raise ValueError("top must be a non-negative integer")
+
+        self.axes: List[_Axis] = []
+        # 別名 -> (インジケーター, 固定パラメータ, [(パラメータ名, 軸の番号)])
+        self.aliases: Dict[str, Tuple[IndicatorBase, Dict[str, Any], List[Tuple[str, int]]]] = {}
+        self._parse_indicators(request.get('indicators') or {})
+
+        self.entry = self._parse_conditions(request.get('entry'), 'entry')
+        self.exit = self._parse_conditions(request.get('exit'), 'exit')
+
+        self.sizes = [len(axis.values) for axis in self.axes]
+        self.combinations = int(np.prod(self.sizes)) if self.sizes else 1
+        if self.combinations > MAX_COMBINATIONS:
+            raise ValueError(f"Too many combinations: {self.combinations} (max {MAX_COMBINATIONS})")
+
+        # 組み合わせ -> 各軸の値の番号
+        self.axis_index = np.unravel_index(np.arange(self.combinations), self.sizes) if self.sizes else ()
+
+    def _parse_indicators(self, specs: Any) -> None:
+        if not isinstance(specs, dict):
+            raise ValueError("indicators must be an object of alias -> {name, params}")
+
+        for alias, spec in specs.items():
+            if alias in PRICE_SERIES or '.' in alias:
+                raise ValueError(f"Invalid indicator alias: {alias}")
+            if not isinstance(spec, dict) or spec.get('name') not in self.indicators:
+                raise ValueError(f"Unknown indicator for {alias}: {spec.get('name') if isinstance(spec, dict) else spec}")
+
+            params = spec.get('params') or {}
+            fixed = {}
+            swept = []
+            for name, value in params.items():
+                if isinstance(value, list):
+                    if not value:
+                        raise ValueError(f"{alias}.{name} must not be an empty array")
+                    swept.append((name, len(self.axes)))
+                    self.axes.append(_Axis(f'{alias}.{name}', value))
+                else:
+                    fixed[name] = value
+            self.aliases[alias] = (self.indicators[spec['name']], fixed, swept)
+
+    def _parse_conditions(self, conditions: Any, label: str) -> List[Dict[str, Any]]:
+        if not isinstance(conditions, list) or not conditions:
+            raise ValueError(f"{label} must be a non-empty array of conditions")
+
+        parsed = []
+        for position, condition in enumerate(conditions):
+            if not isinstance(condition, dict) or condition.get('op') not in OPERATORS:
+                raise ValueError(f"{label}[{position}].op must be one of {', '.join(OPERATORS)}")
+
+            right = condition.get('right')
+            axis = None
+            if isinstance(right, list):
+                if not right or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in right):
+                    raise ValueError(f"{label}[{position}].right must be a non-empty array of numbers")
+                axis = len(self.axes)
+                self.axes.append(_Axis(f'{label}[{position}].right', right))
+            elif not isinstance(right, (int, float, str)) or isinstance(right, bool):
+                raise ValueError(f"{label}[{position}].right must be a series, a number or an array of numbers")
+
+            for side in ('left', 'right'):
+                ref = condition.get(side)
+                if isinstance(ref, str):
+                    self._check_ref(ref, f"{label}[{position}].{side}")
+            if not isinstance(condition.get('left'), str):
+                raise ValueError(f"{label}[{position}].left must be a series name")
+
+            parsed.append({'left': condition['left'], 'op': condition['op'], 'right': right, 'axis': axis})
+        return parsed
+
+    def _check_ref(self, ref: str, label: str) -> None:
+        if ref in PRICE_SERIES:
+            return
+        if ref.split('.', 1)[0] not in self.aliases:
+            raise ValueError(f"{label}: unknown series {ref}")
+
+    # ---- 系列 ----
+
+    def _indicator_variants(self, alias: str, candles: CandleColumns) -> Dict[str, np.ndarray]:
+        """
+        別名のインジケーターをパラメータの組み合わせごとに計算
+
+        Returns:
+            系列名 ('' は単一系列) -> (変種 × 足) の配列
+        """
+        indicator, fixed, swept = self.aliases[alias]
+        times = candles['time']
+        variants: Dict[str, List[np.ndarray]] = {}
+
+        for values in itertools.product(*(self.axes[axis].values for _, axis in swept)):
+            checkpoint()
+            params = {**fixed, **{name: value for (name, _), value in zip(swept, values)}}
+            if not indicator.validate_params(params):
+                raise ValueError(f"Invalid parameters for {alias}: {params}")
+            for name, series in _result_arrays(indicator.calculate(candles, params), times).items():
+                variants.setdefault(name, []).append(series)
+
+        return {name: np.vstack(rows) for name, rows in variants.items()}
+
+    def _operand(
+        self,
+        ref: Any,
+        axis: Optional[int],
+        candles: CandleColumns,
+        series_cache: Dict[str, Dict[str, np.ndarray]]
+    ) -> _Operand:
+        if axis is not None:
+            return _Operand(np.asarray(self.axes[axis].values, dtype=np.float64)[:, None], [axis])
+        if not isinstance(ref, str):
+            return _Operand(np.array([[float(ref)]]), [])
+        if ref in PRICE_SERIES:
+            return _Operand(candles[ref][None, :].astype(np.float64), [])
+
+        alias, _, line = ref.partition('.')
+        if alias not in series_cache:
+            series_cache[alias] = self._indicator_variants(alias, candles)
+        lines = series_cache[alias]
+        if line not in lines:
+            available = ', '.join(f'{alias}.{name}' if name else alias for name in lines)
+            raise ValueError(f"Unknown series {ref} (available: {available})")
+        return _Operand(lines[line], [axis for _, axis in self.aliases[alias][2]])
+
+    # ---- 評価 ----
+
+    def evaluate(self, candles: CandleColumns, combos: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        1銘柄で全組み合わせ (または combos で指定した組み合わせ) を評価
+
+        Returns:
+            指標名 -> 組み合わせごとの値 の配列、'positions' (combos 指定時のみ)
+        """
+        times = candles['time']
+        close = candles['close'].astype(np.float64)
+        bars = len(close)
+        if bars < 2:
+            raise ValueError("At least 2 candles are required")
+
+        series_cache: Dict[str, Dict[str, np.ndarray]] = {}
+        conditions = [
+            [
+                (
+                    self._operand(c['left'], None, candles, series_cache),
+                    c['op'],
+                    self._operand(c['right'], c['axis'], candles, series_cache)
+                )
+                for c in group
+            ]
+            for group in (self.entry, self.exit)
+        ]
+
+        bar_returns = np.zeros(bars)
+        bar_returns[1:] = close[1:] / close[:-1] - 1
+        direction = 1.0 if self.side == 'long' else -1.0
+        periods_per_year = YEAR_SECONDS / max(float(np.median(np.diff(times))), 1.0)
+
+        selected = np.arange(self.combinations) if combos is None else combos
+        axis_index = tuple(index[selected] for index in self.axis_index)
+        count = len(selected)
+        chunk_size = max(1, CHUNK_ELEMENTS // bars)
+
+        metrics = {name: np.empty(count) for name in RANK_METRICS}
+        positions = []
+
+        for start in range(0, count, chunk_size):
+            checkpoint()
+            chunk = slice(start, min(start + chunk_size, count))
+            entry, exit_ = (
+                self._signal(group, axis_index, chunk, bars) for group in conditions
+            )
+            position = _positions(entry, exit_)
+
+            # 足tの損益 = 前の足の終値時点のポジション × 足tのリターン (ポジション変化時は手数料を引く)
+            held = np.zeros_like(position, dtype=np.float64)
+            held[:, 1:] = position[:, :-1]
+            changes = np.abs(np.diff(position.astype(np.int8), axis=1, prepend=0))
+            net = (1 + direction * held * bar_returns) * (1 - self.fee * changes) - 1
+            log_equity = np.cumsum(np.log1p(np.maximum(net, -0.999999)), axis=1)
+
+            equity = np.exp(log_equity)
+            peak = np.maximum.accumulate(np.maximum(equity, 1.0), axis=1)
+            std = net.std(axis=1)
+
+            metrics['totalReturn'][chunk] = equity[:, -1] - 1
+            metrics['maxDrawdown'][chunk] = (equity / peak - 1).min(axis=1)
+            metrics['sharpe'][chunk] = np.divide(
+                net.mean(axis=1) * np.sqrt(periods_per_year), std,
+                out=np.zeros(len(std)), where=std > 0
+            )
+            metrics['exposure'][chunk] = position.mean(axis=1)
+
+            trades = _trade_returns(position, log_equity)
+            rows = chunk.stop - chunk.start
+            trade_count = np.bincount(trades['row'], minlength=rows)
+            wins = np.bincount(trades['row'], weights=trades['return'] > 0, minlength=rows)
+            metrics['trades'][chunk] = trade_count
+            metrics['winRate'][chunk] = np.divide(
+                wins, trade_count, out=np.zeros(rows), where=trade_count > 0
+            )
+
+            if combos is not None:
+                positions.append((position, trades))
+
+        result: Dict[str, Any] = {'metrics': metrics}
+        if combos is not None:
+            result['trades'] = [
+                _trade_list(trades, row, times, close)
+                for position, trades in positions
+                for row in range(len(position))
+            ]
+        return result
+
+    def _signal(self, group, axis_index, chunk: slice, bars: int) -> np.ndarray:
+        """条件をすべて満たす足 (チャンク × 足 のbool配列)"""
+        signal = np.ones((chunk.stop - chunk.start, bars), dtype=bool)
+        for left, op, right in group:
+            a = left.gather(axis_index, self.sizes, chunk)
+            b = right.gather(axis_index, self.sizes, chunk)
+            with np.errstate(invalid='ignore'):
+                if op == 'lt':
+                    hit = a < b
+                elif op == 'le':
+                    hit = a <= b
+                elif op == 'gt':
+                    hit = a > b
+                elif op == 'ge':
+                    hit = a >= b
+                else:
+                    above = a > b
+                    below = a < b
+                    hit = np.zeros(np.broadcast_shapes(a.shape, b.shape), dtype=bool)
+                    if op == 'crossAbove':
+                        hit[:, 1:] = above[:, 1:] & ~above[:, :-1] & ~np.isnan(a[:, :-1])
+                    else:
+                        hit[:, 1:] = below[:, 1:] & ~below[:, :-1] & ~np.isnan(a[:, :-1])
+                    if b.shape[1] > 1:
+                        # 系列同士のクロスは前の足の右辺も計算済みであること
+                        hit[:, 1:] &= ~np.isnan(b[:, :-1])
+            signal &= hit
+        return signal
+
+    def params_of(self, combo: int) -> Dict[str, Any]:
+        """組み合わせ番号 -> {軸のラベル: 値}"""
+        return {
+            axis.label: axis.values[int(index[combo])]
+            for axis, index in zip(self.axes, self.axis_index)
+        }
+
+
+def _result_arrays(result: Any, times: np.ndarray) -> Dict[str, np.ndarray]:
+    """インジケーター結果を足に揃えた配列にする (系列名 -> 配列、単一系列は '')"""
+    if isinstance(result, IndicatorResult):
+        arrays = {}
+        if result.values is not None:
+            arrays[''] = result.values.values.astype(np.float64)
+        for line in result.lines:
+            arrays[line.name] = line.series.values.astype(np.float64)
+        return arrays
+
+    def align(values: List[Dict[str, Any]]) -> np.ndarray:
+        column = np.full(len(times), np.nan)
+        if values:
+            positions = np.searchsorted(times, [point['time'] for point in values])
+            column[positions] = [point['value'] for point in values]
+        return column
+
+    arrays = {}
+    if isinstance(result.get('values'), list):
+        arrays[''] = align(result['values'])
+    for line in result.get('lines', []):
+        arrays[line['name']] = align(line['values'])
+    return arrays
+
+
+def _positions(entry: np.ndarray, exit_: np.ndarray) -> np.ndarray:
+    """
+    エントリー・エグジットの信号からポジション (チャンク × 足 のbool配列)
+    最後のエントリーが最後のエグジットより後の足でポジションを持つ
+    """
+    index = np.arange(entry.shape[1])
+    last_entry = np.maximum.accumulate(np.where(entry, index, -1), axis=1)
+    last_exit = np.maximum.accumulate(np.where(exit_, index, -1), axis=1)
+    return last_entry > last_exit
+
+
+def _trade_returns(position: np.ndarray, log_equity: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    トレードごとの損益 (手数料込み)
+
+    Returns:
+        'row', 'entry', 'exit' (足のインデックス), 'return', 'open' (最後の足で保有中) の配列
+    """
+    rows, bars = position.shape
+    changes = np.diff(position.astype(np.int8), axis=1, prepend=0, append=0)
+    entry_rows, entries = np.nonzero(changes == 1)
+    exit_rows, exits = np.nonzero(changes == -1)
+    # 行優先の順に並ぶため、エントリーとエグジットは順に対応する
+    open_trade = exits == bars
+    exits = np.where(open_trade, bars - 1, exits)
+
+    # エントリーの足の手数料を含めるため、エントリーの前の足からの変化を取る
+    padded = np.concatenate([np.zeros((rows, 1)), log_equity], axis=1)
+    returns = np.exp(padded[exit_rows, exits + 1] - padded[entry_rows, entries]) - 1
+    return {'row': entry_rows, 'entry': entries, 'exit': exits, 'return': returns, 'open': open_trade}
+
+
+def _trade_list(trades: Dict[str, np.ndarray], row: int, times: np.ndarray, close: np.ndarray) -> List[Dict[str, Any]]:
+    mask = trades['row'] == row
+    entries, exits = trades['entry'][mask], trades['exit'][mask]
+    return [
+        {
+            'entryTime': int(times[entry]),
+            'entryPrice': float(close[entry]),
+            'exitTime': int(times[exit_]),
+            'exitPrice': float(close[exit_]),
+            'return': float(value),
+            'open': bool(is_open)
+        }
+        for entry, exit_, value, is_open in zip(entries, exits, trades['return'][mask], trades['open'][mask])
+    ]
+
+
+def _metric_dict(metrics: Dict[str, np.ndarray], index: int) -> Dict[str, float]:
+    return {
+        name: int(values[index]) if name == 'trades' else float(values[index])
+        for name, values in metrics.items()
+    }
+
+
+def run_backtest(request: Dict[str, Any], indicators: Dict[str, IndicatorBase]) -> Dict[str, Any]:
+    """
+    バックテストリクエストを処理する
+
+    Args:
+        request: バックテストリクエスト (モジュールのdocstringを参照)
+        indicators: インジケーター名 -> インスタンス
+
+    Returns:
+        上位の組み合わせ (パラメータ・銘柄ごとの指標・トレード一覧) と全体の件数を持つ辞書
+    """
+    started = time.perf_counter()
+    backtest = Backtest(request, indicators)
+
+    symbols = request.get('symbols')
+    if symbols is None:
+        symbols = [{'symbol': request.get('symbol', 'default'), **{
+            key: request[key] for key in ('candleData', 'candleSource', 'datasetHandle', 'sanitize') if key in request
+        }}]
+    if not isinstance(symbols, list) or not symbols:
+        raise ValueError("symbols must be a non-empty array")
+    if request.get('includeAll'):
+        check_output_points(backtest.combinations * len(symbols) * len(RANK_METRICS), request)
+
+    prepared = []
+    for position, entry in enumerate(symbols):
+        if not isinstance(entry, dict):
+            raise ValueError(f"symbols[{position}] must be an object")
+        candles, _ = IndicatorBase.prepare_candles(entry)
+        prepared.append((str(entry.get('symbol', position)), candles))
+
+    evaluated = parallel_map(lambda item: backtest.evaluate(item[1]), prepared)
+
+    # 銘柄の平均で順位を付ける (ドローダウンは0に近いほど良い)
+    ranking = np.mean([result['metrics'][backtest.rank_by] for result in evaluated], axis=0)
+    order = np.argsort(-ranking, kind='stable')
+    top = order[:backtest.top]
+
+    details = parallel_map(lambda item: backtest.evaluate(item[1], top), prepared) if len(top) else []
+
+    results = []
+    for rank, combo in enumerate(top):
+        by_symbol = {}
+        trades = {}
+        for (symbol, _), result, detail in zip(prepared, evaluated, details):
+            by_symbol[symbol] = _metric_dict(result['metrics'], int(combo))
+            trades[symbol] = detail['trades'][rank]
+        results.append({
+            'rank': rank + 1,
+            'params': backtest.params_of(int(combo)),
+            'score': float(ranking[combo]),
+            'bySymbol': by_symbol,
+            'trades': trades
+        })
+
+    response: Dict[str, Any] = {
+        'success': True,
+        'results': results,
+        'metadata': {
+            'combinations': backtest.combinations,
+            'symbols': [symbol for symbol, _ in prepared],
+            'bars': {symbol: len(candles) for symbol, candles in prepared},
+            'rankBy': backtest.rank_by,
+            'side': backtest.side,
+            'fee': backtest.fee,
+            'elapsedSeconds': round(time.perf_counter() - started, 3)
+        }
+    }
+
+    if request.get('includeAll'):
+        # 全組み合わせの指標を列形式で返す (grid の各軸の値 + 銘柄ごとの指標)
+        response['all'] = {
+            'params': {
+                axis.label: [axis.values[int(i)] for i in index]
+                for axis, index in zip(backtest.axes, backtest.axis_index)
+            },
+            'metrics': {
+                symbol: {name: values.tolist() for name, values in result['metrics'].items()}
+                for (symbol, _), result in zip(prepared, evaluated)
+            }
+        }
+
+    return response
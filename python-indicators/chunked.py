@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+チャンク分割計算 (メモリに載らない長い履歴用)
+固定サイズのブロックを順に読み込み、移動窓や再帰計算の状態をブロック間で引き継ぐ
+ピークメモリは O(チャンク + 期間) で、結果は逐次書き出す
+
+各状態クラスは一括計算 (standard/ のインジケーター、TA-Lib) と同じ初期値・同じ式で計算するため、
+チャンクの区切り方によらず一括計算と同じ値になる (浮動小数点の丸めの範囲で一致)
+EMA・RSI・MACDの再帰計算は、numbaがあれば引き継いだ状態から jit_kernels のカーネルで計算する
+
+使い方:
+    python chunked.py --indicator sma --input bars.csv --output sma.csv \\
+        --chunk-size 1000000 --params '{"period": 20}'
+
+入力はCSV (time, close 等の列を持つ) または列ごとの .npy ファイル
+(time.npy, close.npy, ...) を置いたディレクトリ (メモリマップで読む)
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from numpy.lib.stride_tricks import sliding_window_view
+from jit_kernels import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from jit_kernels import ema_continue_kernel, wilder_continue_kernel
+
+
+Columns = Dict[str, np.ndarray]
+
+
+# ========================
+# ストリーミング状態
+# ========================
+
+def _keep_tail(values: np.ndarray, count: int) -> np.ndarray:
+    """末尾の最大count本を返す"""
+    return values[max(0, len(values) - count):]
+
+
+class SMAState:
+    """単純移動平均 (直前の period-1 本を保持)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.tail = np.empty(0)
+
+    def update(self, close: np.ndarray) -> np.ndarray:
+        window = np.concatenate([self.tail, close])
+        out = np.full(len(close), np.nan)
+
+        if len(window) >= self.period:
+            means = sliding_window_view(window, self.period).mean(axis=1)
+            out[len(close) - len(means):] = means
+
+        self.tail = _keep_tail(window, self.period - 1)
+        return out
+
+
+class BollingerState:
+    """ボリンジャーバンド (直前の period-1 本を保持、標準偏差は母標準偏差)"""
+
+    def __init__(self, period: int, nbdevup: float, nbdevdn: float):
+        self.period = period
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.tail = np.empty(0)
+
+    def update(self, close: np.ndarray) -> Dict[str, np.ndarray]:
+        window = np.concatenate([self.tail, close])
+        middle = np.full(len(close), np.nan)
+        std = np.full(len(close), np.nan)
+
+        if len(window) >= self.period:
+            windows = sliding_window_view(window, self.period)
+            offset = len(close) - len(windows)
+            middle[offset:] = windows.mean(axis=1)
+            std[offset:] = windows.std(axis=1)
+
+        self.tail = _keep_tail(window, self.period - 1)
+        return {
+            'upper': middle + std * self.nbdevup,
+            'middle': middle,
+            'lower': middle - std * self.nbdevdn
+        }
+
+
+class EMAState:
+    """指数移動平均 (最初のperiod本のSMAを初期値とし、直前の値を保持)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+        self.seed: List[np.ndarray] = []
+        self.seen = 0
+        self.value: Optional[float] = None
+
+    def update(self, close: np.ndarray) -> np.ndarray:
+        out = np.full(len(close), np.nan)
+        start = 0
+
+        if self.value is None:
+            # 初期値 (SMA) に必要な本数が揃うまで蓄積
+            take = close[:self.period - self.seen]
+            self.seed.append(take)
+            self.seen += len(take)
+            if self.seen < self.period:
+                return out
+
+            self.value = float(np.mean(np.concatenate(self.seed)))
+            self.seed = []
+            out[len(take) - 1] = self.value
+            start = len(take)
+
+        if start == len(close):
+            return out
+        if NUMBA_AVAILABLE:
+            out[start:] = ema_continue_kernel(np.ascontiguousarray(close[start:], dtype=np.float64),
+                                              self.value, self.multiplier)
+            self.value = float(out[-1])
+            return out
+
+        previous = self.value
+        multiplier = self.multiplier
+        values = close[start:].tolist()
+        for i, value in enumerate(values, start):
+            previous = (value - previous) * multiplier + previous
+            out[i] = previous
+
+        self.value = previous
+        return out
+
+
+class RSIState:
+    """RSI (Wilder平滑化、直前の終値と平均上昇幅・下落幅を保持)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.previous_close: Optional[float] = None
+        self.gains: List[np.ndarray] = []
+        self.losses: List[np.ndarray] = []
+        self.seen = 0
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+
+    def update(self, close: np.ndarray) -> np.ndarray:
+        count = len(close)
+        if count == 0:
+            return np.empty(0)
+
+        # 前のブロックの最後の終値からの差分 (最初のブロックの先頭には差分がない)
+        if self.previous_close is None:
+            delta = np.diff(close)
+            first = 1
+        else:
+            delta = np.diff(np.concatenate([[self.previous_close], close]))
+            first = 0
+        self.previous_close = float(close[-1])
+
+        gain = np.where(delta > 0, delta, 0)
+        loss = np.where(delta < 0, -delta, 0)
+
+        avg_gain = np.full(count, np.nan)
+        avg_loss = np.full(count, np.nan)
+        start = 0
+
+        if self.avg_gain is None:
+            take = self.period - self.seen
+            self.gains.append(gain[:take])
+            self.losses.append(loss[:take])
+            self.seen += len(gain[:take])
+            if self.seen < self.period:
+                return avg_gain
+
+            self.avg_gain = float(np.mean(np.concatenate(self.gains)))
+            self.avg_loss = float(np.mean(np.concatenate(self.losses)))
+            self.gains = []
+            self.losses = []
+            start = len(gain[:take])
+            avg_gain[first + start - 1] = self.avg_gain
+            avg_loss[first + start - 1] = self.avg_loss
+
+        period = self.period
+        if NUMBA_AVAILABLE:
+            if start < len(gain):
+                offset = first + start
+                avg_gain[offset:] = wilder_continue_kernel(gain[start:].astype(np.float64), self.avg_gain, period)
+                avg_loss[offset:] = wilder_continue_kernel(loss[start:].astype(np.float64), self.avg_loss, period)
+                self.avg_gain = float(avg_gain[-1])
+                self.avg_loss = float(avg_loss[-1])
+        else:
+            current_gain = self.avg_gain
+            current_loss = self.avg_loss
+            gains = gain[start:].tolist()
+            losses = loss[start:].tolist()
+            for i in range(len(gains)):
+                current_gain = (current_gain * (period - 1) + gains[i]) / period
+                current_loss = (current_loss * (period - 1) + losses[i]) / period
+                avg_gain[first + start + i] = current_gain
+                avg_loss[first + start + i] = current_loss
+
+            self.avg_gain = current_gain
+            self.avg_loss = current_loss
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            return 100 - (100 / (1 + rs))
+
+
+class MACDState:
+    """
+    MACD (速いEMA・遅いEMA・シグナルEMAの状態を保持、初期値はTA-LibのMACDと同じ)
+
+    - 遅いEMAは最初の slow 本、速いEMAは同じ位置で終わる直前の fast 本のSMAを初期値とする
+      (どちらも slow 本目から値を持つ)
+    - シグナルは最初の signal 個のMACD値のSMAを初期値とし、MACD・ヒストグラムも
+      シグナルと同じ足から返す
+    """
+
+    def __init__(self, fast: int, slow: int, signal: int):
+        # TA-Libと同様に速い方・遅い方を入れ替える
+        if slow < fast:
+            fast, slow = slow, fast
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+        # 速いEMAに渡さない先頭の本数
+        self.skip = slow - fast
+
+    def update(self, close: np.ndarray) -> Dict[str, np.ndarray]:
+        skipped = min(self.skip, len(close))
+        self.skip -= skipped
+        fast = np.full(len(close), np.nan)
+        fast[skipped:] = self.fast.update(close[skipped:])
+        macd = fast - self.slow.update(close)
+
+        # シグナルは有効なMACD値だけを入力とする
+        valid = ~np.isnan(macd)
+        signal = np.full(len(close), np.nan)
+        signal[valid] = self.signal.update(macd[valid])
+        macd[np.isnan(signal)] = np.nan
+
+        return {
+            'macd': macd,
+            'signal': signal,
+            'histogram': macd - signal
+        }
+
+
+def create_state(indicator: str, params: Dict[str, Any]) -> Callable[[np.ndarray], Dict[str, np.ndarray]]:
+    """
+    インジケーター名とパラメータからブロック処理関数を生成
+
+    Args:
+        indicator: 'sma' / 'ema' / 'rsi' / 'macd' / 'bollinger'
+        params: パラメータ辞書 (各インジケーターのデフォルト値を使用)
+
+    Returns:
+        終値のブロックを受け取り、出力列の辞書を返す関数
+    """
+    if indicator == 'sma':
+        state = SMAState(params.get('period', 20))
+        return lambda close: {'sma': state.update(close)}
+    if indicator == 'ema':
+        state = EMAState(params.get('period', 20))
+        return lambda close: {'ema': state.update(close)}
+    if indicator == 'rsi':
+        state = RSIState(params.get('period', 14))
+        return lambda close: {'rsi': state.update(close)}
+    if indicator == 'macd':
+        return MACDState(
+            params.get('fastPeriod', 12),
+            params.get('slowPeriod', 26),
+            params.get('signalPeriod', 9)
+        ).update
+    if indicator == 'bollinger':
+        std_dev = params.get('stdDev', 2)
+        return BollingerState(params.get('period', 20), std_dev, std_dev).update
+
+    raise ValueError(f"Chunked computation is not supported for: {indicator}")
+
+
+# ========================
+# 入出力
+# ========================
+
+def iter_csv_chunks(path: str, chunk_size: int) -> Iterator[Columns]:
+    """CSVを chunk_size 行ずつ読み込む (time, close 列が必要)"""
+    for frame in pd.read_csv(path, usecols=['time', 'close'], chunksize=chunk_size):
+        yield {
+            'time': frame['time'].to_numpy(dtype=np.int64),
+            'close': frame['close'].to_numpy(dtype=np.float64)
+        }
+
+
+def iter_npy_chunks(directory: str, chunk_size: int) -> Iterator[Columns]:
+    """列ごとの .npy をメモリマップで開き、chunk_size 行ずつ切り出す"""
+    time = np.load(os.path.join(directory, 'time.npy'), mmap_mode='r')
+    close = np.load(os.path.join(directory, 'close.npy'), mmap_mode='r')
+
+    for start in range(0, len(time), chunk_size):
+        yield {
+            'time': np.asarray(time[start:start + chunk_size], dtype=np.int64),
+            'close': np.asarray(close[start:start + chunk_size], dtype=np.float64)
+        }
+
+
+class CsvSink:
+    """ブロックごとの結果をCSVに追記する"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header_written = False
+
+    def __call__(self, time: np.ndarray, outputs: Dict[str, np.ndarray]) -> None:
+        frame = pd.DataFrame({'time': time, **outputs})
+        frame.to_csv(self.path, mode='a' if self.header_written else 'w', header=not self.header_written, index=False)
+        self.header_written = True
+
+
+def run_chunked(
+    indicator: str,
+    params: Dict[str, Any],
+    chunks: Iterator[Columns],
+    sink: Callable[[np.ndarray, Dict[str, np.ndarray]], None]
+) -> Dict[str, Any]:
+    """
+    ブロックを順に計算して sink に渡す
+
+    Args:
+        indicator: インジケーター名
+        params: パラメータ辞書
+        chunks: time, close 列を持つブロックのイテレータ (time昇順)
+        sink: (time, 出力列) を受け取る関数
+
+    Returns:
+        処理した行数とブロック数
+    """
+    step = create_state(indicator, params)
+    rows = 0
+    blocks = 0
+
+    for chunk in chunks:
+        sink(chunk['time'], step(chunk['close']))
+        rows += len(chunk['time'])
+        blocks += 1
+
+    return {'indicator': indicator, 'rows': rows, 'chunks': blocks}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Chunked indicator computation for very long histories')
+    parser.add_argument('--indicator', required=True, choices=['sma', 'ema', 'rsi', 'macd', 'bollinger'])
+    parser.add_argument('--input', required=True, help='CSV file or directory of column .npy files')
+    parser.add_argument('--output', required=True, help='output CSV file')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--params', default='{}', help='indicator params as JSON')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        chunks = iter_npy_chunks(args.input, args.chunk_size)
+    else:
+        chunks = iter_csv_chunks(args.input, args.chunk_size)
+
+    summary = run_chunked(args.indicator, json.loads(args.params), chunks, CsvSink(args.output))
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+データセットストア (ライブチャート用の差分アップロード)
+登録したローソク足の列をハンドルで保持し、以降は末尾の新しい足・更新された足だけを
+受け取って追記する。インジケーターリクエストは 'candleData' の代わりに
+'datasetHandle' で列を参照するため、更新ごとの転送量と解析コストは差分に比例する
+
+- 列は余裕を持たせたバッファに保持し、末尾への追加はその場で書き込む
+  (計算中のスナップショットは追加前の長さのビューなので影響を受けない)
+- 既存の足を置き換える追記 (形成中の足の更新など) は新しいバッファにコピーしてから書き込む
+- 一定時間アクセスのないデータセットと、上限を超えた古いデータセットは削除する
+- スナップショットは登録ごとの識別子とバージョンを持ち、結果キャッシュ・合流のキーは
+  列をハッシュせずにこの値で作る (同じハンドルで再登録した場合も別のキーになる)
+- 登録時に 'prefixIndex' で指定した列は累積和・累積二乗和のインデックス (prefix_index.py) を
+  一度だけ作ってデータセットと一緒に保持し、追記では置き換えた位置以降だけを更新する
+
+環境変数:
+    INDICATOR_MAX_DATASETS: 保持するデータセット数の上限 (デフォルト 256)
+    INDICATOR_DATASET_TTL: アクセスがない場合に削除するまでの秒数 (デフォルト 3600)
+"""
+
+import os
+import time
+import uuid
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from sanitize import PRICE_COLUMNS
+from prefix_index import PREFIX_ROWS, PrefixSumIndex, extend_prefix
+
+
+DEFAULT_MAX_DATASETS = 256
+DEFAULT_TTL = 3600.0
+# バッファの最小容量と拡張率
+MIN_CAPACITY = 1024
+GROWTH_FACTOR = 1.5
+
+
+class Dataset:
+    """ハンドルに対応するローソク足の列"""
+
+    __slots__ = (
+        'handle', 'uid', 'options', 'version', 'length', 'last_access',
+        '_buffers', '_prefixes', '_references', '_lock'
+    )
+
+    def __init__(
+        self,
+        handle: str,
+        columns: Dict[str, np.ndarray],
+        options: Dict[str, Any],
+        indexed: Optional[List[str]] = None
+    ):
+        self.handle = handle
+        # 登録ごとに一意 (同じハンドルの再登録や別プロセスの登録と区別する)
+        self.uid = uuid.uuid4().hex
+        self.options = options
+        self.version = 1
+        self.length = len(columns['time'])
+        self.last_access = time.monotonic()
+        self._lock = threading.Lock()
+
+        capacity = max(MIN_CAPACITY, int(self.length * GROWTH_FACTOR))
+        self._buffers = {}
+        for name, values in columns.items():
+            buffer = np.empty(capacity, dtype=values.dtype)
+            buffer[:self.length] = values
+            self._buffers[name] = buffer
+
+        # 列 -> (PREFIX_ROWS, 容量 + 1) の累積値のバッファ
+        self._prefixes = {}
+        self._references = {}
+        for name in indexed or []:
+            index = PrefixSumIndex.build(columns[name])
+            prefix = np.zeros((PREFIX_ROWS, capacity + 1))
+            prefix[:, :self.length + 1] = index.prefix
+            self._prefixes[name] = prefix
+            self._references[name] = index.reference
+
+    @property
+    def indexed(self) -> List[str]:
+        """累積和のインデックスを持つ列"""
+        return list(self._prefixes)
+
+    def snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, PrefixSumIndex], str]:
+        """
+        現在の列と累積和のインデックス (読み取り専用のビュー、以降の追記の影響を受けない)
+
+        Returns:
+            (列名 -> 配列, 列名 -> インデックス, 内容の識別子 '登録の識別子:バージョン')
+        """
+        with self._lock:
+            columns = {}
+            for name, buffer in self._buffers.items():
+                view = buffer[:self.length]
+                view.flags.writeable = False
+                columns[name] = view
+            indexes = {}
+            for name, prefix in self._prefixes.items():
+                view = prefix[:, :self.length + 1]
+                view.flags.writeable = False
+                indexes[name] = PrefixSumIndex(view, self._references[name])
+            return columns, indexes, f'{self.uid}:{self.version}'
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """現在の列 (読み取り専用のビュー、以降の追記の影響を受けない)"""
+        return self.snapshot()[0]
+
+    def last_time(self) -> Optional[int]:
+        with self._lock:
+            return int(self._buffers['time'][self.length - 1]) if self.length else None
+
+    def append(self, delta: Dict[str, np.ndarray]) -> Dict[str, int]:
+        """
+        サニタイズ済みの足を追記する
+        差分の先頭以降のtimeを持つ既存の足は差分で置き換える
+
+        Args:
+            delta: 追記する列 (time昇順・重複なし)
+
+        Returns:
+            {'appended': 差分の本数, 'replaced': 置き換えた既存の足の本数}
+        """
+        count = len(delta['time'])
+        with self._lock:
+            keep = int(np.searchsorted(self._buffers['time'][:self.length], delta['time'][0], side='left'))
+            replaced = self.length - keep
+            new_length = keep + count
+            capacity = len(self._buffers['time'])
+
+            if replaced > 0 or new_length > capacity:
+                # 計算中のスナップショットが参照するバッファは書き換えない
+                if new_length > capacity:
+                    capacity = max(new_length, int(capacity * GROWTH_FACTOR))
+                buffers = {}
+                for name, buffer in self._buffers.items():
+                    copied = np.empty(capacity, dtype=buffer.dtype)
+                    copied[:keep] = buffer[:keep]
+                    buffers[name] = copied
+                self._buffers = buffers
+                prefixes = {}
+                for name, prefix in self._prefixes.items():
+                    copied = np.zeros((PREFIX_ROWS, capacity + 1))
+                    copied[:, :keep + 1] = prefix[:, :keep + 1]
+                    prefixes[name] = copied
+                self._prefixes = prefixes
+
+            for name, buffer in self._buffers.items():
+                buffer[keep:new_length] = delta[name]
+            # 累積値は残した足の位置から差分の分だけ計算する
+            for name, prefix in self._prefixes.items():
+                extend_prefix(prefix, delta[name], keep, self._references[name])
+
+            self.length = new_length
+            self.version += 1
+            self.last_access = time.monotonic()
+
+        return {'appended': count, 'replaced': replaced}
+
+
+def indexed_columns(prefix_index: Any) -> List[str]:
+    """
+    'prefixIndex' の指定からインデックスを作る列を決める
+
+    Args:
+        prefix_index: None / False (作らない)、True ('close')、または列名の配列
+    """
+    if prefix_index is None or prefix_index is False:
+        return []
+    if prefix_index is True:
+        return ['close']
+    if not isinstance(prefix_index, list) or not all(name in PRICE_COLUMNS for name in prefix_index):
+        raise ValueError(f"prefixIndex must be a boolean or an array of {', '.join(PRICE_COLUMNS)}")
+    return list(dict.fromkeys(prefix_index))
+
+
+class DatasetStore:
+    """ハンドル -> データセット (LRU・アイドル時間で削除)"""
+
+    def __init__(self, max_datasets: int = DEFAULT_MAX_DATASETS, ttl: float = DEFAULT_TTL):
+        self.max_datasets = max_datasets
+        self.ttl = ttl
+        self._datasets: 'OrderedDict[str, Dataset]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        columns: Dict[str, np.ndarray],
+        options: Dict[str, Any],
+        handle: Optional[str] = None,
+        prefix_index: Any = None
+    ) -> Dataset:
+        """
+        列を登録する (同じハンドルがあれば置き換える)
+
+        Args:
+            columns: サニタイズ済みの列
+            options: 追記時のサニタイズ設定
+            handle: ハンドル (省略時は生成)
+            prefix_index: 累積和のインデックスを作る列 (True なら 'close'、列名の配列も可)
+
+        Returns:
+            登録したデータセット
+        """
+        if handle is not None and (not isinstance(handle, str) or not handle):
+            raise ValueError("datasetHandle must be a non-empty string")
+
+        dataset = Dataset(handle or uuid.uuid4().hex, columns, options, indexed_columns(prefix_index))
+        with self._lock:
+            self._datasets[dataset.handle] = dataset
+            self._datasets.move_to_end(dataset.handle)
+            self._evict()
+        return dataset
+
+    def get(self, handle: Any) -> Dataset:
+        """
+        データセットを取得
+
+        Raises:
+            ValueError: ハンドルが存在しない (期限切れで削除された場合を含む、再登録が必要)
+        """
+        with self._lock:
+            self._evict()
+            dataset = self._datasets.get(handle) if isinstance(handle, str) else None
+            if dataset is None:
+                raise ValueError(f"Unknown datasetHandle: {handle} (register the dataset again)")
+            self._datasets.move_to_end(handle)
+            dataset.last_access = time.monotonic()
+            return dataset
+
+    def drop(self, handle: str) -> bool:
+        """データセットを削除 (存在した場合True)"""
+        with self._lock:
+            return self._datasets.pop(handle, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """データセット数と合計本数"""
+        with self._lock:
+            return {
+                'datasets': len(self._datasets),
+                'points': sum(dataset.length for dataset in self._datasets.values()),
+                'maxDatasets': self.max_datasets
+            }
+
+    def _evict(self) -> None:
+        """期限切れと上限超過のデータセットを削除 (ロック内で呼ぶ)"""
+        now = time.monotonic()
+        for handle in [h for h, d in self._datasets.items() if now - d.last_access > self.ttl]:
+            del self._datasets[handle]
+        while len(self._datasets) > self.max_datasets:
+            self._datasets.popitem(last=False)
+
+
+_default_store: Optional[DatasetStore] = None
+_default_lock = threading.Lock()
+
+
+def get_default_store() -> DatasetStore:
+    """プロセス共通のデータセットストア (初回呼び出し時に生成)"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = DatasetStore(
+                max_datasets=int(os.environ.get('INDICATOR_MAX_DATASETS', DEFAULT_MAX_DATASETS)),
+                ttl=float(os.environ.get('INDICATOR_DATASET_TTL', DEFAULT_TTL))
+            )
+        return _default_store
@@ -0,0 +1,72 @@
+"""
+シグナルイベントの抽出 (output: 'events' 用)
+系列全体ではなく、クロスやレベル到達が起きた足だけを返すための共通処理
+"""
+
+import numpy as np
+from typing import Any, Dict, List, Union
+
+
+def crossings(a: np.ndarray, b: Union[np.ndarray, float]) -> Dict[str, np.ndarray]:
+    """
+    a が b を上抜け・下抜けした足のインデックス
+
+    a - b の符号が変わった足をクロスとする。差が0の足 (接しているだけ) は
+    直前の符号を引き継ぐため、接してから戻った場合はクロスにならない。
+    どちらかがNaNの足 (計算開始前) はクロスの判定に使わない。
+
+    Args:
+        a: 系列
+        b: 比較する系列または一定の値
+
+    Returns:
+        {'up': 上抜けした足のインデックス, 'down': 下抜けした足のインデックス}
+    """
+    sign = np.sign(np.asarray(a, dtype=np.float64) - b)
+    if len(sign) < 2:
+        empty = np.empty(0, dtype=np.intp)
+        return {'up': empty, 'down': empty}
+
+    # 差が0の足は直前の0でない足 (またはNaN) の符号を使う
+    index = np.where(sign != 0, np.arange(len(sign)), 0)
+    np.maximum.accumulate(index, out=index)
+    sign = sign[index]
+
+    previous, current = sign[:-1], sign[1:]
+    return {
+        'up': np.flatnonzero((previous < 0) & (current > 0)) + 1,
+        'down': np.flatnonzero((previous > 0) & (current < 0)) + 1
+    }
+
+
+def build_events(
+    times: np.ndarray,
+    event_type: str,
+    indices: np.ndarray,
+    fields: Dict[str, np.ndarray]
+) -> List[Dict[str, Any]]:
+    """
+    インデックスからイベントの一覧を作る
+
+    Args:
+        times: time配列
+        event_type: イベントの種類
+        indices: イベントが起きた足のインデックス
+        fields: イベントに含める値 (名前 -> 系列)
+
+    Returns:
+        [{'time', 'type', 名前: 値, ...}, ...]
+    """
+    columns = {name: values[indices].tolist() for name, values in fields.items()}
+    events = []
+    for position, time in enumerate(times[indices].tolist()):
+        event = {'time': int(time), 'type': event_type}
+        for name, values in columns.items():
+            event[name] = float(values[position])
+        events.append(event)
+    return events
+
+
+def sort_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """イベントをtime順 (同じtimeは種類の順) に並べる"""
+    return sorted(events, key=lambda event: (event['time'], event['type']))
@@ -5,8 +5,29 @@
 
 import sys
 import json
-from typing import Dict, Any, List, TypedDict
+import time
+import numpy as np
+from typing import Dict, Any, List, Callable, Optional, Tuple, TypedDict
 from abc import ABC, abstractmethod
+from resample import ALIGN_MODES, parse_timeframe, resample_columns, align_index, align_series
+from sanitize import PRICE_COLUMNS, columns_from_candles, sanitize_columns
+from arrow_io import read_candle_source, write_result
+from result_cache import get_default_cache, make_key
+from single_flight import SingleFlight
+from dataset_store import get_default_store
+from prefix_index import PrefixSumIndex
+from talib_wrapper import backend_signature
+from metrics import REQUESTS, PHASE_SECONDS, INPUT_POINTS, CACHE_LOOKUPS, COALESCED, metrics_response
+from request_recorder import record as record_request
+from result_delta import apply_fingerprint
+from response_compression import encode_payload
+from results import IndicatorResult, Series, json_default
+from request_limits import check_input_points, check_output_points
+from scheduler import checkpoint, deadline_scope, request_deadline
+
+
+# 結果の出力形式 ('series': 系列全体, 'events': クロス等が起きた足のみ)
+OUTPUT_MODES = ('series', 'events')
 
 
 class CandleData(TypedDict):
@@ -27,6 +48,116 @@ class IndicatorRequest(TypedDict):
     metadata: Dict[str, Any]
 
 
+class CandleColumns:
+    """
+    列指向のローソク足 (列名 -> numpy配列)
+
+    ローソク足配列 (List[CandleData]) と同じように len()・インデックス・
+    スライス・イテレーションができるため、既存のインジケーターもそのまま動く。
+    列を直接使うインジケーターは candle_columns() で配列を取り出す。
+    累積和のインデックスを持つデータセットでは、連続するスライスでもインデックスを引き継ぐ
+    (candle_index() で取り出す)。
+    データセットの列は source に内容の識別子を持ち、キャッシュキーは列をハッシュせずに作る
+    (スライスは内容が変わるため引き継がない)。
+    """
+
+    __slots__ = ('columns', 'indexes', 'source')
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        indexes: Optional[Dict[str, PrefixSumIndex]] = None,
+        source: Optional[str] = None
+    ):
+        self.columns = columns
+        self.indexes = indexes or {}
+        self.source = source
+
+    def __len__(self) -> int:
+        return len(self.columns['time'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            indexes = {name: index[key] for name, index in self.indexes.items()} if key.step in (None, 1) else {}
+            return CandleColumns({name: values[key] for name, values in self.columns.items()}, indexes)
+        return self._row(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def _row(self, index: int) -> CandleData:
+        row = {'time': int(self.columns['time'][index])}
+        for key in PRICE_COLUMNS:
+            row[key] = float(self.columns[key][index])
+        return row
+
+
+def candle_columns(candle_data: List[CandleData]) -> Dict[str, np.ndarray]:
+    """
+    ローソク足配列を列指向のnumpy配列に変換 (CandleColumnsの場合はコピーしない)
+
+    Args:
+        candle_data: ローソク足データ配列またはCandleColumns
+
+    Returns:
+        列名 -> numpy配列 の辞書
+    """
+    if isinstance(candle_data, CandleColumns):
+        return candle_data.columns
+
+    count = len(candle_data)
+    columns = {
+        'time': np.fromiter((c['time'] for c in candle_data), dtype=np.int64, count=count)
+    }
+    for key in PRICE_COLUMNS:
+        columns[key] = np.fromiter((c[key] for c in candle_data), dtype=np.float64, count=count)
+    return columns
+
+
+def candle_index(candle_data: List[CandleData], column: str = 'close') -> Optional[PrefixSumIndex]:
+    """
+    列の累積和のインデックス ('prefixIndex' を指定して登録したデータセットのみ)
+
+    Args:
+        candle_data: ローソク足データ配列またはCandleColumns
+        column: 列名
+
+    Returns:
+        インデックス (なければNone)
+    """
+    if isinstance(candle_data, CandleColumns):
+        return candle_data.indexes.get(column)
+    return None
+
+
+def map_result_series(
+    result: Dict[str, Any],
+    fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+    series_fn: Callable[[Series], Series]
+) -> Dict[str, Any]:
+    """
+    結果に含まれる全系列 ('values' と 'lines[].values') に関数を適用する (破壊的)
+
+    Args:
+        result: インジケーター結果辞書または IndicatorResult
+        fn: 系列 [{'time', 'value'}, ...] を受け取り新しい系列を返す関数
+        series_fn: IndicatorResult の場合に使う、配列の系列 (Series) 用の同じ処理
+
+    Returns:
+        同じ結果
+    """
+    if isinstance(result, IndicatorResult):
+        return result.map_series(series_fn)
+    if isinstance(result.get('values'), list):
+        result['values'] = fn(result['values'])
+    for line in result.get('lines', []):
+        line['values'] = fn(line['values'])
+    return result
+
+
 class IndicatorBase(ABC):
     """インジケーター基底クラス"""
 
@@ -35,6 +166,10 @@ class IndicatorBase(ABC):
         self.version = "1.0.0"
         self.display_type = "single-line"
         self.chart_type = "main"  # 'main' or 'sub'
+        # 計算で読む列 (キャッシュキーでハッシュする列、Noneなら全列)
+        self.input_columns: Optional[Tuple[str, ...]] = None
+        # 常駐ランタイムが設定する (同一リクエストの合流用、Noneなら無効)
+        self.flight: Optional[SingleFlight] = None
 
     @abstractmethod
     def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
@@ -46,7 +181,7 @@ class IndicatorBase(ABC):
             params: パラメータ辞書
             
         Returns:
-            インジケーター結果辞書
+            インジケーター結果辞書 (または配列ベースの IndicatorResult)
         """
         pass
 
@@ -62,6 +197,56 @@ class IndicatorBase(ABC):
         """
         return True
 
+    def calculate_events(self, candle_data: List[CandleData], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        シグナルイベントを抽出する (output: 'events' に対応するインジケーターで実装)
+
+        Args:
+            candle_data: ローソク足データ配列
+            params: パラメータ辞書
+
+        Returns:
+            [{'time', 'type', ...値}, ...] (time昇順)
+        """
+        raise ValueError(f"Indicator {self.name} does not support output 'events'")
+
+    def _events_result(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
+        """calculate_events() の結果をレスポンスの形にする"""
+        events = self.calculate_events(candle_data, params)
+        return {
+            'success': True,
+            'displayType': 'events',
+            'events': events,
+            'metadata': {'eventCount': len(events)}
+        }
+
+    def get_lookback(self, params: Dict[str, Any]) -> Optional[int]:
+        """
+        最新値の計算に必要な入力本数を返す
+        latestOnlyモードでは入力の末尾のこの本数 (+ 要求本数 - 1) だけを計算に使う
+
+        Args:
+            params: パラメータ辞書
+
+        Returns:
+            必要な本数 (Noneの場合は全履歴を使用)
+        """
+        return None
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """
+        計算で生成する系列の点数の見積もり (リクエストの上限の確認用)
+        複数系列のインジケーターは系列数を掛けた値を返すようオーバーライドする
+
+        Args:
+            points: 入力の本数
+            params: パラメータ辞書
+
+        Returns:
+            点数
+        """
+        return points
+
     def get_metadata(self) -> Dict[str, Any]:
         """
         インジケーターのメタデータを返す
@@ -111,23 +296,97 @@ class IndicatorBase(ABC):
         """
         return []
 
-    def run(self) -> None:
+    def calculate_timeframes(
+        self,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        timeframes: List[str],
+        output: str = 'series',
+        align: str = 'confirmed'
+    ) -> Dict[str, Dict[str, Any]]:
         """
-        メイン実行処理
-        stdinからJSONを受け取り、stdoutにJSONを出力
+        上位足でインジケーターを計算し、元の時間軸に揃えて返す
+        (イベントは揃えずに上位足のtimeで返し、'confirmedTime' にその上位足が確定した
+        元の足のtimeを付ける)
+
+        Args:
+            candle_data: ローソク足データ配列 (time昇順)
+            params: パラメータ辞書
+            timeframes: 上位足のリスト (例: ['15m', '1h', '1d'])
+            output: 'series' または 'events'
+            align: 元の足への割り当て方 ('confirmed' / 'bucket'、resample.py を参照)
+
+        Returns:
+            時間足 -> インジケーター結果辞書
         """
-        try:
-            # stdinからJSONリクエスト読み込み
-            input_data = sys.stdin.read()
-            request: IndicatorRequest = json.loads(input_data)
+        if align not in ALIGN_MODES:
+            raise ValueError(f"timeframeAlign must be one of {', '.join(ALIGN_MODES)}")
+        columns = candle_columns(candle_data)
+        results = {}
+
+        for timeframe in timeframes:
+            checkpoint()
+            seconds = parse_timeframe(timeframe)
+            resampled, bucket_index = resample_columns(columns, seconds)
+
+            if output == 'events':
+                result = self._events_result(CandleColumns(resampled), params)
+                # 上位足の最後の元の足 (その時点でイベントが確定する)
+                last_times = columns['time'][np.append(np.flatnonzero(np.diff(bucket_index)), len(bucket_index) - 1)]
+                for event in result['events']:
+                    position = int(np.searchsorted(resampled['time'], event['time']))
+                    event['confirmedTime'] = int(last_times[position])
+            else:
+                result = self.calculate(CandleColumns(resampled), params)
+                index = align_index(bucket_index, align)
+                map_result_series(
+                    result,
+                    lambda values: align_series(values, resampled['time'], columns['time'], index),
+                    lambda series: series.align(columns['time'], index)
+                )
+            result.setdefault('metadata', {})['timeframe'] = timeframe
+            result['metadata']['resampledPoints'] = len(resampled['time'])
+            results[timeframe] = result
+
+        return results
+
+    @staticmethod
+    def prepare_candles(request: IndicatorRequest) -> Tuple[CandleColumns, Dict[str, Any]]:
+        """
+        リクエストのローソク足を検証し、数値型に変換してサニタイズする
+
+        ローソク足は 'candleData' (配列) または 'candleSource' (Arrow / Parquetファイル) で渡す
+            {'format': 'arrow' | 'parquet', 'path': INDICATOR_DATA_DIRからの相対パス}
+        常駐ランタイムでは、登録済みのデータセットを 'datasetHandle' で参照できる
+        (登録時にサニタイズ済みのため、ここでは列をそのまま使う)
+        サニタイズの設定はリクエストの 'sanitize' で指定する
+            {'nanPolicy': 'drop' | 'ffill' | 'reject', 'gapFactor': 1.5}
+
+        Args:
+            request: インジケーターリクエスト
+
+        Returns:
+            (time昇順・重複なしのローソク足, サニタイズのレポート)
+        """
+        if request.get('datasetHandle') is not None:
+            dataset = get_default_store().get(request['datasetHandle'])
+            columns, indexes, source = dataset.snapshot()
+            check_input_points(len(columns['time']), request)
+            return CandleColumns(columns, indexes, source), {
+                'datasetHandle': dataset.handle,
+                'datasetVersion': dataset.version,
+                'outputPoints': len(columns['time'])
+            }
 
-            # メタデータ取得モード
-            if request.get('_mode') == 'metadata':
-                metadata = self.get_metadata()
-                metadata['success'] = True
-                print(json.dumps(metadata, ensure_ascii=False))
-                return
+        options = request.get('sanitize') or {}
+        if not isinstance(options, dict):
+            raise ValueError("sanitize must be an object")
 
+        if request.get('candleSource') is not None:
+            # Arrow / Parquetファイルから列を直接読み込む
+            columns = read_candle_source(request['candleSource'])
+            check_input_points(len(columns['time']), request)
+        else:
             # リクエスト検証
             if not request.get('candleData'):
                 raise ValueError("candleData is required")
@@ -138,48 +397,349 @@ class IndicatorBase(ABC):
             if len(request['candleData']) == 0:
                 raise ValueError("candleData must not be empty")
 
-            # パラメータ取得
-            params = request.get('params', {})
-            candle_data = request['candleData']
-            
-            # データ型変換（数値をfloatに変換）
-            for candle in candle_data:
-                candle['time'] = int(candle.get('time', 0))
-                candle['open'] = float(candle.get('open', 0))
-                candle['high'] = float(candle.get('high', 0))
-                candle['low'] = float(candle.get('low', 0))
-                candle['close'] = float(candle.get('close', 0))
-                candle['volume'] = float(candle.get('volume', 0))
+            check_input_points(len(request['candleData']), request)
+            columns = columns_from_candles(request['candleData'])
+
+        # 型変換とサニタイズ (ソート・重複除去・NaN/inf処理・欠損区間の検出)
+        columns, report = sanitize_columns(
+            columns,
+            nan_policy=options.get('nanPolicy', 'drop'),
+            gap_factor=options.get('gapFactor', 1.5)
+        )
+
+        return CandleColumns(columns), report
+
+    def compute(
+        self,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        request: IndicatorRequest
+    ) -> Dict[str, Any]:
+        """
+        変換済みのローソク足でインジケーターを計算し、メタデータを付ける
+        candle_dataは読み取りのみのため、複数スレッドから同じ配列で呼び出せる
+
+        ディスクキャッシュ (INDICATOR_CACHE_DIR) が有効な場合は、入力列と
+        name・version・パラメータが同じ結果を再利用する (リクエストの 'cache': false で無効化)
+
+        self.flight が設定されている場合は、同じ内容キーの計算が実行中であれば
+        その結果を共有する (リクエストの 'coalesce': false で無効化)
+
+        出力点数の上限はキャッシュと合流の前に確認するため、キャッシュにある結果や
+        上限の異なるリクエストと共有する結果でもリクエストごとの 'limits' が効く
+
+        Args:
+            candle_data: prepare_candlesで変換済みのローソク足データ配列
+            params: パラメータ辞書
+            request: 元のリクエスト (計算オプションの参照用)
+
+        Returns:
+            結果辞書
+        """
+        start = time.perf_counter()
+        try:
+            self.check_limits(candle_data, params, request)
+            result = self._coalesced_compute(candle_data, params, request)
+        except Exception:
+            REQUESTS.inc(indicator=self.name, status='error')
+            raise
+        PHASE_SECONDS.observe(time.perf_counter() - start, indicator=self.name, phase='compute')
+        REQUESTS.inc(indicator=self.name, status='success')
+        return result
+
+    def _coalesced_compute(
+        self,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        request: IndicatorRequest
+    ) -> Dict[str, Any]:
+        """同一リクエストの合流とディスクキャッシュを通した計算処理"""
+        cache = get_default_cache() if request.get('cache', True) else None
+        flight = self.flight if request.get('coalesce', True) else None
+        if cache is None and flight is None:
+            return self._compute(candle_data, params, request)
+
+        key = self.cache_key(candle_data, params, request)
+        if flight is None:
+            return self._cached_compute(key, cache, candle_data, params, request)
+
+        result, shared = flight.do(key, lambda: self._cached_compute(key, cache, candle_data, params, request))
+
+        # 共有した結果は呼び出し元ごとにメタデータを書き換えるため、上位の辞書だけ複製する
+        # (値の配列は読み取り専用として共有)
+        result = result.copy()
+        result['metadata'] = dict(result['metadata'])
+        if shared:
+            result['metadata']['coalesced'] = True
+            COALESCED.inc(indicator=self.name)
+        return result
+
+    def _cached_compute(
+        self,
+        key: str,
+        cache,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        request: IndicatorRequest
+    ) -> Dict[str, Any]:
+        """ディスクキャッシュ (Noneなら無効) を通した計算処理"""
+        if cache is None:
+            return self._compute(candle_data, params, request)
+
+        with PHASE_SECONDS.time(indicator=self.name, phase='cache'):
+            result = cache.get(key)
+        if result is not None:
+            CACHE_LOOKUPS.inc(indicator=self.name, result='hit')
+            result['metadata']['cache'] = 'hit'
+            return result
+
+        CACHE_LOOKUPS.inc(indicator=self.name, result='miss')
+
+        result = self._compute(candle_data, params, request)
+        try:
+            cache.put(key, result)
+        except OSError as e:
+            # キャッシュの書き込み失敗で計算結果を捨てない
+            print(f"Failed to write indicator cache: {e}", file=sys.stderr)
+        result['metadata']['cache'] = 'miss'
+        return result
+
+    def cache_key(
+        self,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        request: IndicatorRequest
+    ) -> str:
+        """
+        結果の内容キー (入力列・name・version・結果に影響するリクエストの値・バックエンドの選択のハッシュ)
+
+        データセットの列は内容の識別子 (登録ごとの識別子とバージョン) で、それ以外は
+        input_columns の列だけをハッシュする (全列のハッシュは長い履歴では計算より遅い)
+
+        Args:
+            candle_data: 変換済みのローソク足データ配列
+            params: パラメータ辞書
+            request: 元のリクエスト
+
+        Returns:
+            キー文字列
+        """
+        options = {
+            'params': params,
+            'timeframes': request.get('timeframes'),
+            'latestOnly': request.get('latestOnly'),
+            'output': request.get('output', 'series'),
+            'timeframeAlign': request.get('timeframeAlign', 'confirmed'),
+            'backends': backend_signature()
+        }
+        if isinstance(candle_data, CandleColumns) and candle_data.source is not None:
+            return make_key(self.name, self.version, {}, options, source=candle_data.source)
+
+        columns = candle_columns(candle_data)
+        if self.input_columns is not None:
+            columns = {name: columns[name] for name in ('time',) + tuple(self.input_columns)}
+        return make_key(self.name, self.version, columns, options)
+
+    def check_limits(
+        self,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        request: IndicatorRequest
+    ) -> None:
+        """
+        系列の点数を見積もり、上限を超えるリクエストを計算前に拒否する
+        (latestOnly は計算する末尾の本数、上位足は元の時間軸に揃えた点数で数える)
+
+        Raises:
+            LimitExceededError: 推定出力点数が上限を超えている
+        """
+        points = len(candle_data)
+        latest_count = self._latest_count(request.get('latestOnly'))
+        if latest_count:
+            lookback = self.get_lookback(params)
+            if lookback is not None:
+                points = min(points, lookback + latest_count - 1)
+
+        timeframes = request.get('timeframes')
+        estimated = self.estimate_output_points(points, params)
+        if isinstance(timeframes, list):
+            estimated += len(timeframes) * self.estimate_output_points(len(candle_data), params)
+        check_output_points(estimated, request)
+
+    def _compute(
+        self,
+        candle_data: List[CandleData],
+        params: Dict[str, Any],
+        request: IndicatorRequest
+    ) -> Dict[str, Any]:
+        """compute() のキャッシュを通さない計算処理"""
+        # パラメータバリデーション
+        if not self.validate_params(params):
+            raise ValueError("Invalid parameters")
+
+        output = request.get('output', 'series')
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"output must be one of {', '.join(OUTPUT_MODES)}")
 
-            # パラメータバリデーション
-            if not self.validate_params(params):
-                raise ValueError("Invalid parameters")
+        # 最新値のみモード (スクリーナー用): 必要な末尾だけを計算する
+        latest_count = self._latest_count(request.get('latestOnly'))
+        calc_data = candle_data
+        if latest_count:
+            lookback = self.get_lookback(params)
+            if lookback is not None:
+                calc_data = candle_data[-(lookback + latest_count - 1):]
 
-            # 計算実行
-            result = self.calculate(candle_data, params)
+        timeframes = request.get('timeframes')
 
-            # メタデータ追加
-            if 'metadata' not in result:
-                result['metadata'] = {}
+        # 計算実行
+        INPUT_POINTS.observe(len(calc_data), indicator=self.name)
+        with PHASE_SECONDS.time(indicator=self.name, phase='calculate'):
+            if output == 'events':
+                result = self._events_result(calc_data, params)
+            else:
+                result = self.calculate(calc_data, params)
 
-            result['metadata']['indicator'] = self.name
-            result['metadata']['version'] = self.version
-            result['metadata']['dataPoints'] = len(candle_data)
+        # 上位足の計算 (マルチタイムフレーム)
+        if timeframes:
+            if not isinstance(timeframes, list):
+                raise ValueError("timeframes must be an array")
+            with PHASE_SECONDS.time(indicator=self.name, phase='timeframes'):
+                result['timeframes'] = self.calculate_timeframes(
+                    candle_data, params, timeframes, output, request.get('timeframeAlign', 'confirmed')
+                )
 
-            # 結果をJSONで出力
-            print(json.dumps(result, ensure_ascii=False))
+        if latest_count and output == 'events':
+            # 最新の足 (latestOnly本) で起きたイベントだけを返す (上位足はそれらの足を含む区間以降)
+            since = int(candle_columns(candle_data)['time'][-latest_count])
+            self._filter_events(result, since)
+            for timeframe, timeframe_result in result.get('timeframes', {}).items():
+                seconds = parse_timeframe(timeframe)
+                self._filter_events(timeframe_result, since // seconds * seconds)
+        elif latest_count:
+            for tail_result in [result, *result.get('timeframes', {}).values()]:
+                map_result_series(
+                    tail_result,
+                    lambda values: values[-latest_count:],
+                    lambda series: series.tail(latest_count)
+                )
+
+        # メタデータ追加
+        if 'metadata' not in result:
+            result['metadata'] = {}
+
+        result['metadata']['indicator'] = self.name
+        result['metadata']['version'] = self.version
+        result['metadata']['dataPoints'] = len(candle_data)
+        if latest_count:
+            result['metadata']['latestOnly'] = latest_count
+            result['metadata']['inputPoints'] = len(calc_data)
+
+        return result
+
+    @staticmethod
+    def _filter_events(result: Dict[str, Any], since: int) -> None:
+        result['events'] = [event for event in result['events'] if event['time'] >= since]
+        result['metadata']['eventCount'] = len(result['events'])
+
+    @staticmethod
+    def _latest_count(latest_only: Any) -> int:
+        """latestOnlyの値を返す本数に変換 (0は無効)"""
+        if latest_only is None or latest_only is False:
+            return 0
+        if latest_only is True:
+            return 1
+        if isinstance(latest_only, int) and latest_only > 0:
+            return latest_only
+        raise ValueError("latestOnly must be true or a positive integer")
+
+    def handle_request(self, request: IndicatorRequest) -> Dict[str, Any]:
+        """
+        リクエストを処理して結果辞書を返す
+
+        Args:
+            request: インジケーターリクエスト
+
+        Returns:
+            結果辞書
+        """
+        # メタデータ取得モード
+        if request.get('_mode') == 'metadata':
+            metadata = self.get_metadata()
+            metadata['success'] = True
+            return metadata
+
+        # メトリクス取得モード (Prometheusテキスト形式)
+        if request.get('_mode') == 'metrics':
+            return metrics_response()
+
+        if request.get('resultSink') is not None and request.get('output', 'series') != 'series':
+            raise ValueError("resultSink requires output 'series'")
+        if request.get('fingerprint') is not None:
+            if request.get('output', 'series') != 'series' or request.get('resultSink') is not None:
+                raise ValueError("fingerprint requires output 'series' without resultSink")
+
+        with PHASE_SECONDS.time(indicator=self.name, phase='prepare'):
+            candle_data, report = self.prepare_candles(request)
+        result = self.compute(candle_data, request.get('params', {}), request)
+        result['metadata']['sanitation'] = report
+
+        # 結果をArrow / Parquetファイルに書き出し、レスポンスには書き出し先だけを返す
+        if request.get('resultSink') is not None:
+            return {
+                'success': True,
+                'output': write_result(result, request['resultSink']),
+                'metadata': result['metadata']
+            }
+
+        # クライアントの結果と履歴が一致すれば末尾の変わった部分だけを返す
+        if request.get('fingerprint') is not None:
+            result = apply_fingerprint(result, request['fingerprint'])
+
+        return result
+
+    def error_response(self, error: Exception) -> Dict[str, Any]:
+        """
+        例外からエラーレスポンスを生成
+
+        Args:
+            error: 発生した例外
+
+        Returns:
+            エラーレスポンス辞書
+        """
+        return {
+            'success': False,
+            'error': {
+                'type': type(error).__name__,
+                'message': str(error),
+                'indicator': self.name
+            }
+        }
+
+    def run(self) -> None:
+        """
+        メイン実行処理
+        stdinからJSONを受け取り、stdoutにJSON (または圧縮したJSON) を出力
+        """
+        try:
+            # stdinからJSONリクエスト読み込み
+            input_data = sys.stdin.read()
+            request: IndicatorRequest = json.loads(input_data)
+            record_request(request, self.name)
+
+            # 'deadlineMs' を過ぎたら長い計算の区切りで止める
+            with deadline_scope(request_deadline(request, time.monotonic())):
+                result = self.handle_request(request)
+
+            # 結果をJSONで出力 (リクエストの 'compression' に従い、大きな結果は圧縮したバイト列)
+            payload = json.dumps(result, ensure_ascii=False, default=json_default).encode('utf-8')
+            output = encode_payload(payload, result, request.get('compression'))
+            sys.stdout.buffer.write(output if output is not payload else payload + b'\n')
+            sys.stdout.flush()
 
         except Exception as e:
             # エラーレスポンス
-            error_response = {
-                'success': False,
-                'error': {
-                    'type': type(e).__name__,
-                    'message': str(e),
-                    'indicator': self.name
-                }
-            }
-            print(json.dumps(error_response, ensure_ascii=False))
+            print(json.dumps(self.error_response(e), ensure_ascii=False))
             sys.exit(1)
 
 
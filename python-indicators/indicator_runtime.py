@@ -0,0 +1,364 @@
+"""
+インジケーターランタイム
+standard/ 以下のインジケーターを一度だけロードし、リクエストを名前で振り分ける
+常駐プロセス (ソケットサーバー等) から利用する
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import importlib.util
+from typing import Dict, Any, Optional
+from indicator_interface import IndicatorBase
+from thread_pool import parallel_map
+from single_flight import SingleFlight
+from result_cache import get_default_cache
+from scheduler import current_deadline, check_deadline, deadline_scope, request_deadline
+from dataset_store import get_default_store
+from backtest import run_backtest
+from metrics import REGISTRY, PHASE_SECONDS, Samples, metrics_response
+from results import json_default
+from result_delta import apply_fingerprint
+from response_compression import encode_payload
+from request_recorder import is_enabled as capture_enabled, record as record_request
+
+
+DATASET_MODES = ('registerDataset', 'appendCandles', 'dropDataset')
+
+DEFAULT_INDICATORS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'standard')
+
+
+def load_indicators(indicators_dir: str = DEFAULT_INDICATORS_DIR) -> Dict[str, IndicatorBase]:
+    """
+    ディレクトリ内のインジケータークラスをロードしてインスタンス化
+
+    Node側 (PythonExecutorService) と同じく、ファイル名をインジケーター名とする
+
+    Args:
+        indicators_dir: インジケーターのディレクトリ
+
+    Returns:
+        インジケーター名 -> インスタンス
+    """
+    indicators = {}
+
+    for file_name in sorted(os.listdir(indicators_dir)):
+        if not file_name.endswith('.py') or file_name == '__init__.py':
+            continue
+
+        name = file_name[:-3]
+        spec = importlib.util.spec_from_file_location(f'indicators.{name}', os.path.join(indicators_dir, file_name))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, IndicatorBase) and cls is not IndicatorBase and cls.__module__ == module.__name__:
+                indicators[name] = cls()
+                break
+
+    return indicators
+
+
+class IndicatorRuntime:
+    """ロード済みインジケーターへリクエストを振り分けるランタイム"""
+
+    def __init__(self, indicators_dir: str = DEFAULT_INDICATORS_DIR):
+        self.indicators = load_indicators(indicators_dir)
+        # 並行して届いた同一リクエストは一回だけ計算する
+        self.flight = SingleFlight()
+        for indicator in self.indicators.values():
+            indicator.flight = self.flight
+        # 常駐サーバーが設定する (統計の表示用)
+        self.scheduler = None
+
+        REGISTRY.register_collector(
+            'indicator_queue_depth',
+            'Requests waiting in the scheduler queue by priority class',
+            self._collect_queue_depth
+        )
+        REGISTRY.register_collector(
+            'indicator_in_flight',
+            'Distinct computations currently running',
+            lambda: [({}, self.flight.stats()['inFlight'])]
+        )
+
+    def get_indicator(self, name: Optional[str]) -> IndicatorBase:
+        """名前からインジケーターを取得"""
+        if name not in self.indicators:
+            raise ValueError(f"Unknown indicator: {name}")
+        return self.indicators[name]
+
+    def handle(self, request: Any) -> Dict[str, Any]:
+        """
+        リクエストを処理して結果辞書を返す (例外はエラーレスポンスに変換)
+
+        Args:
+            request: インジケーターリクエスト ('name' でインジケーターを指定、
+                     '_mode' が 'batch' ならバッチ、'stats' ならランタイムの統計、
+                     'metrics' ならPrometheusテキスト形式のメトリクス、
+                     'backtest' ならバックテスト (backtest.py)、
+                     'registerDataset' / 'appendCandles' / 'dropDataset' ならデータセット操作)
+
+        Returns:
+            結果辞書またはエラーレスポンス (JSONオブジェクト以外のリクエストもエラーレスポンス)
+        """
+        if not isinstance(request, dict):
+            return {
+                'success': False,
+                'error': {'type': 'ValueError', 'message': 'Request must be a JSON object'}
+            }
+
+        if current_deadline() is None and request.get('deadlineMs') is not None:
+            # 常駐サーバー以外 (zygoteの子・プロセス起動) では受け取った時点から期限を数える
+            try:
+                deadline = request_deadline(request, time.monotonic())
+            except ValueError as e:
+                return {'success': False, 'error': {'type': type(e).__name__, 'message': str(e)}}
+            with deadline_scope(deadline):
+                return self.handle(request)
+
+        if request.get('_mode') == 'stats':
+            return {'success': True, 'stats': self.stats()}
+
+        if request.get('_mode') == 'metrics':
+            return metrics_response()
+
+        if request.get('_mode') in DATASET_MODES:
+            try:
+                return self.handle_dataset(request)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': {'type': type(e).__name__, 'message': str(e)}
+                }
+
+        if request.get('_mode') == 'backtest':
+            try:
+                with PHASE_SECONDS.time(indicator='backtest', phase='compute'):
+                    return run_backtest(request, self.indicators)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': {'type': type(e).__name__, 'message': str(e)}
+                }
+
+        if request.get('_mode') == 'batch':
+            try:
+                return self.handle_batch(request)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': {'type': type(e).__name__, 'message': str(e)}
+                }
+
+        try:
+            indicator = self.get_indicator(request.get('name'))
+        except Exception as e:
+            return {
+                'success': False,
+                'error': {
+                    'type': type(e).__name__,
+                    'message': str(e),
+                    'indicator': request.get('name')
+                }
+            }
+
+        try:
+            return indicator.handle_request(request)
+        except Exception as e:
+            return indicator.error_response(e)
+
+    def handle_batch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        同じローソク足に対する複数インジケーターをスレッドプールで並行計算
+
+        リクエスト例:
+            {
+                '_mode': 'batch',
+                'candleData': [...],
+                'indicators': [
+                    {'name': 'sma', 'params': {'period': 20}},
+                    {'name': 'macd', 'params': {}}
+                ]
+            }
+
+        Args:
+            request: バッチリクエスト
+
+        Returns:
+            'results' に各インジケーターの結果 (またはエラーレスポンス) を入力順に持つ辞書
+        """
+        items = request.get('indicators')
+        if not isinstance(items, list) or len(items) == 0:
+            raise ValueError("indicators must be a non-empty array")
+
+        # ローソク足の検証と型変換は一度だけ行い、各計算で共有する
+        with PHASE_SECONDS.time(indicator='batch', phase='prepare'):
+            candle_data, report = IndicatorBase.prepare_candles(request)
+        # 期限を過ぎたら残りのインジケーターは計算しない (計算スレッドからは参照できないため先に取得)
+        deadline = current_deadline()
+
+        def compute(item: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                check_deadline(deadline)
+                indicator = self.get_indicator(item.get('name'))
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': {'type': type(e).__name__, 'message': str(e), 'indicator': item.get('name')}
+                }
+            try:
+                result = indicator.compute(candle_data, item.get('params', {}), item)
+                # 項目ごとの 'fingerprint' で末尾の差分だけを返す (単一リクエストと同じ)
+                if item.get('fingerprint') is not None:
+                    result = apply_fingerprint(result, item['fingerprint'])
+                return result
+            except Exception as e:
+                return indicator.error_response(e)
+
+        return {
+            'success': True,
+            'results': parallel_map(compute, items),
+            'metadata': {
+                'dataPoints': len(candle_data),
+                'indicators': len(items),
+                'sanitation': report
+            }
+        }
+
+    def handle_dataset(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        データセットの登録・追記・削除
+
+        リクエスト例:
+            {'_mode': 'registerDataset', 'candleData': [...], 'sanitize': {...}, 'prefixIndex': true}
+            {'_mode': 'appendCandles', 'datasetHandle': '...', 'candleData': [新しい足・更新された足]}
+            {'_mode': 'dropDataset', 'datasetHandle': '...'}
+
+        登録後のインジケーターリクエストは 'candleData' の代わりに 'datasetHandle' を指定する
+        'prefixIndex' (true または列名の配列) を指定すると累積和のインデックスを保持し、
+        SMA・ボリンジャーバンドは窓ごとの集計なしで計算する
+
+        Args:
+            request: データセットリクエスト
+
+        Returns:
+            ハンドル・本数・最後の足のtime・バージョンを持つ辞書
+        """
+        store = get_default_store()
+        mode = request['_mode']
+
+        if mode == 'dropDataset':
+            return {'success': True, 'dropped': store.drop(request.get('datasetHandle'))}
+
+        if mode == 'registerDataset':
+            candle_data, report = IndicatorBase.prepare_candles({**request, 'datasetHandle': None})
+            dataset = store.register(
+                candle_data.columns,
+                request.get('sanitize') or {},
+                request.get('datasetHandle'),
+                prefix_index=request.get('prefixIndex')
+            )
+            changes: Dict[str, Any] = {}
+        else:
+            dataset = store.get(request.get('datasetHandle'))
+            # 差分だけを登録時と同じ設定でサニタイズする
+            delta, report = IndicatorBase.prepare_candles({
+                'candleData': request.get('candleData'),
+                'sanitize': dataset.options
+            })
+            changes = dataset.append(delta.columns)
+
+        return {
+            'success': True,
+            'datasetHandle': dataset.handle,
+            'points': dataset.length,
+            'lastTime': dataset.last_time(),
+            'version': dataset.version,
+            'prefixIndex': dataset.indexed,
+            **changes,
+            'sanitation': report
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        ランタイムの統計
+
+        Returns:
+            'singleFlight' (実行数・合流数・実行中)、'cache' (ディスクキャッシュのヒット数・ミス数)、
+            'scheduler' (優先クラスごとのキュー長・処理件数)、'datasets' (データセット数・合計本数)
+            (無効なものはNone)
+        """
+        cache = get_default_cache()
+        return {
+            'datasets': get_default_store().stats(),
+            'singleFlight': self.flight.stats(),
+            'cache': cache.stats() if cache is not None else None,
+            'scheduler': self.scheduler.stats() if self.scheduler is not None else None
+        }
+
+    def _collect_queue_depth(self) -> Samples:
+        if self.scheduler is None:
+            return []
+        return [({'priority': priority}, stats['queued']) for priority, stats in self.scheduler.stats().items()]
+
+    def handle_bytes(self, payload: bytes) -> bytes:
+        """
+        JSONバイト列のリクエストを処理してJSONバイト列を返す
+
+        Args:
+            payload: UTF-8のJSONリクエスト
+
+        Returns:
+            UTF-8のJSONレスポンス (リクエストの 'compression' に従い圧縮する場合がある)
+        """
+        try:
+            request = json.loads(payload)
+        except ValueError as e:
+            return self.encode_response({
+                'success': False,
+                'error': {'type': type(e).__name__, 'message': str(e)}
+            })
+
+        request = self.capture(request)
+        compression = request.get('compression') if isinstance(request, dict) else None
+        return self.encode_response(self.handle(request), compression)
+
+    @staticmethod
+    def capture(request: Any) -> Any:
+        """
+        記録が有効ならリクエストを記録する (request_recorder.py)
+        ハンドルを省略したデータセット登録にはここでハンドルを割り当て、
+        再生時に以降のリクエストが同じハンドルを参照できるようにする
+        """
+        if not capture_enabled() or not isinstance(request, dict):
+            return request
+        if request.get('_mode') == 'registerDataset' and request.get('datasetHandle') is None:
+            request = {**request, 'datasetHandle': uuid.uuid4().hex}
+        record_request(request)
+        return request
+
+    @staticmethod
+    def encode_response(response: Dict[str, Any], compression: Any = None) -> bytes:
+        """
+        レスポンスをUTF-8のJSONバイト列に変換
+
+        Args:
+            response: レスポンス
+            compression: リクエストの 'compression' (受け付ける圧縮形式、response_compression.py)
+        """
+        payload = json.dumps(response, ensure_ascii=False, default=json_default).encode('utf-8')
+        return encode_payload(payload, response, compression)
+
+
+if __name__ == '__main__':
+    # stdin/stdoutで1リクエストを処理 (バッチリクエストをプロセス起動で使う場合)
+    request = IndicatorRuntime.capture(json.loads(sys.stdin.read()))
+    response = IndicatorRuntime().handle(request)
+    compression = request.get('compression') if isinstance(request, dict) else None
+    sys.stdout.buffer.write(IndicatorRuntime.encode_response(response, compression))
+    sys.stdout.flush()
+    sys.exit(0 if response.get('success') else 1)
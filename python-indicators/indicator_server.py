@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+インジケーターサーバー
+Unixドメインソケットで常駐し、複数接続からのパイプライン化されたリクエストを処理する
+
+フレーム形式 (リクエスト/レスポンス共通):
+    4バイト (ビッグエンディアン符号なし整数) のペイロード長 + UTF-8 JSON
+
+1接続内では複数のリクエストを応答を待たずに送信でき、レスポンスは
+リクエストと同じ順序で返る。JSONの解析と計算はイベントループ外で実行されるため、
+ソケットI/Oと計算が重なって進む。
+
+計算は優先度付きスケジューラー (scheduler.py) で実行する。リクエストの
+'priority' ('interactive' / 'batch') でキューを選び、'deadlineMs' を過ぎた
+リクエストは計算せずにエラーを返す。キューが満杯の場合は QueueFullError を返す。
+
+使い方:
+    python indicator_server.py --socket /tmp/aiblack-indicators.sock --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import struct
+import asyncio
+import argparse
+from typing import Any, Dict, Optional
+from indicator_runtime import IndicatorRuntime
+from scheduler import PriorityScheduler, DEFAULT_QUEUE_LIMITS, request_priority, request_deadline
+import thread_pool
+
+
+FRAME_HEADER = struct.Struct('>I')
+DEFAULT_SOCKET_PATH = '/tmp/aiblack-indicators.sock'
+DEFAULT_MAX_FRAME_BYTES = 256 * 1024 * 1024
+# 1接続あたりの未応答リクエスト数の上限 (超えると読み込みを止める)
+DEFAULT_MAX_PIPELINE = 64
+
+
+async def read_frame(reader: asyncio.StreamReader, max_frame_bytes: int) -> Optional[bytes]:
+    """
+    フレームを1つ読み込む
+
+    Returns:
+        ペイロード (接続が閉じられた場合はNone)
+    """
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > max_frame_bytes:
+        raise ValueError(f"Frame too large: {length} bytes (max {max_frame_bytes})")
+
+    return await reader.readexactly(length)
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """ペイロードにフレームヘッダーを付ける"""
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class IndicatorServer:
+    """Unixソケット上のインジケーターサーバー"""
+
+    def __init__(
+        self,
+        runtime: IndicatorRuntime,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        workers: int = os.cpu_count() or 1,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+        max_pipeline: int = DEFAULT_MAX_PIPELINE,
+        queue_limits: Optional[Dict[str, int]] = None,
+        reserved_interactive: Optional[int] = None
+    ):
+        self.runtime = runtime
+        self.socket_path = socket_path
+        self.scheduler = PriorityScheduler(workers, queue_limits, reserved_interactive)
+        self.runtime.scheduler = self.scheduler
+        self.max_frame_bytes = max_frame_bytes
+        self.max_pipeline = max_pipeline
+
+    async def process(self, payload: bytes, received_at: float) -> bytes:
+        """
+        1リクエストを処理してレスポンスのペイロードを返す
+
+        Args:
+            payload: UTF-8のJSONリクエスト
+            received_at: 受信時刻 (time.monotonic()、期限の起点)
+
+        Returns:
+            UTF-8のJSONレスポンス
+        """
+        loop = asyncio.get_running_loop()
+        request: Any = None
+        try:
+            # 大きなリクエストでイベントループを止めないよう、解析 (と記録) はスレッドで行う
+            request = await loop.run_in_executor(None, lambda: self.runtime.capture(json.loads(payload)))
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            future = self.scheduler.submit(
+                lambda: self.runtime.encode_response(self.runtime.handle(request), request.get('compression')),
+                request_priority(request),
+                request_deadline(request, received_at)
+            )
+            return await asyncio.wrap_future(future)
+        except Exception as e:
+            # 解析エラー・キュー満杯 (QueueFullError)・期限切れ (DeadlineExceededError)
+            error: Dict[str, Any] = {'type': type(e).__name__, 'message': str(e)}
+            if isinstance(request, dict) and request.get('name'):
+                error['indicator'] = request.get('name')
+            return self.runtime.encode_response({'success': False, 'error': error})
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """接続ごとの処理: 読み込みと書き込みを別タスクで並行させる"""
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pipeline)
+
+        async def write_responses() -> None:
+            # リクエスト順に結果を待って書き出す
+            while True:
+                future = await pending.get()
+                if future is None:
+                    break
+                writer.write(encode_frame(await future))
+                await writer.drain()
+
+        writer_task = asyncio.create_task(write_responses())
+
+        try:
+            while True:
+                payload = await read_frame(reader, self.max_frame_bytes)
+                if payload is None:
+                    break
+                future = asyncio.ensure_future(self.process(payload, time.monotonic()))
+                await pending.put(future)
+        except (ValueError, ConnectionError) as e:
+            print(f"Connection closed: {e}", file=sys.stderr)
+        finally:
+            await pending.put(None)
+            try:
+                await writer_task
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def serve(self) -> None:
+        """ソケットを開いて終了シグナルまで待機"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        print(f"Indicator server listening on {self.socket_path}", file=sys.stderr)
+
+        async with server:
+            await stop.wait()
+
+        self.scheduler.shutdown(wait=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Indicator server over a Unix domain socket')
+    parser.add_argument('--socket', default=os.environ.get('INDICATOR_SOCKET_PATH', DEFAULT_SOCKET_PATH))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=thread_pool.default_thread_count(),
+                        help='threads for parallel indicators within a batch request')
+    parser.add_argument('--max-frame-bytes', type=int, default=DEFAULT_MAX_FRAME_BYTES)
+    parser.add_argument('--max-pipeline', type=int, default=DEFAULT_MAX_PIPELINE)
+    parser.add_argument('--interactive-queue', type=int, default=DEFAULT_QUEUE_LIMITS['interactive'],
+                        help='max queued interactive requests before rejecting')
+    parser.add_argument('--batch-queue', type=int, default=DEFAULT_QUEUE_LIMITS['batch'],
+                        help='max queued batch requests before rejecting')
+    parser.add_argument('--reserved-workers', type=int, default=None,
+                        help='workers reserved for interactive requests (default: 1 when workers > 1)')
+    args = parser.parse_args()
+
+    thread_pool.configure(args.threads)
+    server = IndicatorServer(
+        IndicatorRuntime(),
+        socket_path=args.socket,
+        workers=args.workers,
+        max_frame_bytes=args.max_frame_bytes,
+        max_pipeline=args.max_pipeline,
+        queue_limits={'interactive': args.interactive_queue, 'batch': args.batch_queue},
+        reserved_interactive=args.reserved_workers
+    )
+    asyncio.run(server.serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+JITコンパイル版カーネル (numba)
+再帰的でnumpyのベクトル化ができない計算 (EMA, Wilder平滑化等) を機械語で実行する
+TALibWrapperのnumpy実装と同じ式・同じNaNの位置で計算する
+
+numbaはオプション依存 (未インストール時は NUMBA_AVAILABLE が False)
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def sma_kernel(close, period):
+        """SMA (窓ごとの合計を逐次更新)"""
+        count = len(close)
+        result = np.full(count, np.nan)
+        if count < period:
+            return result
+
+        total = 0.0
+        for i in range(period):
+            total += close[i]
+        result[period - 1] = total / period
+
+        for i in range(period, count):
+            total += close[i] - close[i - period]
+            result[i] = total / period
+        return result
+
+    @njit(cache=True)
+    def ema_kernel(close, period):
+        """EMA (最初のperiod本のSMAを初期値とする)"""
+        count = len(close)
+        result = np.full(count, np.nan)
+        if count < period:
+            return result
+
+        multiplier = 2.0 / (period + 1)
+        result[period - 1] = np.mean(close[:period])
+        for i in range(period, count):
+            result[i] = (close[i] - result[i - 1]) * multiplier + result[i - 1]
+        return result
+
+    @njit(cache=True)
+    def rsi_kernel(close, period):
+        """RSI (Wilder平滑化)"""
+        count = len(close)
+        result = np.full(count, np.nan)
+        if count <= period:
+            return result
+
+        avg_gain = 0.0
+        avg_loss = 0.0
+        for i in range(1, period + 1):
+            delta = close[i] - close[i - 1]
+            if delta > 0:
+                avg_gain += delta
+            else:
+                avg_loss -= delta
+        avg_gain /= period
+        avg_loss /= period
+        result[period] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss) if avg_loss != 0 else (
+            100.0 if avg_gain != 0 else np.nan
+        )
+
+        for i in range(period + 1, count):
+            delta = close[i] - close[i - 1]
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
+            if avg_loss != 0:
+                result[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+            else:
+                result[i] = 100.0 if avg_gain != 0 else np.nan
+        return result
+
+    @njit(cache=True)
+    def wilder_kernel(values, period, start):
+        """Wilder平滑化 (values[start:start+period]の平均を初期値とする)"""
+        count = len(values)
+        result = np.full(count, np.nan)
+        seed_end = start + period
+        if count < seed_end:
+            return result
+
+        average = 0.0
+        for i in range(start, seed_end):
+            average += values[i]
+        average /= period
+        result[seed_end - 1] = average
+
+        for i in range(seed_end, count):
+            average = (average * (period - 1) + values[i]) / period
+            result[i] = average
+        return result
+
+    @njit(cache=True)
+    def ema_continue_kernel(values, previous, multiplier):
+        """EMAの続き (直前の値 previous から values を平滑化、チャンク分割計算用)"""
+        result = np.empty(len(values))
+        for i in range(len(values)):
+            previous = (values[i] - previous) * multiplier + previous
+            result[i] = previous
+        return result
+
+    @njit(cache=True)
+    def wilder_continue_kernel(values, previous, period):
+        """Wilder平滑化の続き (直前の平均 previous から values を平滑化、チャンク分割計算用)"""
+        result = np.empty(len(values))
+        for i in range(len(values)):
+            previous = (previous * (period - 1) + values[i]) / period
+            result[i] = previous
+        return result
+
+    @njit(cache=True)
+    def _two_sum(a, b):
+        """(fl(a + b), 丸め誤差)"""
+        total = a + b
+        b_virtual = total - a
+        return total, (a - (total - b_virtual)) + (b - b_virtual)
+
+    @njit(cache=True)
+    def _two_product(a, b):
+        """(fl(a * b), 丸め誤差) (Dekkerの分割)"""
+        product = a * b
+        scaled = 134217729.0 * a
+        a_high = scaled - (scaled - a)
+        a_low = a - a_high
+        scaled = 134217729.0 * b
+        b_high = scaled - (scaled - b)
+        b_low = b - b_high
+        return product, ((a_high * b_high - product) + a_high * b_low + a_low * b_high) + a_low * b_low
+
+    @njit(cache=True)
+    def prefix_window_kernel(prefix, period, reference, ddof, with_std):
+        """
+        累積和のインデックス (prefix_index.py) からの移動平均と移動標準偏差
+        prefix_index.PrefixSumIndex の rolling_mean / rolling_std と同じ倍精度2つ分の計算を1回の走査で行う
+        """
+        count = prefix.shape[1] - 1
+        mean = np.full(count, np.nan)
+        std = np.full(count, np.nan)
+        if period < 1 or count < period:
+            return mean, std
+
+        for i in range(period, count + 1):
+            total, error = _two_sum(prefix[0, i], -prefix[0, i - period])
+            total_lo = error + (prefix[1, i] - prefix[1, i - period])
+            mean[i - 1] = reference + (total + total_lo) / period
+            if not with_std or period <= ddof:
+                continue
+
+            squares, error = _two_sum(prefix[2, i], -prefix[2, i - period])
+            squares_lo = error + (prefix[3, i] - prefix[3, i - period])
+            scaled, scaled_error = _two_product(float(period), squares)
+            scaled_error += period * squares_lo
+            squared, squared_error = _two_product(total, total)
+            squared_error += 2.0 * total * total_lo
+            difference, error = _two_sum(scaled, -squared)
+            centered = (difference + (error + (scaled_error - squared_error))) / period
+            std[i - 1] = np.sqrt(max(centered, 0.0) / (period - ddof))
+        return mean, std
@@ -0,0 +1,230 @@
+"""
+ランタイムのメトリクス
+カウンター・ヒストグラムをプロセス内に保持し、Prometheusのテキスト形式で出力する
+({'_mode': 'metrics'} リクエストで取得)
+
+prometheus_client には依存せず、必要な機能 (ラベル付きカウンター、
+累積バケットのヒストグラム、出力時に値を読むゲージ) だけを実装している
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+# 処理時間 (秒) のバケット
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 入力本数のバケット
+SIZE_BUCKETS = (100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 10_000_000)
+
+# (ラベルの辞書, 値) の一覧
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """ラベル付きカウンター"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            labels = dict(zip(self.label_names, key))
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """ラベル付きヒストグラム (累積バケット・合計・件数)"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル -> [バケットごとの件数 (+Infを含む), 合計]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """with ブロックの経過時間 (秒) を記録"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        for key, (counts, total) in items:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket_labels = {**labels, 'le': _format_value(bound)}
+                lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """メトリクスの登録とテキスト形式での出力"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Samples]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(
+        self,
+        name: str,
+        help_text: str,
+        collect: Callable[[], Samples],
+        metric_type: str = 'gauge'
+    ) -> None:
+        """
+        出力時に値を読むメトリクスを登録 (キュー長など、他のオブジェクトが持つ値用)
+        同じ名前で登録し直すと置き換える
+
+        Args:
+            name: メトリクス名
+            help_text: 説明
+            collect: (ラベル, 値) の一覧を返す関数
+            metric_type: 'gauge' または 'counter'
+        """
+        with self._lock:
+            self._collectors = [entry for entry in self._collectors if entry[0] != name]
+            self._collectors.append((name, help_text, metric_type, collect))
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式 (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        for name, help_text, metric_type, collect in collectors:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in collect():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter(
+    'indicator_requests_total',
+    'Indicator computations by result status',
+    ('indicator', 'status')
+)
+PHASE_SECONDS = REGISTRY.histogram(
+    'indicator_phase_seconds',
+    'Time spent per indicator and processing phase',
+    ('indicator', 'phase')
+)
+INPUT_POINTS = REGISTRY.histogram(
+    'indicator_input_points',
+    'Number of candles per indicator computation',
+    ('indicator',),
+    SIZE_BUCKETS
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'indicator_cache_lookups_total',
+    'Disk result cache lookups by result',
+    ('indicator', 'result')
+)
+COALESCED = REGISTRY.counter(
+    'indicator_coalesced_total',
+    'Requests that shared the result of an identical in-flight computation',
+    ('indicator',)
+)
+BACKEND_CALLS = REGISTRY.counter(
+    'indicator_backend_calls_total',
+    'TALibWrapper function calls by selected backend',
+    ('function', 'backend')
+)
+
+
+def metrics_response() -> Dict[str, Any]:
+    """{'_mode': 'metrics'} リクエストへのレスポンス"""
+    return {
+        'success': True,
+        'contentType': 'text/plain; version=0.0.4',
+        'metrics': REGISTRY.render()
+    }
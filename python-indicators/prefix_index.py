@@ -0,0 +1,227 @@
+"""
+累積和インデックス (データセットの窓平均・標準偏差)
+列の累積和と累積二乗和を補償加算 (累積値 + 丸め誤差の累積) で保持し、
+任意の窓 [start, stop) の平均・標準偏差を O(1)、全体の移動平均・移動標準偏差を
+窓ごとの集計なしの O(n) で求める
+
+    index = PrefixSumIndex.build(close)
+    index.window_mean(100, 120)        # close[100:120].mean()
+    index.rolling_std(20)              # 母標準偏差の移動値 (TA-LibのBBANDSと同じ)
+
+- 値は最初の値 (reference) を引いてから足し込む。価格の水準が大きくても二乗和の桁落ちが小さい
+- 累積和は np.cumsum の各加算の丸め誤差を TwoSum で求めて別の配列に累積する
+  (倍精度2つ分の精度になり、長いデータセットでも窓の合計の誤差が増えない)
+- 窓の合計は累積値の差と誤差の配列の差を合わせて求め、標準偏差の
+  count * 二乗の合計 - 合計^2 も倍精度2つ分で計算する (値の水準に対してばらつきが小さくても桁落ちしない)
+- 末尾に足を追加する場合は extend_prefix() で追加分だけを計算する
+
+dataset_store.py の登録時に 'prefixIndex' を指定したデータセットで作られ、
+追記のたびに更新される。SMA・ボリンジャーバンドは candle_index() でインデックスを取り出して使う
+"""
+
+import numpy as np
+from typing import Optional, Tuple, Union
+from jit_kernels import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from jit_kernels import prefix_window_kernel
+
+
+# 累積値の配列の行 (累積和の上位・下位、累積二乗和の上位・下位)
+SUM_HI, SUM_LO, SQUARE_HI, SQUARE_LO = range(4)
+PREFIX_ROWS = 4
+
+
+def _two_sum(a: np.ndarray, b: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """total = fl(a + b) の丸め誤差 (a + b - total を正確に求める)"""
+    b_virtual = total - a
+    a_virtual = total - b_virtual
+    return (a - a_virtual) + (b - b_virtual)
+
+
+def _split(a):
+    """Dekkerの分割 (上位・下位の26ビットずつ)"""
+    scaled = 134217729.0 * a
+    high = scaled - (scaled - a)
+    return high, a - high
+
+
+def _two_product(a, b):
+    """(fl(a * b), a * b - fl(a * b)) を正確に求める"""
+    product = a * b
+    a_high, a_low = _split(a)
+    b_high, b_low = _split(b)
+    return product, ((a_high * b_high - product) + a_high * b_low + a_low * b_high) + a_low * b_low
+
+
+def compensated_cumsum(
+    values: np.ndarray, hi: float = 0.0, lo: float = 0.0, values_lo: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    補償加算の累積和
+
+    Args:
+        values: 足し込む値
+        hi: 累積和の初期値 (上位)
+        lo: 累積和の初期値 (丸め誤差の累積)
+        values_lo: 値の下位 (値自体が丸められている場合の誤差、丸め誤差と一緒に累積する)
+
+    Returns:
+        (累積和, 丸め誤差の累積) で、累積和の真の値は両者の和
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.empty(0), np.empty(0)
+    # np.cumsum は先頭から順に足すため、各加算の前の値は1つ前の累積和
+    totals = np.cumsum(np.concatenate(([hi], values)))
+    errors = _two_sum(totals[:-1], values, totals[1:])
+    if values_lo is not None:
+        errors += values_lo
+    return totals[1:], lo + np.cumsum(errors)
+
+
+def extend_prefix(prefix: np.ndarray, values: np.ndarray, start: int, reference: float) -> None:
+    """
+    累積値の配列に値を追加する (prefix[:, start] を初期値として prefix[:, start+1:] に書き込む)
+
+    Args:
+        prefix: (PREFIX_ROWS, 本数 + 1) の配列 (start + len(values) + 1 列以上)
+        values: 追加する値
+        start: 追加する最初の値の位置
+        reference: 足し込む前に引く値
+    """
+    stop = start + len(values) + 1
+    shifted = np.asarray(values, dtype=np.float64) - reference
+    prefix[SUM_HI, start + 1:stop], prefix[SUM_LO, start + 1:stop] = compensated_cumsum(
+        shifted, prefix[SUM_HI, start], prefix[SUM_LO, start]
+    )
+    # 二乗の丸め誤差も下位に足し込む
+    squares, squares_lo = _two_product(shifted, shifted)
+    prefix[SQUARE_HI, start + 1:stop], prefix[SQUARE_LO, start + 1:stop] = compensated_cumsum(
+        squares, prefix[SQUARE_HI, start], prefix[SQUARE_LO, start], squares_lo
+    )
+
+
+def _difference(hi: np.ndarray, lo: np.ndarray, start: Union[int, slice], stop: Union[int, slice]):
+    """
+    累積値の差 stop - start (位置はスライスでもよい)
+
+    Returns:
+        (上位, 下位) で、差の真の値は両者の和 (上位の差の丸め誤差も下位に含める)
+    """
+    a, b = hi[stop], hi[start]
+    difference = a - b
+    return difference, _two_sum(a, -b, difference) + (lo[stop] - lo[start])
+
+
+def _centered_squares(total, squares, count: int):
+    """
+    窓の偏差平方和 sum((x - mean)^2) = (count * 二乗の合計 - 合計^2) / count
+
+    値の水準に対して窓のばらつきが小さいと引き算で桁落ちするため、
+    積と差を倍精度2つ分で計算してから最後に丸める
+    """
+    total_hi, total_lo = total
+    squares_hi, squares_lo = squares
+    scaled, scaled_error = _two_product(float(count), squares_hi)
+    scaled_error = scaled_error + count * squares_lo
+    squared, squared_error = _two_product(total_hi, total_hi)
+    squared_error = squared_error + 2.0 * total_hi * total_lo
+    difference = scaled - squared
+    error = _two_sum(scaled, -squared, difference) + (scaled_error - squared_error)
+    return (difference + error) / count
+
+
+class PrefixSumIndex:
+    """1つの列の累積和・累積二乗和 (読み取り専用)"""
+
+    __slots__ = ('prefix', 'reference')
+
+    def __init__(self, prefix: np.ndarray, reference: float):
+        """
+        Args:
+            prefix: (PREFIX_ROWS, 本数 + 1) の累積値 (先頭の列は窓の始点より前の値)
+            reference: 足し込む前に引いた値
+        """
+        self.prefix = prefix
+        self.reference = reference
+
+    @classmethod
+    def build(cls, values: np.ndarray) -> 'PrefixSumIndex':
+        """値の配列からインデックスを作る"""
+        values = np.asarray(values, dtype=np.float64)
+        if not np.all(np.isfinite(values)):
+            raise ValueError("prefixIndex requires finite values")
+        reference = float(values[0]) if len(values) else 0.0
+        prefix = np.zeros((PREFIX_ROWS, len(values) + 1))
+        extend_prefix(prefix, values, 0, reference)
+        return cls(prefix, reference)
+
+    def __len__(self) -> int:
+        return self.prefix.shape[1] - 1
+
+    def __getitem__(self, key: slice) -> 'PrefixSumIndex':
+        """連続する範囲のインデックス (コピーしない)"""
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("PrefixSumIndex supports only contiguous slices")
+        return PrefixSumIndex(self.prefix[:, start:max(start, stop) + 1], self.reference)
+
+    def _moments(self, start, stop):
+        """窓 [start, stop) の reference を引いた値の合計と二乗の合計 (それぞれ (上位, 下位))"""
+        total = _difference(self.prefix[SUM_HI], self.prefix[SUM_LO], start, stop)
+        squares = _difference(self.prefix[SQUARE_HI], self.prefix[SQUARE_LO], start, stop)
+        return total, squares
+
+    def _check_window(self, start: int, stop: int) -> None:
+        if not 0 <= start < stop <= len(self):
+            raise ValueError(f"Window [{start}, {stop}) is outside 0..{len(self)} or empty")
+
+    def window_sum(self, start: int, stop: int) -> float:
+        """values[start:stop] の合計"""
+        self._check_window(start, stop)
+        (total_hi, total_lo), _ = self._moments(start, stop)
+        return float((total_hi + total_lo) + self.reference * (stop - start))
+
+    def window_mean(self, start: int, stop: int) -> float:
+        """values[start:stop] の平均"""
+        self._check_window(start, stop)
+        (total_hi, total_lo), _ = self._moments(start, stop)
+        return float(self.reference + (total_hi + total_lo) / (stop - start))
+
+    def window_std(self, start: int, stop: int, ddof: int = 0) -> float:
+        """values[start:stop] の標準偏差 (ddof=0 で母標準偏差)"""
+        self._check_window(start, stop)
+        count = stop - start
+        if count <= ddof:
+            return float('nan')
+        total, squares = self._moments(start, stop)
+        return float(np.sqrt(max(_centered_squares(total, squares, count), 0.0) / (count - ddof)))
+
+    def _rolling(self, period: int):
+        """全ての窓 (長さ period) の合計と二乗の合計 (窓の終点の位置に揃える前)"""
+        return self._moments(slice(0, len(self) - period + 1), slice(period, len(self) + 1))
+
+    def rolling_mean(self, period: int) -> np.ndarray:
+        """移動平均 (最初の period - 1 本はNaN)"""
+        if NUMBA_AVAILABLE:
+            return prefix_window_kernel(self.prefix, period, self.reference, 0, False)[0]
+
+        result = np.full(len(self), np.nan)
+        if period < 1 or len(self) < period:
+            return result
+        (total_hi, total_lo), _ = self._rolling(period)
+        result[period - 1:] = self.reference + (total_hi + total_lo) / period
+        return result
+
+    def rolling_std(self, period: int, ddof: int = 0) -> np.ndarray:
+        """移動標準偏差 (最初の period - 1 本はNaN、ddof=0 で母標準偏差)"""
+        if NUMBA_AVAILABLE:
+            return prefix_window_kernel(self.prefix, period, self.reference, ddof, True)[1]
+
+        result = np.full(len(self), np.nan)
+        if period < 1 or len(self) < period or period <= ddof:
+            return result
+        total, squares = self._rolling(period)
+        result[period - 1:] = np.sqrt(np.maximum(_centered_squares(total, squares, period), 0.0) / (period - ddof))
+        return result
@@ -0,0 +1,234 @@
+"""
+値幅カーネル (ATR / ADX・DMI / ストキャスティクス共通)
+高値・安値・終値から真の値幅 (TR) と方向性変化 (+DM/-DM) を一度だけ計算し、
+Wilder平滑化や期間ごとの最高値・最安値と合わせてメモ化する
+
+同じ列に対して ATR・ADX・ストキャスティクスを計算する場合
+(バッチリクエスト等) は、get_kernel が同じカーネルを返すため
+high/low/close の走査は一回で済む
+"""
+
+import threading
+import numpy as np
+from typing import Dict, Any, Tuple
+from collections import OrderedDict
+from numpy.lib.stride_tricks import sliding_window_view
+from jit_kernels import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from jit_kernels import wilder_kernel
+
+
+# メモ化するカーネル数 (列の組ごと)
+MAX_KERNELS = 8
+
+
+def wilder_smooth(values: np.ndarray, period: int, start: int = 0) -> np.ndarray:
+    """
+    Wilder平滑化 (平滑化係数 1/period のEMA)
+
+    Args:
+        values: 入力配列
+        period: 期間
+        start: 有効な値が始まるインデックス (それより前は無視)
+
+    Returns:
+        values[start:start+period] の平均を start+period-1 の位置の初期値とし、
+        以降を再帰的に平滑化した配列 (それより前はNaN)
+    """
+    if NUMBA_AVAILABLE:
+        return wilder_kernel(np.ascontiguousarray(values, dtype=np.float64), period, start)
+
+    count = len(values)
+    result = np.full(count, np.nan)
+    seed_end = start + period
+    if count < seed_end:
+        return result
+
+    average = float(np.mean(values[start:seed_end]))
+    result[seed_end - 1] = average
+    for i, value in enumerate(values[seed_end:].tolist(), seed_end):
+        average = (average * (period - 1) + value) / period
+        result[i] = average
+    return result
+
+
+def _sma(values: np.ndarray, period: int) -> np.ndarray:
+    """先頭のNaNを飛ばした単純移動平均"""
+    result = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0 or len(values) - valid[0] < period:
+        return result
+    start = valid[0]
+    result[start + period - 1:] = sliding_window_view(values[start:], period).mean(axis=1)
+    return result
+
+
+def _directional_smooth(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    +DI/-DI 用のWilder平滑化 (TA-LibのPLUS_DI/MINUS_DI/ADXと同じ初期値)
+
+    TA-Libは values[1:period] (period-1本) の合計を初期値とし、period の位置から
+    合計 - 合計/period + 値 で平滑化する。合計/period はWilder平滑化と同じ漸化式になるため、
+    先頭を0にした配列の values[0:period] の平均を初期値として平滑化する (DIは比なので倍率は消える)
+
+    Returns:
+        period の位置から有効な配列 (ATRの初期値 values[1:period+1] の平均とは異なる)
+    """
+    seeded = np.array(values, dtype=np.float64)
+    if len(seeded):
+        seeded[0] = 0.0
+    result = wilder_smooth(seeded, period, 0)
+    result[:period] = np.nan
+    return result
+
+
+class RangeKernel:
+    """高値・安値・終値の組に対する値幅計算 (結果はメモ化)"""
+
+    __slots__ = ('high', 'low', 'close', '_cache', '_lock')
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self._cache: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def _memo(self, key: Any, compute):
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        value = compute()
+        with self._lock:
+            return self._cache.setdefault(key, value)
+
+    def components(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        真の値幅と方向性変化 (1回の走査で計算)
+
+        Returns:
+            (TR, +DM, -DM) 先頭は前の足がないためNaN
+        """
+        return self._memo('components', self._components)
+
+    def _components(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        high, low, close = self.high, self.low, self.close
+        count = len(close)
+        true_range = np.full(count, np.nan)
+        plus_dm = np.full(count, np.nan)
+        minus_dm = np.full(count, np.nan)
+        if count < 2:
+            return true_range, plus_dm, minus_dm
+
+        previous_close = close[:-1]
+        true_range[1:] = np.maximum(
+            high[1:] - low[1:],
+            np.maximum(np.abs(high[1:] - previous_close), np.abs(low[1:] - previous_close))
+        )
+
+        up_move = high[1:] - high[:-1]
+        down_move = low[:-1] - low[1:]
+        plus_dm[1:] = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm[1:] = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+
+        return true_range, plus_dm, minus_dm
+
+    def atr(self, period: int) -> np.ndarray:
+        """平均真の範囲 (最初の値はTRのperiod本平均、以降はWilder平滑化)"""
+        return self._memo(('atr', period), lambda: wilder_smooth(self.components()[0], period, 1))
+
+    def directional(self, period: int) -> Dict[str, np.ndarray]:
+        """
+        方向性指数 (DMI) と ADX (TA-LibのPLUS_DI/MINUS_DI/DX/ADXと同じ)
+
+        Returns:
+            {'plusDI', 'minusDI', 'dx', 'adx'}
+            +DI/-DI は period、ADX は 2*period-1 のインデックスから有効
+        """
+        return self._memo(('directional', period), lambda: self._directional(period))
+
+    def _directional(self, period: int) -> Dict[str, np.ndarray]:
+        true_range, plus_dm, minus_dm = self.components()
+        atr = _directional_smooth(true_range, period)
+        smoothed_plus = _directional_smooth(plus_dm, period)
+        smoothed_minus = _directional_smooth(minus_dm, period)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            plus_di = np.where(atr != 0, 100 * smoothed_plus / atr, 0.0)
+            minus_di = np.where(atr != 0, 100 * smoothed_minus / atr, 0.0)
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum != 0, 100 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+
+        # 平均の分母が0でない位置でも、初期値より前はNaNのまま
+        invalid = np.isnan(atr)
+        plus_di[invalid] = np.nan
+        minus_di[invalid] = np.nan
+        dx[invalid] = np.nan
+
+        return {
+            'plusDI': plus_di,
+            'minusDI': minus_di,
+            'dx': dx,
+            'adx': wilder_smooth(dx, period, period)
+        }
+
+    def extremes(self, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        """期間ごとの最高値・最安値 (period-1 本目まではNaN)"""
+        return self._memo(('extremes', period), lambda: self._extremes(period))
+
+    def _extremes(self, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(self.close)
+        highest = np.full(count, np.nan)
+        lowest = np.full(count, np.nan)
+        if count >= period:
+            highest[period - 1:] = sliding_window_view(self.high, period).max(axis=1)
+            lowest[period - 1:] = sliding_window_view(self.low, period).min(axis=1)
+        return highest, lowest
+
+    def stochastic(self, fastk_period: int, slowk_period: int, slowd_period: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        スローストキャスティクス (移動平均はSMA)
+
+        Returns:
+            (slowK, slowD) 高値と安値が同じ期間の%Kは0
+        """
+        key = ('stochastic', fastk_period, slowk_period, slowd_period)
+        return self._memo(key, lambda: self._stochastic(fastk_period, slowk_period, slowd_period))
+
+    def _stochastic(self, fastk_period: int, slowk_period: int, slowd_period: int) -> Tuple[np.ndarray, np.ndarray]:
+        highest, lowest = self.extremes(fastk_period)
+        value_range = highest - lowest
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fast_k = np.where(value_range > 0, 100 * (self.close - lowest) / value_range, 0.0)
+        fast_k[np.isnan(value_range)] = np.nan
+
+        slow_k = _sma(fast_k, slowk_period)
+        slow_d = _sma(slow_k, slowd_period)
+        # slowDが揃う位置から両方を出力する (TA-Libと同じ)
+        slow_k[np.isnan(slow_d)] = np.nan
+        return slow_k, slow_d
+
+
+_kernels: 'OrderedDict[Tuple[int, int, int], RangeKernel]' = OrderedDict()
+_kernels_lock = threading.Lock()
+
+
+def get_kernel(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> RangeKernel:
+    """
+    列の組に対するカーネルを返す (同じ配列オブジェクトなら同じカーネル)
+
+    カーネルが配列への参照を持つため、メモ化している間は配列のidが再利用されない
+    """
+    key = (id(high), id(low), id(close))
+    with _kernels_lock:
+        kernel = _kernels.get(key)
+        if kernel is not None and kernel.high is high and kernel.low is low and kernel.close is close:
+            _kernels.move_to_end(key)
+            return kernel
+
+        kernel = RangeKernel(high, low, close)
+        _kernels[key] = kernel
+        while len(_kernels) > MAX_KERNELS:
+            _kernels.popitem(last=False)
+        return kernel
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+記録したリクエストの再生 (負荷試験)
+request_recorder.py が記録した JSON Lines を、指定した実行方式に指定した並列数・レートで送り、
+スループット・レイテンシ (p50/p95/p99)・メモリ使用量 (RSS) を出力する
+
+実行方式:
+    spawn:   リクエストごとに standard/<name>.py を起動 (Node の既定の方式)
+    socket:  常駐サーバー (indicator_server.py) にワーカーごとの接続で送る
+    zygote:  zygoteサーバー (zygote.py) にリクエストごとの接続で送る
+    runtime: このプロセス内の IndicatorRuntime で直接処理する (計算だけの基準値)
+
+--rate を指定すると一定間隔でリクエストを開始し (オープンループ)、レイテンシは予定時刻から
+計測する (待ち時間を含む)。省略時は各ワーカーが前のリクエストの完了後すぐに次を送る。
+同じデータセットハンドルのリクエストは記録順に実行する。spawn ではデータセットを
+保持できないため、データセット操作とハンドルを参照するリクエストは送らない。
+
+使い方:
+    INDICATOR_CAPTURE_FILE=/tmp/capture.jsonl npm start   # 記録
+    python replay.py /tmp/capture.jsonl --mode spawn --concurrency 4
+    python replay.py /tmp/capture.jsonl --mode socket --socket /tmp/aiblack-indicators.sock \\
+        --concurrency 16 --rate 200 --server-pid $(pgrep -f indicator_server.py)
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import threading
+import subprocess
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from indicator_server import DEFAULT_SOCKET_PATH, DEFAULT_MAX_FRAME_BYTES, encode_frame
+from zygote import DEFAULT_SOCKET_PATH as DEFAULT_ZYGOTE_SOCKET_PATH, recv_frame
+from response_compression import decompress
+
+
+MODES = ('spawn', 'socket', 'zygote', 'runtime')
+DATASET_MODES = ('registerDataset', 'appendCandles', 'dropDataset')
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# RSSを読む間隔 (秒)
+RSS_INTERVAL = 0.1
+
+
+def load_capture(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    記録ファイルを読み込む
+
+    Args:
+        path: JSON Lines ファイル
+        limit: 読み込む最大件数
+
+    Returns:
+        {'indicator', 'request'} の一覧 (記録順)
+    """
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if not isinstance(entry.get('request'), dict):
+                raise ValueError(f"Invalid capture entry in {path}: missing 'request'")
+            entries.append(entry)
+            if limit is not None and len(entries) >= limit:
+                break
+    return entries
+
+
+class SpawnTarget:
+    """リクエストごとにインジケーターのプロセスを起動する"""
+
+    def __init__(self, python: str = sys.executable):
+        self.python = python
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        request = entry['request']
+        return request.get('_mode') not in DATASET_MODES and request.get('datasetHandle') is None
+
+    def send(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        request = entry['request']
+        if request.get('_mode') == 'batch':
+            script = os.path.join(BASE_DIR, 'indicator_runtime.py')
+        else:
+            script = os.path.join(BASE_DIR, 'standard', f"{entry.get('indicator') or request.get('name')}.py")
+
+        completed = subprocess.run(
+            [self.python, script],
+            input=json.dumps(request).encode('utf-8'),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=BASE_DIR
+        )
+        return json.loads(decompress(completed.stdout))
+
+
+class SocketTarget:
+    """フレーム形式のソケットサーバーに送る"""
+
+    def __init__(self, socket_path: str, per_request: bool):
+        """
+        Args:
+            socket_path: Unixソケットのパス
+            per_request: リクエストごとに接続する (zygote)、Falseならワーカーごとに接続を使い回す
+        """
+        self.socket_path = socket_path
+        self.per_request = per_request
+        self._local = threading.local()
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        return True
+
+    def _connect(self) -> socket.socket:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(self.socket_path)
+        return conn
+
+    def send(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        payload = encode_frame(json.dumps(entry['request']).encode('utf-8'))
+
+        if self.per_request:
+            with self._connect() as conn:
+                conn.sendall(payload)
+                response = recv_frame(conn, DEFAULT_MAX_FRAME_BYTES)
+        else:
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            conn.sendall(payload)
+            response = recv_frame(conn, DEFAULT_MAX_FRAME_BYTES)
+
+        if response is None:
+            raise ConnectionError("Connection closed before the response")
+        return json.loads(decompress(response))
+
+
+class RuntimeTarget:
+    """このプロセス内の IndicatorRuntime で処理する"""
+
+    def __init__(self):
+        from indicator_runtime import IndicatorRuntime
+        self.runtime = IndicatorRuntime()
+
+    def accepts(self, entry: Dict[str, Any]) -> bool:
+        return True
+
+    def send(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return json.loads(decompress(self.runtime.handle_bytes(json.dumps(entry['request']).encode('utf-8'))))
+
+
+def _process_tree_rss(pid: int) -> int:
+    """プロセスと子孫プロセスのRSSの合計 (バイト)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            # 計測中に終了したプロセス
+            continue
+    return total
+
+
+class RssSampler:
+    """一定間隔でプロセスツリーのRSSを読み、最大値と最後の値を保持する"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = 0
+        self.last = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> 'RssSampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _sample(self) -> None:
+        self.last = _process_tree_rss(self.pid)
+        self.peak = max(self.peak, self.last)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(RSS_INTERVAL)
+
+
+class _HandleOrder:
+    """同じデータセットハンドルのリクエストを記録順に実行させる"""
+
+    def __init__(self):
+        self._next: Dict[str, int] = {}
+        self._condition = threading.Condition()
+
+    def wait_turn(self, handle: str, sequence: int) -> None:
+        with self._condition:
+            while self._next.get(handle, 0) != sequence:
+                self._condition.wait()
+
+    def done(self, handle: str) -> None:
+        with self._condition:
+            self._next[handle] = self._next.get(handle, 0) + 1
+            self._condition.notify_all()
+
+
+def replay(
+    entries: List[Dict[str, Any]],
+    target: Any,
+    concurrency: int = 1,
+    rate: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    リクエストを再生する
+
+    Args:
+        entries: 記録したリクエスト
+        target: 送信先 (accepts / send を持つ)
+        concurrency: 並列数
+        rate: 毎秒の開始件数 (Noneなら完了次第すぐに次を送る)
+
+    Returns:
+        件数・エラー数・所要時間・レイテンシ (秒) の一覧を持つ辞書
+    """
+    accepted = [entry for entry in entries if target.accepts(entry)]
+
+    # ハンドルごとの実行順 (0から)
+    sequences: List[Optional[Tuple[str, int]]] = []
+    counts: Dict[str, int] = {}
+    for entry in accepted:
+        handle = entry['request'].get('datasetHandle')
+        if isinstance(handle, str):
+            sequences.append((handle, counts.get(handle, 0)))
+            counts[handle] = counts.get(handle, 0) + 1
+        else:
+            sequences.append(None)
+
+    order = _HandleOrder()
+    lock = threading.Lock()
+    next_index = [0]
+    latencies: List[Tuple[str, float]] = []
+    errors: Dict[str, int] = {}
+    start = time.perf_counter()
+
+    def worker() -> None:
+        while True:
+            with lock:
+                index = next_index[0]
+                if index >= len(accepted):
+                    return
+                next_index[0] += 1
+
+            entry = accepted[index]
+            scheduled = start + index / rate if rate else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            sequence = sequences[index]
+            if sequence is not None:
+                order.wait_turn(*sequence)
+
+            began = time.perf_counter()
+            try:
+                response = target.send(entry)
+                error = None if response.get('success') else (response.get('error') or {}).get('type', 'Error')
+            except Exception as e:
+                error = type(e).__name__
+            finished = time.perf_counter()
+
+            if sequence is not None:
+                order.done(sequence[0])
+
+            name = entry['request'].get('_mode') or entry.get('indicator') or entry['request'].get('name')
+            with lock:
+                latencies.append((str(name), finished - (scheduled if scheduled is not None else began)))
+                if error is not None:
+                    errors[error] = errors.get(error, 0) + 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'requests': len(accepted),
+        'skipped': len(entries) - len(accepted),
+        'errors': errors,
+        'durationSeconds': time.perf_counter() - start,
+        'latencies': latencies
+    }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    array = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(array.max()), 3),
+        'mean': round(float(array.mean()), 3)
+    }
+
+
+def summarize(result: Dict[str, Any], mode: str, concurrency: int, rate: Optional[float]) -> Dict[str, Any]:
+    """再生結果を集計したレポート (レイテンシはミリ秒)"""
+    by_name: Dict[str, List[float]] = {}
+    for name, latency in result['latencies']:
+        by_name.setdefault(name, []).append(latency)
+
+    duration = result['durationSeconds']
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'rate': rate,
+        'requests': result['requests'],
+        'skipped': result['skipped'],
+        'errors': result['errors'],
+        'durationSeconds': round(duration, 3),
+        'throughput': round(result['requests'] / duration, 2) if duration > 0 else None,
+        'latencyMs': _percentiles([latency for _, latency in result['latencies']]),
+        'byIndicator': {
+            name: {'requests': len(values), **_percentiles(values)}
+            for name, values in sorted(by_name.items())
+        }
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay captured indicator requests and report throughput and latency')
+    parser.add_argument('capture', help='JSON Lines file written with INDICATOR_CAPTURE_FILE')
+    parser.add_argument('--mode', choices=MODES, default='spawn')
+    parser.add_argument('--socket', default=None,
+                        help='server socket for socket/zygote modes (default: the server default path)')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=None, help='requests started per second (default: closed loop)')
+    parser.add_argument('--limit', type=int, default=None, help='replay at most this many captured requests')
+    parser.add_argument('--loops', type=int, default=1, help='replay the capture this many times')
+    parser.add_argument('--server-pid', type=int, default=None,
+                        help='pid of the socket/zygote server whose process tree RSS is sampled')
+    args = parser.parse_args()
+
+    entries = load_capture(args.capture, args.limit) * max(1, args.loops)
+
+    if args.mode == 'spawn':
+        target: Any = SpawnTarget()
+    elif args.mode == 'socket':
+        target = SocketTarget(args.socket or os.environ.get('INDICATOR_SOCKET_PATH', DEFAULT_SOCKET_PATH), False)
+    elif args.mode == 'zygote':
+        target = SocketTarget(
+            args.socket or os.environ.get('INDICATOR_ZYGOTE_SOCKET_PATH', DEFAULT_ZYGOTE_SOCKET_PATH), True
+        )
+    else:
+        target = RuntimeTarget()
+
+    # spawnの子プロセスはこのプロセスの子なので ru_maxrss で最大値を取る
+    pid = args.server_pid or (os.getpid() if args.mode == 'runtime' else None)
+    if pid is not None:
+        with RssSampler(pid) as sampler:
+            result = replay(entries, target, args.concurrency, args.rate)
+        rss = {'peakMb': round(sampler.peak / 2**20, 1), 'finalMb': round(sampler.last / 2**20, 1), 'pid': pid}
+    else:
+        result = replay(entries, target, args.concurrency, args.rate)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        rss = {'peakChildMb': round(children / 1024, 1)} if args.mode == 'spawn' else None
+
+    report = {**summarize(result, args.mode, args.concurrency, args.rate), 'rss': rss}
+
+    latency = report['latencyMs']
+    print(
+        f"{report['mode']}: {report['requests']} requests ({report['skipped']} skipped, "
+        f"{sum(report['errors'].values())} errors) in {report['durationSeconds']}s, "
+        f"{report['throughput']} req/s, p50 {latency.get('p50')} ms, p95 {latency.get('p95')} ms, "
+        f"p99 {latency.get('p99')} ms",
+        file=sys.stderr
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
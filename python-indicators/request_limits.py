@@ -0,0 +1,114 @@
+"""
+リクエストごとの上限 (入力本数・推定出力点数・CPU時間・メモリ)
+1つの巨大なリクエストが常駐ワーカーを占有したり落としたりしないよう、
+計算前に見積もりで打ち切る
+
+    入力本数      INDICATOR_MAX_INPUT_POINTS  (既定 5,000,000本)
+    推定出力点数  INDICATOR_MAX_OUTPUT_POINTS (既定 20,000,000点、系列数 × 本数 × (1 + 上位足数))
+
+リクエストの 'limits' ({'maxInputPoints', 'maxOutputPoints'}) では設定値より小さい上限だけを指定できる。
+経過時間の上限は 'deadlineMs' (scheduler.py の期限) で、長い計算はブロックごとに
+checkpoint() で期限を確認して DeadlineExceededError で止まる。
+
+zygote.py の子プロセスには apply_process_limits() で CPU時間とメモリの上限
+(resource.setrlimit) を設定し、超えた子だけが終了する (親と他のリクエストは影響を受けない)。
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+DEFAULT_MAX_INPUT_POINTS = 5_000_000
+DEFAULT_MAX_OUTPUT_POINTS = 20_000_000
+
+
+class LimitExceededError(ValueError):
+    """リクエストが上限を超えている (入力を減らして再送する)"""
+
+
+def _configured(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _limit(request: Optional[Dict[str, Any]], key: str, configured: int) -> int:
+    """設定値とリクエストの 'limits' の小さい方"""
+    limits = (request or {}).get('limits')
+    if limits is None:
+        return configured
+    if not isinstance(limits, dict):
+        raise ValueError("limits must be an object")
+    value = limits.get(key)
+    if value is None:
+        return configured
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"limits.{key} must be a positive integer")
+    return min(value, configured)
+
+
+def check_input_points(points: int, request: Optional[Dict[str, Any]] = None) -> None:
+    """
+    入力本数が上限以下か確認
+
+    Args:
+        points: 入力のローソク足の本数
+        request: リクエスト ('limits' の参照用)
+    """
+    limit = _limit(request, 'maxInputPoints', _configured('INDICATOR_MAX_INPUT_POINTS', DEFAULT_MAX_INPUT_POINTS))
+    if points > limit:
+        raise LimitExceededError(f"Input has {points} candles (max {limit})")
+
+
+def check_output_points(points: int, request: Optional[Dict[str, Any]] = None) -> None:
+    """
+    推定出力点数が上限以下か確認
+
+    Args:
+        points: 計算で生成する系列の点数の見積もり
+        request: リクエスト ('limits' の参照用)
+    """
+    limit = _limit(request, 'maxOutputPoints', _configured('INDICATOR_MAX_OUTPUT_POINTS', DEFAULT_MAX_OUTPUT_POINTS))
+    if points > limit:
+        raise LimitExceededError(f"Estimated output of {points} points exceeds the limit ({limit})")
+
+
+def _address_space_bytes() -> Optional[int]:
+    """現在の仮想メモリの大きさ (Linuxのみ)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def apply_process_limits(cpu_seconds: Optional[float] = None, memory_mb: Optional[int] = None) -> None:
+    """
+    現在のプロセス (fork直後の子) にCPU時間とメモリの上限を設定する
+
+    CPU時間を超えると SIGXCPU で終了する。メモリは fork 時点の仮想メモリに
+    memory_mb を足した大きさまでで、超える確保は MemoryError になる。
+
+    Args:
+        cpu_seconds: CPU時間の上限 (秒、Noneなら設定しない)
+        memory_mb: 追加で確保できるメモリ (MB、Noneなら設定しない)
+    """
+    if not RESOURCE_AVAILABLE:
+        return
+
+    if cpu_seconds is not None:
+        soft = max(1, int(cpu_seconds + 0.999))
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+
+    if memory_mb is not None:
+        # 親から引き継いだ分 (読み込み済みのライブラリやスレッドのスタック) を除いた増加分を制限する
+        baseline = _address_space_bytes() or 0
+        limit = baseline + memory_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
@@ -0,0 +1,194 @@
+"""
+リクエストの記録 (負荷試験の再生用)
+受け取ったJSONリクエストを JSON Lines でファイルに追記する。replay.py で再生し、
+実際のトラフィックの構成 (チャート・スクリーナー・メタデータ) でスループットと遅延を測る
+
+環境変数:
+    INDICATOR_CAPTURE_FILE: 記録先 (未設定時は無効)
+    INDICATOR_CAPTURE_SAMPLE: 記録する割合 (0〜1、デフォルト 1)
+    INDICATOR_CAPTURE_ANONYMIZE: 1 なら匿名化して記録
+
+匿名化では銘柄などのメタデータを除き、価格・出来高を定数倍、時刻を週単位でずらす。
+足の本数・間隔・時間足の区切りは変わらないため、計算コストは元のリクエストと同じになる。
+同じデータセットハンドルのリクエストには同じ変換を使うので、登録と追記の整合性も保たれる。
+相関の params.series (バッチの各指標も含む)・バックテストの symbols[] のローソク足も同じ時刻のずらし方で変換し、
+銘柄名はハッシュに置き換える (同じ銘柄は同じ名前になるため、系列の対応は保たれる)。
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import random
+import hashlib
+import threading
+from typing import Dict, Any, Optional
+
+
+# 記録しないモード (監視用のリクエスト)
+SKIPPED_MODES = ('metrics', 'stats')
+PRICE_KEYS = ('open', 'high', 'low', 'close', 'volume')
+WEEK_SECONDS = 7 * 24 * 60 * 60
+
+# 匿名化の変換 (プロセスごとに決める)
+_SALT = os.urandom(16).hex()
+_TIME_SHIFT = random.SystemRandom().randrange(1, 520) * WEEK_SECONDS
+_lock = threading.Lock()
+
+
+def _price_scale(request: Dict[str, Any]) -> float:
+    """価格の倍率 (同じデータセットハンドルなら同じ値)"""
+    handle = request.get('datasetHandle')
+    seed = f'{_SALT}:{handle}' if handle is not None else None
+    return random.Random(seed).uniform(0.5, 2.0)
+
+
+def _anonymize_candles(candles: Any, scale: float) -> Any:
+    if not isinstance(candles, list):
+        return candles
+
+    anonymized = []
+    for candle in candles:
+        if not isinstance(candle, dict):
+            anonymized.append(candle)
+            continue
+        candle = dict(candle)
+        if isinstance(candle.get('time'), (int, float)):
+            candle['time'] = candle['time'] - _TIME_SHIFT
+        for key in PRICE_KEYS:
+            if isinstance(candle.get(key), (int, float)):
+                candle[key] = candle[key] * scale
+        anonymized.append(candle)
+    return anonymized
+
+
+def _pseudonym(name: str, length: int = 32) -> str:
+    """名前のハッシュ (同じプロセスでは同じ名前に同じ値)"""
+    return hashlib.sha256(f'{_SALT}:{name}'.encode('utf-8')).hexdigest()[:length]
+
+
+def _symbol(name: Any) -> Any:
+    return f'S{_pseudonym(str(name), 8)}' if isinstance(name, str) else name
+
+
+def _anonymize_series(points: Any, scale: float) -> Any:
+    """相関の params.series の1銘柄 ([{'time', 'close'}, ...] または {'time': [...], 'close': [...]})"""
+    if isinstance(points, list):
+        return _anonymize_candles(points, scale)
+    if not isinstance(points, dict):
+        return points
+    points = dict(points)
+    if isinstance(points.get('time'), list):
+        points['time'] = [t - _TIME_SHIFT if isinstance(t, (int, float)) else t for t in points['time']]
+    if isinstance(points.get('close'), list):
+        points['close'] = [c * scale if isinstance(c, (int, float)) else c for c in points['close']]
+    return points
+
+
+def _anonymize_params(params: Dict[str, Any], scale: float) -> Dict[str, Any]:
+    """パラメータに含まれる銘柄名と他銘柄の系列"""
+    params = dict(params)
+    if isinstance(params.get('series'), dict):
+        params['series'] = {
+            _symbol(str(name)): _anonymize_series(points, scale) for name, points in params['series'].items()
+        }
+    if params.get('benchmark') not in (None, 'base'):
+        params['benchmark'] = _symbol(params['benchmark'])
+    return params
+
+
+def _anonymize(request: Dict[str, Any], scale: float) -> Dict[str, Any]:
+    """リクエスト (またはバッチ・バックテストの要素) を同じ価格の倍率で匿名化する"""
+    anonymized = {key: value for key, value in request.items() if key != 'metadata'}
+
+    if 'candleData' in anonymized:
+        anonymized['candleData'] = _anonymize_candles(anonymized['candleData'], scale)
+
+    if isinstance(anonymized.get('datasetHandle'), str):
+        anonymized['datasetHandle'] = _pseudonym(anonymized['datasetHandle'])
+
+    if 'symbol' in anonymized:
+        anonymized['symbol'] = _symbol(anonymized['symbol'])
+
+    if isinstance(anonymized.get('params'), dict):
+        anonymized['params'] = _anonymize_params(anonymized['params'], scale)
+
+    # バッチの indicators (配列)・バックテストの indicators (名前 -> 設定)
+    indicators = anonymized.get('indicators')
+    if isinstance(indicators, list):
+        anonymized['indicators'] = [
+            _anonymize(item, scale) if isinstance(item, dict) else item for item in indicators
+        ]
+    elif isinstance(indicators, dict):
+        anonymized['indicators'] = {
+            key: _anonymize(item, scale) if isinstance(item, dict) else item for key, item in indicators.items()
+        }
+
+    # バックテストの銘柄ごとのローソク足 (銘柄ごとに倍率を決める)
+    if isinstance(anonymized.get('symbols'), list):
+        anonymized['symbols'] = [
+            _anonymize(entry, _price_scale(entry)) if isinstance(entry, dict) else entry
+            for entry in anonymized['symbols']
+        ]
+
+    return anonymized
+
+
+def anonymize(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    リクエストを匿名化する
+
+    Args:
+        request: 元のリクエスト
+
+    Returns:
+        メタデータを除き、ローソク足・他銘柄の系列の価格・時刻を変換し、
+        銘柄名とデータセットハンドルをハッシュに置き換えたリクエスト
+    """
+    return _anonymize(request, _price_scale(request))
+
+
+def is_enabled() -> bool:
+    """記録が有効か"""
+    return bool(os.environ.get('INDICATOR_CAPTURE_FILE'))
+
+
+def record(request: Any, indicator: Optional[str] = None) -> None:
+    """
+    リクエストを記録する (記録の失敗でリクエストを失敗させない)
+
+    Args:
+        request: 受け取ったリクエスト
+        indicator: 処理するインジケーター名 (リクエストに 'name' がない場合用)
+    """
+    path = os.environ.get('INDICATOR_CAPTURE_FILE')
+    if not path or not isinstance(request, dict):
+        return
+    if request.get('_mode') in SKIPPED_MODES:
+        return
+
+    sample = float(os.environ.get('INDICATOR_CAPTURE_SAMPLE', '1'))
+    if sample < 1 and random.random() >= sample:
+        return
+
+    if os.environ.get('INDICATOR_CAPTURE_ANONYMIZE') == '1':
+        request = anonymize(request)
+
+    entry = {
+        'capturedAt': time.time(),
+        'indicator': indicator or request.get('name'),
+        'request': request
+    }
+
+    try:
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        # 複数プロセスから同じファイルに追記するため、行単位で排他する
+        with _lock, open(path, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Failed to capture request: {e}", file=sys.stderr)
@@ -0,0 +1,153 @@
+"""
+マルチタイムフレーム リサンプリング
+細かい足のOHLCVを上位足に集約し、上位足の結果を元の時間軸に揃える
+
+元の足への割り当て方 (リクエストの 'timeframeAlign'):
+    'confirmed' (既定): その足の時点で確定している最後の上位足の値
+                        (上位足の最後の足ではその上位足、それ以外は1つ前の上位足)
+    'bucket':           その足が属する上位足の値 (上位足の後の足まで使った値になるため、
+                        バックテスト等では先読みになる。チャートで上位足の最終値を描く用)
+"""
+
+import numpy as np
+from typing import Dict, Any, List, Tuple
+
+
+# 上位足の値の割り当て方
+ALIGN_MODES = ('confirmed', 'bucket')
+
+# 時間足の単位 (秒)
+TIMEFRAME_UNITS = {
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 604800,
+}
+
+
+def parse_timeframe(timeframe: str) -> int:
+    """
+    時間足文字列を秒数に変換
+
+    Args:
+        timeframe: 時間足 (例: '15m', '1h', '1d')
+
+    Returns:
+        秒数
+    """
+    if not isinstance(timeframe, str) or len(timeframe) < 2:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+
+    unit = timeframe[-1]
+    count = timeframe[:-1]
+    if unit not in TIMEFRAME_UNITS or not count.isdigit() or int(count) <= 0:
+        raise ValueError(f"Invalid timeframe: {timeframe}")
+
+    return int(count) * TIMEFRAME_UNITS[unit]
+
+
+def resample_columns(
+    columns: Dict[str, np.ndarray],
+    seconds: int
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    OHLCV列を上位足に集約
+
+    timeは昇順である必要がある。各足は time // seconds の区間に属し、
+    区間の先頭時刻が上位足のtimeになる。
+
+    Args:
+        columns: 列指向のローソク足 (time, open, high, low, close, volume)
+        seconds: 上位足の秒数
+
+    Returns:
+        (上位足の列, 元の各足が属する上位足のインデックス)
+    """
+    time = columns['time']
+    bucket = (time // seconds) * seconds
+
+    # グループ境界をベクトル化して求める
+    keys = np.unique(bucket)
+    starts = np.searchsorted(bucket, keys, side='left')
+    ends = np.append(starts[1:], len(time))
+
+    resampled = {
+        'time': keys,
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends - 1],
+        'volume': np.add.reduceat(columns['volume'], starts),
+    }
+    bucket_index = np.repeat(np.arange(len(keys)), ends - starts)
+
+    return resampled, bucket_index
+
+
+def confirmed_index(bucket_index: np.ndarray) -> np.ndarray:
+    """
+    元の各足の時点で確定している最後の上位足のインデックス
+
+    上位足はその区間の最後の足で確定する (データの最後の上位足は最新の足までの値)。
+    それ以外の足には1つ前の上位足を割り当て、前の上位足がなければ -1 とする。
+
+    Args:
+        bucket_index: resample_columnsが返したインデックス
+
+    Returns:
+        上位足のインデックス (-1 は値なし)
+    """
+    last = np.append(bucket_index[1:] != bucket_index[:-1], True) if len(bucket_index) else np.empty(0, dtype=bool)
+    return np.where(last, bucket_index, bucket_index - 1)
+
+
+def align_index(bucket_index: np.ndarray, mode: str = 'confirmed') -> np.ndarray:
+    """
+    'timeframeAlign' に応じた元の各足への上位足のインデックス (-1 は値なし)
+
+    Args:
+        bucket_index: resample_columnsが返したインデックス
+        mode: 'confirmed' または 'bucket'
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"timeframeAlign must be one of {', '.join(ALIGN_MODES)}")
+    return confirmed_index(bucket_index) if mode == 'confirmed' else bucket_index
+
+
+def align_series(
+    values: List[Dict[str, Any]],
+    bucket_times: np.ndarray,
+    base_times: np.ndarray,
+    bucket_index: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    上位足の系列を元の時間軸に前方揃えする
+
+    元の各足には bucket_index が指す上位足の値を割り当てる (-1 の足は値なし)。
+    align_index() の 'confirmed' ではその足の時点で確定した値、'bucket' では
+    その足が属する上位足の最終値 (先読み) になる。
+
+    Args:
+        values: 上位足の系列 [{'time', 'value'}, ...]
+        bucket_times: 上位足のtime配列
+        base_times: 元の時間軸
+        bucket_index: 元の各足に割り当てる上位足のインデックス (align_index の結果)
+
+    Returns:
+        元の時間軸上の系列
+    """
+    if not values:
+        return []
+
+    times = np.fromiter((v['time'] for v in values), dtype=np.int64, count=len(values))
+    # 末尾のNaNは -1 (値なし) の割り当て先
+    series = np.full(len(bucket_times) + 1, np.nan)
+    series[np.searchsorted(bucket_times, times)] = [v['value'] for v in values]
+
+    aligned = series[bucket_index]
+    mask = ~np.isnan(aligned)
+
+    return [
+        {'time': int(t), 'value': float(v)}
+        for t, v in zip(base_times[mask], aligned[mask])
+    ]
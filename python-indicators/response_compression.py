@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+レスポンスの圧縮 (Node とのパイプ・ソケット間)
+リクエストの 'compression' で受け付ける形式を優先順に指定すると、
+成功レスポンスが一定の大きさ以上の場合に圧縮したバイト列を返す
+
+    {'name': 'sma', ..., 'compression': ['zstd', 'gzip']}
+
+圧縮したレスポンスは zstd / gzip のフレームそのもの (先頭のマジックナンバーで判別できる) で、
+非圧縮のレスポンス ('{' で始まるJSON) と同じ経路で返す。エラーレスポンスと
+INDICATOR_COMPRESS_MIN_BYTES 未満のレスポンスは圧縮しない (圧縮されていれば成功レスポンス)。
+zstd は zstandard パッケージがある場合のみ使う。
+
+圧縮のCPU時間と削減量の比較:
+    python response_compression.py                          # 代表的な大きさで計測
+    python response_compression.py --sizes 10000 1000000
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+from results import IndicatorResult
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+ENCODINGS = ('zstd', 'gzip')
+MAGIC = {
+    'zstd': b'\x28\xb5\x2f\xfd',
+    'gzip': b'\x1f\x8b',
+}
+# これ未満のレスポンスは圧縮しない (バイト)
+DEFAULT_MIN_BYTES = 32 * 1024
+# 既定の圧縮レベル (計測で削減量に対してCPU時間の少ないもの)
+DEFAULT_LEVELS = {
+    'zstd': 3,
+    'gzip': 1,
+}
+
+
+def available_encodings() -> List[str]:
+    """このプロセスで使える圧縮形式 (優先順)"""
+    return [encoding for encoding in ENCODINGS if encoding != 'zstd' or ZSTD_AVAILABLE]
+
+
+def negotiate(accepted: Any) -> Optional[str]:
+    """
+    リクエストの 'compression' から使う形式を決める
+
+    Args:
+        accepted: 形式の文字列または優先順のリスト (Noneなら圧縮しない)
+
+    Returns:
+        使える形式のうち最初のもの (なければNone)
+    """
+    if accepted is None:
+        return None
+    if isinstance(accepted, str):
+        accepted = [accepted]
+    if not isinstance(accepted, list):
+        raise ValueError("compression must be a string or an array")
+
+    available = available_encodings()
+    for encoding in accepted:
+        if encoding in available:
+            return encoding
+    return None
+
+
+def _level(encoding: str) -> int:
+    return int(os.environ.get(f'INDICATOR_COMPRESS_{encoding.upper()}_LEVEL', DEFAULT_LEVELS[encoding]))
+
+
+def compress(payload: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """payloadを指定の形式で圧縮"""
+    level = _level(encoding) if level is None else level
+    if encoding == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress(payload)
+    if encoding == 'gzip':
+        # mtime=0 で同じ内容は同じバイト列にする
+        return gzip.compress(payload, compresslevel=level, mtime=0)
+    raise ValueError(f"Unknown compression: {encoding}")
+
+
+def decompress(data: bytes) -> bytes:
+    """圧縮されたレスポンスを展開 (非圧縮ならそのまま返す)"""
+    if data.startswith(MAGIC['zstd']):
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd decompression requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if data.startswith(MAGIC['gzip']):
+        return gzip.decompress(data)
+    return data
+
+
+def encode_payload(payload: bytes, response: Dict[str, Any], accepted: Any) -> bytes:
+    """
+    JSONのレスポンスを必要なら圧縮する
+
+    Args:
+        payload: UTF-8のJSONレスポンス
+        response: 元のレスポンス辞書または IndicatorResult (成功レスポンスのみ圧縮する)
+        accepted: リクエストの 'compression'
+
+    Returns:
+        返すバイト列
+    """
+    min_bytes = int(os.environ.get('INDICATOR_COMPRESS_MIN_BYTES', DEFAULT_MIN_BYTES))
+    if accepted is None or len(payload) < min_bytes:
+        return payload
+    if not isinstance(response, IndicatorResult) and not response.get('success'):
+        return payload
+    try:
+        encoding = negotiate(accepted)
+    except ValueError:
+        return payload
+    return payload if encoding is None else compress(payload, encoding)
+
+
+# ---- 計測 ----
+
+def _benchmark_payloads(sizes: List[int]) -> Dict[str, bytes]:
+    """代表的なレスポンス (SMA・ボリンジャーバンド・MACD) のJSON"""
+    import numpy as np
+    from indicator_runtime import IndicatorRuntime
+    from results import json_default
+
+    runtime = IndicatorRuntime()
+    payloads = {}
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        close = 100 + np.cumsum(rng.normal(0, 0.5, size))
+        candles = [
+            {'time': 1_600_000_000 + i * 60, 'open': c, 'high': c + 0.3, 'low': c - 0.3, 'close': c, 'volume': 1000.0}
+            for i, c in enumerate(close.tolist())
+        ]
+        for name in ('sma', 'bollinger', 'macd'):
+            response = runtime.handle({'name': name, 'candleData': candles, 'params': {}, 'cache': False})
+            payloads[f'{name}/{size}'] = json.dumps(response, ensure_ascii=False, default=json_default).encode('utf-8')
+    return payloads
+
+
+def benchmark(sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    """
+    形式・レベルごとに圧縮・展開の時間と大きさを計測
+
+    Returns:
+        [{'payload', 'bytes', 'encoding', 'level', 'compressedBytes', 'ratio', 'compressMs', 'decompressMs'}, ...]
+    """
+    settings = [('gzip', 1), ('gzip', 6)]
+    if ZSTD_AVAILABLE:
+        settings = [('zstd', 1), ('zstd', 3), ('zstd', 9)] + settings
+
+    rows = []
+    for name, payload in _benchmark_payloads(sizes).items():
+        for encoding, level in settings:
+            compress_seconds = decompress_seconds = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                compressed = compress(payload, encoding, level)
+                compress_seconds = min(compress_seconds, time.perf_counter() - start)
+                start = time.perf_counter()
+                decompress(compressed)
+                decompress_seconds = min(decompress_seconds, time.perf_counter() - start)
+            rows.append({
+                'payload': name,
+                'bytes': len(payload),
+                'encoding': encoding,
+                'level': level,
+                'compressedBytes': len(compressed),
+                'ratio': round(len(payload) / len(compressed), 2),
+                'compressMs': round(compress_seconds * 1000, 2),
+                'decompressMs': round(decompress_seconds * 1000, 2)
+            })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure response compression CPU time against bytes saved')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print rows as JSON')
+    args = parser.parse_args()
+
+    rows = benchmark(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'payload':<18}{'bytes':>12}  {'encoding':<8}{'level':>6}{'compressed':>12}{'ratio':>8}"
+          f"{'comp ms':>10}{'decomp ms':>11}")
+    for row in rows:
+        print(f"{row['payload']:<18}{row['bytes']:>12}  {row['encoding']:<8}{row['level']:>6}"
+              f"{row['compressedBytes']:>12}{row['ratio']:>8}{row['compressMs']:>10}{row['decompressMs']:>11}")
+    if not ZSTD_AVAILABLE:
+        print("zstandard is not installed; zstd was not measured", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
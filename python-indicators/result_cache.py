@@ -0,0 +1,207 @@
+"""
+インジケーター結果のディスクキャッシュ
+入力列・インジケーター名・version・パラメータのハッシュをキーに、
+圧縮した結果をファイルとして保存する (プロセスやデプロイをまたいで再利用)
+
+- 書き込みは一時ファイルからの os.replace で行うため、複数ワーカーが同時に
+  書き込んでも壊れたエントリは見えない
+- 合計サイズが上限を超えると、最終アクセス (mtime) の古い順に削除する
+- version をキーに含むため、実装を変更して version を上げると古いエントリは使われなくなる
+
+環境変数:
+    INDICATOR_CACHE_DIR: キャッシュディレクトリ (未設定時は無効)
+    INDICATOR_CACHE_MAX_BYTES: 合計サイズの上限 (デフォルト 1GB)
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import tempfile
+import threading
+import numpy as np
+from typing import Dict, Any, Optional
+from results import json_default
+
+
+# エントリの先頭に付けるマジック (形式を変えたら更新する)
+ENTRY_MAGIC = b'AIRC1'
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# 上限を超えたとき、この割合まで削除する
+EVICT_TARGET_RATIO = 0.9
+# サイズ確認のためのディレクトリ走査を行う書き込み間隔
+EVICT_CHECK_INTERVAL = 64
+
+
+def make_key(
+    name: str,
+    version: str,
+    columns: Dict[str, np.ndarray],
+    options: Dict[str, Any],
+    source: Optional[str] = None
+) -> str:
+    """
+    キャッシュキーを計算
+
+    Args:
+        name: インジケーター名
+        version: インジケーターのバージョン
+        columns: 入力列 (列名 -> numpy配列)
+        options: 結果に影響するリクエストの値 (params等、JSON化できること)
+        source: 入力列の内容の識別子 (データセットの登録ごとの識別子とバージョン等、
+                指定した場合は columns の代わりに使う)
+
+    Returns:
+        SHA-256の16進文字列
+    """
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([name, version, options], sort_keys=True, default=str).encode('utf-8'))
+    if source is not None:
+        hasher.update(f'source:{source}'.encode('utf-8'))
+        return hasher.hexdigest()
+
+    for column_name in sorted(columns):
+        values = np.ascontiguousarray(columns[column_name])
+        hasher.update(f'{column_name}:{values.dtype.str}:{len(values)}'.encode('utf-8'))
+        hasher.update(values)
+
+    return hasher.hexdigest()
+
+
+class DiskResultCache:
+    """サイズ上限付きLRUのディスクキャッシュ"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        エントリを読み込む (見つかった場合はmtimeを更新してLRU順を保つ)
+
+        Returns:
+            結果辞書 (存在しない・壊れている場合はNone)
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self._count(hit=False)
+            return None
+
+        if not data.startswith(ENTRY_MAGIC):
+            self._count(hit=False)
+            return None
+
+        try:
+            result = json.loads(zlib.decompress(data[len(ENTRY_MAGIC):]))
+        except (zlib.error, ValueError):
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """エントリを書き込む (同じディレクトリの一時ファイルから置き換え)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+
+        payload = ENTRY_MAGIC + zlib.compress(
+            json.dumps(result, ensure_ascii=False, separators=(',', ':'), default=json_default).encode('utf-8')
+        )
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            self._writes += 1
+            check = self._writes % EVICT_CHECK_INTERVAL == 1
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        合計サイズが上限を超えていれば、古いエントリから削除する
+
+        Returns:
+            削除したエントリ数
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # 他のワーカーが先に削除した
+                pass
+            total -= size
+            removed += 1
+
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット数・ミス数"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+_default_cache: Optional[DiskResultCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[DiskResultCache]:
+    """環境変数で設定されたキャッシュを返す (未設定時はNone)"""
+    global _default_cache
+    directory = os.environ.get('INDICATOR_CACHE_DIR')
+    if not directory:
+        return None
+
+    with _default_lock:
+        if _default_cache is None or _default_cache.directory != directory:
+            max_bytes = int(os.environ.get('INDICATOR_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+            _default_cache = DiskResultCache(directory, max_bytes)
+        return _default_cache
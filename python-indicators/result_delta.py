@@ -0,0 +1,164 @@
+"""
+差分レスポンス (チャート更新用)
+結果の全系列のフィンガープリント (最後のtime + それより前の点のハッシュ) を計算し、
+クライアントが持っている結果と履歴が一致する場合は末尾の変わった部分だけを返す
+
+    1回目: {'fingerprint': true, ...}
+        -> 全系列 + metadata.fingerprint = {'time': 最後のtime, 'hash': ...}
+    更新時: {'fingerprint': {'time': ..., 'hash': ...}, ...}
+        -> 履歴が一致すれば time 以降の点だけ (metadata.delta = {'since': time})
+           一致しなければ全系列 (metadata.delta = False)
+
+最後の足は確定前に値が変わるため、ハッシュには最後のtimeより前の点だけを含め、
+差分には最後のtimeの点から含める。クライアントは手元の系列から since 以降の点を除き、
+返された点を後ろに付ければよい。レスポンスの大きさと出力の時間は新しい足の数に比例する。
+"""
+
+import hashlib
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from results import IndicatorResult, Series
+
+
+POINT_DTYPE = np.dtype([('time', '<i8'), ('value', '<f8')])
+
+
+def _series_arrays(result: Any) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    """結果の全系列の (名前, time配列, 値の配列) (上位足は時間足の順)"""
+    arrays = []
+    if isinstance(result, IndicatorResult):
+        if result.values is not None:
+            arrays.append(('values', result.values.times, result.values.values))
+        arrays.extend((line.name, line.series.times, line.series.values) for line in result.lines)
+    else:
+        if isinstance(result.get('values'), list):
+            arrays.append(('values',) + _point_arrays(result['values']))
+        arrays.extend((line['name'],) + _point_arrays(line['values']) for line in result.get('lines', []))
+
+    for timeframe in sorted(result.get('timeframes') or {}):
+        arrays.extend(
+            (f'{timeframe}:{name}', times, values)
+            for name, times, values in _series_arrays(result['timeframes'][timeframe])
+        )
+    return arrays
+
+
+def _point_arrays(points: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    times = np.fromiter((point['time'] for point in points), dtype=np.int64, count=len(points))
+    values = np.fromiter(
+        (np.nan if point['value'] is None else point['value'] for point in points), dtype=np.float64, count=len(points)
+    )
+    return times, values
+
+
+def fingerprint(result: Any, known: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    結果のフィンガープリントを計算し、クライアントのフィンガープリントと履歴を照合する
+
+    系列ごとにtime・値のハッシュを増分で計算するため、照合と新しいフィンガープリントは
+    1回の走査で求まる
+
+    Args:
+        result: インジケーター結果辞書または IndicatorResult
+        known: クライアントが持っているフィンガープリント {'time', 'hash'} (Noneなら照合しない)
+
+    Returns:
+        (新しいフィンガープリント, known.time より前の点が一致したか)
+    """
+    # 値のある点を (time, 値) のレコードにする (区切り位置によらず同じバイト列になる)
+    arrays = []
+    for name, times, values in _series_arrays(result):
+        valid = ~np.isnan(values)
+        points = np.empty(int(np.count_nonzero(valid)), dtype=POINT_DTYPE)
+        points['time'] = times[valid]
+        points['value'] = values[valid]
+        arrays.append((name, points))
+
+    last_time = max((int(points['time'][-1]) for _, points in arrays if len(points)), default=None)
+    known_time = known['time'] if known is not None else None
+
+    known_digest = hashlib.blake2b(digest_size=16)
+    new_digest = hashlib.blake2b(digest_size=16)
+    for name, points in arrays:
+        # 区切り位置まで順に足し込み、各区切りでのハッシュを取る
+        times = points['time']
+        cuts = [(len(points) if last_time is None else int(np.searchsorted(times, last_time, side='left')), new_digest)]
+        if known_time is not None:
+            cuts.append((int(np.searchsorted(times, known_time, side='left')), known_digest))
+        digest = hashlib.blake2b(name.encode('utf-8'), digest_size=16)
+        position = 0
+        for end, combined in sorted(cuts, key=lambda cut: cut[0]):
+            digest.update(points[position:end].tobytes())
+            combined.update(digest.copy().digest())
+            position = end
+
+    matched = known is not None and known_digest.hexdigest() == known.get('hash')
+    return {'time': last_time, 'hash': new_digest.hexdigest()}, matched
+
+
+def tail_since(result: Any, since: int) -> Any:
+    """
+    全系列を since 以降の点だけにした結果 (元の結果は変更しない)
+
+    Args:
+        result: インジケーター結果辞書または IndicatorResult
+        since: 残す最初のtime
+
+    Returns:
+        新しい結果
+    """
+    def tail_points(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        times, _ = _point_arrays(points)
+        return points[int(np.searchsorted(times, since, side='left')):]
+
+    def tail_series(series: Series) -> Series:
+        position = int(np.searchsorted(series.times, since, side='left'))
+        return Series(series.times[position:], series.values[position:])
+
+    if isinstance(result, IndicatorResult):
+        tailed = result.copy()
+        tailed.map_series(tail_series)
+    else:
+        tailed = dict(result)
+        if isinstance(result.get('values'), list):
+            tailed['values'] = tail_points(result['values'])
+        if 'lines' in result:
+            tailed['lines'] = [{**line, 'values': tail_points(line['values'])} for line in result['lines']]
+
+    if result.get('timeframes'):
+        tailed['timeframes'] = {
+            timeframe: tail_since(timeframe_result, since)
+            for timeframe, timeframe_result in result['timeframes'].items()
+        }
+    return tailed
+
+
+def apply_fingerprint(result: Any, known: Any) -> Any:
+    """
+    リクエストの 'fingerprint' に従って結果を差分にし、新しいフィンガープリントを付ける
+
+    Args:
+        result: インジケーター結果辞書または IndicatorResult (変更しない)
+        known: True (フィンガープリントだけを求める) または {'time', 'hash'}
+
+    Returns:
+        レスポンスにする結果
+    """
+    if known is True:
+        known = None
+    elif not isinstance(known, dict) or not isinstance(known.get('time'), int) \
+            or isinstance(known.get('time'), bool) or not isinstance(known.get('hash'), str):
+        raise ValueError("fingerprint must be true or an object with integer time and string hash")
+
+    current, matched = fingerprint(result, known)
+    if matched:
+        result = tail_since(result, known['time'])
+    elif isinstance(result, IndicatorResult):
+        result = result.copy()
+    else:
+        result = dict(result)
+
+    result['metadata'] = dict(result['metadata'])
+    result['metadata']['fingerprint'] = current
+    result['metadata']['delta'] = {'since': known['time']} if matched else False
+    return result
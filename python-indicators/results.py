@@ -0,0 +1,191 @@
+"""
+配列ベースのインジケーター結果
+系列をnumpy配列のまま保持し、JSONの形 ([{'time', 'value'}, ...]) への変換は
+出力時 (json.dumps の default=json_default) まで遅らせる
+
+1点ごとの辞書を作らないため、長い系列の結果やバッチ・単一実行の合流で
+複数の結果を保持してもメモリ使用量は配列の大きさで済む。
+結果辞書と同じキー ('metadata'、'timeframes' 等) で読み書きできるため、
+辞書を返すインジケーターと同じ処理経路で扱える。
+"""
+
+import numpy as np
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class Series:
+    """time配列と値の配列 (NaNの位置は出力しない)"""
+
+    __slots__ = ('times', 'values')
+
+    def __init__(self, times: np.ndarray, values: np.ndarray):
+        if len(times) != len(values):
+            raise ValueError(f"Series length mismatch: {len(times)} times, {len(values)} values")
+        self.times = times
+        self.values = values
+
+    def _valid(self) -> np.ndarray:
+        return ~np.isnan(self.values)
+
+    def __len__(self) -> int:
+        """値のある点の数"""
+        return int(np.count_nonzero(self._valid()))
+
+    def tail(self, count: int) -> 'Series':
+        """値のある末尾のcount点"""
+        indices = np.flatnonzero(self._valid())[-count:]
+        return Series(self.times[indices], self.values[indices])
+
+    def align(self, base_times: np.ndarray, bucket_index: np.ndarray) -> 'Series':
+        """
+        上位足の系列を元の時間軸に前方揃えする (resample.align_series と同じ割り当て)
+
+        Args:
+            base_times: 元の時間軸
+            bucket_index: 元の各足に割り当てる上位足のインデックス (resample.align_index の結果、-1 は値なし)
+                          (この系列は上位足の全本数分の配列であること)
+        """
+        return Series(base_times, np.append(self.values, np.nan)[bucket_index])
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """[{'time', 'value'}, ...] (値のある点のみ)"""
+        valid = self._valid()
+        return [
+            {'time': t, 'value': v}
+            for t, v in zip(self.times[valid].tolist(), self.values[valid].tolist())
+        ]
+
+
+class Line:
+    """複数系列の結果の1本"""
+
+    __slots__ = ('name', 'series', 'config')
+
+    def __init__(self, name: str, series: Series, config: Dict[str, Any]):
+        self.name = name
+        self.series = series
+        self.config = config
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'values': self.series.to_list(), 'config': self.config}
+
+
+class IndicatorResult:
+    """
+    インジケーター結果
+    単一系列 ('values' + 'lineConfig') または複数系列 ('lines') を持つ
+    """
+
+    __slots__ = ('display_type', 'values', 'line_config', 'lines', 'levels', 'metadata', 'extra')
+
+    def __init__(
+        self,
+        display_type: str,
+        values: Optional[Series] = None,
+        line_config: Optional[Dict[str, Any]] = None,
+        lines: Optional[List[Line]] = None,
+        levels: Optional[List[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.display_type = display_type
+        self.values = values
+        self.line_config = line_config
+        self.lines = lines or []
+        self.levels = levels
+        self.metadata = metadata if metadata is not None else {}
+        # 計算後に追加される項目 ('timeframes' 等)
+        self.extra: Dict[str, Any] = {}
+
+    @classmethod
+    def single(
+        cls,
+        series: Series,
+        line_config: Dict[str, Any],
+        metadata: Dict[str, Any],
+        levels: Optional[List[Dict[str, Any]]] = None
+    ) -> 'IndicatorResult':
+        """単一系列の結果"""
+        return cls('single-line', values=series, line_config=line_config, levels=levels, metadata=metadata)
+
+    @classmethod
+    def multi(
+        cls,
+        lines: List[Line],
+        metadata: Dict[str, Any],
+        levels: Optional[List[Dict[str, Any]]] = None
+    ) -> 'IndicatorResult':
+        """複数系列の結果"""
+        return cls('multi-line', lines=lines, levels=levels, metadata=metadata)
+
+    # ---- 結果辞書と同じアクセス (metadata と追加項目) ----
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'metadata':
+            return self.metadata
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == 'metadata':
+            self.metadata = value
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key == 'metadata' or key in self.extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self) -> 'IndicatorResult':
+        """浅いコピー (系列の配列は共有する)"""
+        result = IndicatorResult(
+            self.display_type, self.values, self.line_config, list(self.lines), self.levels, self.metadata
+        )
+        result.extra = dict(self.extra)
+        return result
+
+    # ---- 系列 ----
+
+    def series(self) -> Iterator[Series]:
+        if self.values is not None:
+            yield self.values
+        for line in self.lines:
+            yield line.series
+
+    def map_series(self, fn: Callable[[Series], Series]) -> 'IndicatorResult':
+        """全系列に関数を適用する (破壊的、map_result_series の配列版)"""
+        if self.values is not None:
+            self.values = fn(self.values)
+        self.lines = [Line(line.name, fn(line.series), line.config) for line in self.lines]
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONの形の結果辞書 (辞書を返すインジケーターと同じ形)"""
+        result: Dict[str, Any] = {'success': True, 'displayType': self.display_type}
+        if self.values is not None:
+            result['values'] = self.values.to_list()
+            result['lineConfig'] = self.line_config
+        if self.lines:
+            result['lines'] = [line.to_dict() for line in self.lines]
+        if self.levels is not None:
+            result['levels'] = self.levels
+        result['metadata'] = self.metadata
+        result.update(self.extra)
+        return result
+
+
+def json_default(obj: Any) -> Any:
+    """
+    json.dumps の default (配列ベースの結果を出力時に辞書へ変換)
+
+    Example:
+        json.dumps(response, default=json_default)
+    """
+    if isinstance(obj, IndicatorResult):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,185 @@
+"""
+ローソク足のサニタイズ
+列指向のnumpy配列に対して、ソート・重複除去・NaN/inf処理・欠損区間の検出を行う
+すべて配列単位の処理で、数百万本でも数回の配列走査で終わる
+"""
+
+import numpy as np
+from typing import Dict, Any, List, Tuple
+
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# NaN/infを含む足の扱い
+#   drop:   その足を除外
+#   ffill:  直前の有効値で埋める (先頭の無効な足は除外)
+#   reject: エラーにする
+NAN_POLICIES = ('drop', 'ffill', 'reject')
+
+# 欠損区間として報告する最大件数
+MAX_REPORTED_GAPS = 10
+
+
+def columns_from_candles(candle_data: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    ローソク足配列を数値列に変換 (欠落・None・数値文字列を許容)
+
+    欠落したキーは0、Noneや変換できない値はNaNになる
+
+    Args:
+        candle_data: ローソク足データ配列
+
+    Returns:
+        列名 -> float64配列 (timeも含む)
+    """
+    columns = {}
+    for key in ('time',) + PRICE_COLUMNS:
+        values = [candle.get(key, 0) for candle in candle_data]
+        try:
+            columns[key] = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            columns[key] = np.array([_to_float(v) for v in values], dtype=np.float64)
+    return columns
+
+
+def _to_float(value: Any) -> float:
+    """数値に変換できない値はNaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def sanitize_columns(
+    columns: Dict[str, np.ndarray],
+    nan_policy: str = 'drop',
+    gap_factor: float = 1.5
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    列をサニタイズする
+
+    1. timeが無効な足を除外
+    2. timeが昇順でなければ安定ソート
+    3. 同じtimeの足は最後のもの (最新の更新) だけを残す
+    4. 価格・出来高のNaN/infをnan_policyに従って処理
+    5. 中央値の間隔の gap_factor 倍を超える間隔を欠損区間として報告
+
+    Args:
+        columns: columns_from_candlesが返す列
+        nan_policy: 'drop' / 'ffill' / 'reject'
+        gap_factor: 欠損区間とみなす間隔の倍率
+
+    Returns:
+        (サニタイズ済みの列 (timeはint64), レポート)
+    """
+    if nan_policy not in NAN_POLICIES:
+        raise ValueError(f"nanPolicy must be one of {', '.join(NAN_POLICIES)}")
+    if (
+        not isinstance(gap_factor, (int, float)) or isinstance(gap_factor, bool)
+        or not np.isfinite(gap_factor) or gap_factor <= 0
+    ):
+        raise ValueError("gapFactor must be a positive number")
+
+    report: Dict[str, Any] = {
+        'inputPoints': len(columns['time']),
+        'nanPolicy': nan_policy,
+        'invalidTimes': 0,
+        'sorted': False,
+        'duplicatesRemoved': 0,
+        'invalidRows': 0,
+    }
+
+    # 1. timeが無効な足 (補完できないので常に除外)
+    valid_time = np.isfinite(columns['time'])
+    if not valid_time.all():
+        if nan_policy == 'reject':
+            raise ValueError(f"{np.count_nonzero(~valid_time)} candles have an invalid time")
+        report['invalidTimes'] = int(np.count_nonzero(~valid_time))
+        columns = {key: values[valid_time] for key, values in columns.items()}
+
+    columns['time'] = columns['time'].astype(np.int64)
+    time = columns['time']
+
+    # 2. 昇順でなければソート
+    if len(time) > 1 and np.any(time[1:] < time[:-1]):
+        order = np.argsort(time, kind='stable')
+        columns = {key: values[order] for key, values in columns.items()}
+        time = columns['time']
+        report['sorted'] = True
+
+    # 3. 重複したtimeは最後の足を残す
+    if len(time) > 1:
+        keep = np.append(time[1:] != time[:-1], True)
+        if not keep.all():
+            report['duplicatesRemoved'] = int(np.count_nonzero(~keep))
+            columns = {key: values[keep] for key, values in columns.items()}
+            time = columns['time']
+
+    # 4. NaN/infの処理
+    finite = np.ones(len(time), dtype=bool)
+    for key in PRICE_COLUMNS:
+        finite &= np.isfinite(columns[key])
+
+    if not finite.all():
+        invalid = int(np.count_nonzero(~finite))
+        report['invalidRows'] = invalid
+
+        if nan_policy == 'reject':
+            first_time = int(time[np.argmin(finite)])
+            raise ValueError(f"{invalid} candles contain NaN/inf values (first at time={first_time})")
+
+        if nan_policy == 'drop':
+            columns = {key: values[finite] for key, values in columns.items()}
+        else:
+            columns = _forward_fill(columns)
+        time = columns['time']
+
+    if len(time) == 0:
+        raise ValueError("candleData has no valid candles")
+
+    # 5. 欠損区間の検出
+    report['gaps'] = _find_gaps(time, gap_factor)
+    report['outputPoints'] = len(time)
+
+    return columns, report
+
+
+def _forward_fill(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """列ごとに直前の有効値でNaN/infを埋め、埋められない先頭の足を除外"""
+    count = len(columns['time'])
+    positions = np.arange(count)
+    leading = np.zeros(count, dtype=bool)
+
+    filled = {'time': columns['time']}
+    for key in PRICE_COLUMNS:
+        values = columns[key]
+        finite = np.isfinite(values)
+        # 各位置で直前の有効値のインデックス (なければ-1)
+        source = np.maximum.accumulate(np.where(finite, positions, -1))
+        leading |= source < 0
+        filled[key] = values[np.maximum(source, 0)]
+
+    if leading.any():
+        filled = {key: values[~leading] for key, values in filled.items()}
+
+    return filled
+
+
+def _find_gaps(time: np.ndarray, gap_factor: float) -> Dict[str, Any]:
+    """通常の間隔 (中央値) より大きく空いた区間を報告"""
+    if len(time) < 2:
+        return {'interval': None, 'count': 0, 'largest': None, 'ranges': []}
+
+    intervals = np.diff(time)
+    interval = float(np.median(intervals))
+    gap_index = np.flatnonzero(intervals > interval * gap_factor)
+
+    return {
+        'interval': interval,
+        'count': int(len(gap_index)),
+        'largest': int(intervals[gap_index].max()) if len(gap_index) else None,
+        'ranges': [
+            {'from': int(time[i]), 'to': int(time[i + 1])}
+            for i in gap_index[:MAX_REPORTED_GAPS]
+        ]
+    }
@@ -0,0 +1,259 @@
+"""
+優先度付きスケジューラー
+チャート表示などの対話的なリクエストと、スクリーナーやパラメータ探索などの
+バッチ処理を別々の上限付きキューに入れ、対話的なリクエストを優先して実行する
+
+- キューが上限に達したリクエストは受け付けずに QueueFullError を返す (バックプレッシャー)
+- 一部のワーカーは対話的なリクエスト専用 (バッチが全ワーカーを占有しない)
+- 対話的なリクエストが続いても、一定回数ごとにバッチを1件実行する (枯渇防止)
+- 期限 (deadline) を過ぎたリクエストは実行せずに DeadlineExceededError で終える
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+
+PRIORITIES = ('interactive', 'batch')
+DEFAULT_QUEUE_LIMITS = {'interactive': 256, 'batch': 1024}
+# 対話的なリクエストをこの件数実行するごとに、待っているバッチを1件実行する
+BATCH_TURN_INTERVAL = 8
+
+
+class QueueFullError(RuntimeError):
+    """キューが上限に達している (時間をおいて再送する)"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """リクエストの期限を過ぎた"""
+
+
+def request_priority(request: Dict[str, Any]) -> str:
+    """
+    リクエストの優先クラス
+
+    'priority' が指定されていればそれを使い、なければバッチリクエスト・バックテストと
+    最新値のみ (スクリーナー) を 'batch'、それ以外を 'interactive' とする
+    """
+    priority = request.get('priority')
+    if priority is None:
+        if request.get('_mode') in ('batch', 'backtest') or request.get('latestOnly'):
+            return 'batch'
+        return 'interactive'
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+    return priority
+
+
+def request_deadline(request: Dict[str, Any], received_at: float) -> Optional[float]:
+    """
+    リクエストの期限 (time.monotonic() の値)
+
+    Args:
+        request: 'deadlineMs' (受信からの猶予ミリ秒) を持つリクエスト
+        received_at: 受信時刻 (time.monotonic())
+
+    Returns:
+        期限 (指定がなければNone)
+    """
+    deadline_ms = request.get('deadlineMs')
+    if deadline_ms is None:
+        return None
+    if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+        raise ValueError("deadlineMs must be a positive number")
+    return received_at + deadline_ms / 1000
+
+
+_local = threading.local()
+
+
+def current_deadline() -> Optional[float]:
+    """実行中のタスクの期限 (スケジューラーのワーカー以外ではNone)"""
+    return getattr(_local, 'deadline', None)
+
+
+def check_deadline(deadline: Optional[float]) -> None:
+    """期限を過ぎていれば DeadlineExceededError を送出"""
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceededError("Request deadline exceeded")
+
+
+def checkpoint() -> None:
+    """
+    長い計算の区切り (ブロックごと等) で呼ぶキャンセル位置
+    実行中のリクエストの期限を過ぎていれば DeadlineExceededError を送出する
+    """
+    check_deadline(current_deadline())
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """
+    このスレッドで実行する処理の期限を設定する (終了時に元に戻す)
+
+    Args:
+        deadline: 期限 (time.monotonic() の値、Noneなら無期限)
+    """
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = deadline
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+class _Task:
+    __slots__ = ('fn', 'future', 'deadline')
+
+    def __init__(self, fn: Callable[[], Any], deadline: Optional[float]):
+        self.fn = fn
+        self.future: Future = Future()
+        self.deadline = deadline
+
+
+class PriorityScheduler:
+    """優先クラスごとの上限付きキューとワーカースレッド"""
+
+    def __init__(
+        self,
+        workers: int,
+        queue_limits: Optional[Dict[str, int]] = None,
+        reserved_interactive: Optional[int] = None
+    ):
+        """
+        Args:
+            workers: ワーカースレッド数
+            queue_limits: 優先クラスごとのキューの上限
+            reserved_interactive: 対話的なリクエスト専用のワーカー数
+                                  (省略時は2ワーカー以上なら1)
+        """
+        workers = max(1, workers)
+        if reserved_interactive is None:
+            reserved_interactive = 1 if workers > 1 else 0
+        reserved_interactive = min(reserved_interactive, workers - 1)
+
+        self.queue_limits = {**DEFAULT_QUEUE_LIMITS, **(queue_limits or {})}
+        self._queues: Dict[str, Deque[Tuple[str, _Task]]] = {priority: deque() for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._interactive_streak = 0
+        self._counters = {
+            priority: {'completed': 0, 'rejected': 0, 'expired': 0, 'cancelled': 0}
+            for priority in PRIORITIES
+        }
+
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(
+                target=self._worker,
+                args=(index < reserved_interactive,),
+                name=f'indicator-{index}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn: Callable[[], Any], priority: str = 'interactive', deadline: Optional[float] = None) -> Future:
+        """
+        タスクをキューに入れる
+
+        Args:
+            fn: 実行する関数
+            priority: 'interactive' または 'batch'
+            deadline: 期限 (time.monotonic() の値、Noneなら無期限)
+
+        Returns:
+            結果のFuture (cancel() でキュー内のタスクを取り消せる)
+
+        Raises:
+            QueueFullError: キューが上限に達している
+        """
+        task = _Task(fn, deadline)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            queue = self._queues[priority]
+            if len(queue) >= self.queue_limits[priority]:
+                self._counters[priority]['rejected'] += 1
+                raise QueueFullError(
+                    f"{priority} queue is full ({self.queue_limits[priority]} requests), retry later"
+                )
+            queue.append((priority, task))
+            self._condition.notify_all()
+        return task.future
+
+    def _take(self, interactive_only: bool) -> Optional[Tuple[str, _Task]]:
+        """次の (優先度, タスク) を取り出す (なければNone、ロック内で呼ぶ)"""
+        interactive = self._queues['interactive']
+        batch = self._queues['batch']
+
+        if interactive_only:
+            return interactive.popleft() if interactive else None
+
+        if batch and (not interactive or self._interactive_streak >= BATCH_TURN_INTERVAL):
+            self._interactive_streak = 0
+            return batch.popleft()
+        if interactive:
+            self._interactive_streak += 1
+            return interactive.popleft()
+        return None
+
+    def _worker(self, interactive_only: bool) -> None:
+        while True:
+            with self._condition:
+                entry = self._take(interactive_only)
+                while entry is None:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                    entry = self._take(interactive_only)
+
+            priority, task = entry
+            counters = self._counters[priority]
+
+            if not task.future.set_running_or_notify_cancel():
+                with self._condition:
+                    counters['cancelled'] += 1
+                continue
+
+            if task.deadline is not None and time.monotonic() > task.deadline:
+                # キューで待つ間に期限を過ぎた (呼び出し元はもう結果を待っていない)
+                task.future.set_exception(DeadlineExceededError("Request deadline exceeded while queued"))
+                with self._condition:
+                    counters['expired'] += 1
+                continue
+
+            try:
+                with deadline_scope(task.deadline):
+                    result = task.fn()
+            except BaseException as e:
+                task.future.set_exception(e)
+            else:
+                task.future.set_result(result)
+
+            with self._condition:
+                counters['completed'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """優先クラスごとのキュー長・上限・処理件数"""
+        with self._condition:
+            return {
+                priority: {
+                    'queued': len(self._queues[priority]),
+                    'limit': self.queue_limits[priority],
+                    **self._counters[priority]
+                }
+                for priority in PRIORITIES
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """新しいタスクの受け付けを止め、キュー内のタスクを処理してから終了する"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
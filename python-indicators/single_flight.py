@@ -0,0 +1,110 @@
+"""
+同一リクエストの合流 (single-flight)
+同じ内容キーの計算が実行中であれば、新たに計算せずにその完了を待って結果を共有する
+(人気銘柄の更新時に同じインジケーターへのリクエストが集中しても計算は一回で済む)
+
+結果は実行中の間だけ共有し、完了後は保持しない (長期の再利用はディスクキャッシュの役割)
+
+先行するリクエストの期限切れ・上限超過はそのリクエストに固有のため共有せず、
+待っていた呼び出し元は自分で計算し直す。待つ時間は呼び出し元自身の期限 (scheduler.py) まで
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, Tuple
+from request_limits import LimitExceededError
+from scheduler import DeadlineExceededError, current_deadline
+
+
+# 先行するリクエストに固有のエラー (待っていた呼び出し元には送出しない)
+REQUEST_SPECIFIC_ERRORS = (DeadlineExceededError, LimitExceededError)
+
+
+class _Call:
+    """実行中の計算 (完了を待つためのイベントと結果)"""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """キーごとに実行中の計算を一つにまとめる (スレッドセーフ)"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        キーの計算を実行する (同じキーが実行中ならその結果を待つ)
+
+        Args:
+            key: 内容キー
+            fn: 計算関数
+
+        Returns:
+            (結果, 他のリクエストの結果を共有したか)
+            計算が例外を送出した場合は、待っていたすべての呼び出し元に同じ例外を送出する
+            (REQUEST_SPECIFIC_ERRORS の場合は待っていた呼び出し元が計算し直す)
+
+        Raises:
+            DeadlineExceededError: 待っている間に呼び出し元の期限を過ぎた
+        """
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                return self._run(key, call, fn), False
+
+            deadline = current_deadline()
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not call.event.wait(remaining):
+                raise DeadlineExceededError("Request deadline exceeded while waiting for a coalesced computation")
+            if call.error is None:
+                return call.result, True
+            if not isinstance(call.error, REQUEST_SPECIFIC_ERRORS):
+                raise call.error
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        """実行中の計算に合流する ((計算, 自分が実行するか))"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+            return call, leader
+
+    def _run(self, key: str, call: _Call, fn: Callable[[], Any]) -> Any:
+        """計算を実行し、待っている呼び出し元に完了を知らせる"""
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """実行数・合流数・実行中のキー数"""
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'inFlight': len(self._calls)
+            }
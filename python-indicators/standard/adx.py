@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+ADX / DMI インジケーター
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from typing import Dict, Any, List
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series, Line
+from price_range import get_kernel
+
+
+class ADXIndicator(IndicatorBase):
+    """ADX・方向性指数 (+DI/-DI) インジケーター"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "adx"
+        self.version = "1.1.0"
+        self.display_type = "multi-line"
+        self.chart_type = "sub"
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'displayName': 'ADX / DMI',
+            'version': self.version,
+            'displayType': self.display_type,
+            'chartType': self.chart_type,
+            'parameters': self.get_parameter_definitions(),
+            'description': 'Average Directional Index with +DI/-DI - trend strength and direction'
+        }
+
+    def get_parameter_definitions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'name': 'period',
+                'displayName': 'Period',
+                'type': 'number',
+                'default': 14,
+                'min': 2,
+                'max': 100,
+                'step': 1,
+                'description': 'Number of periods for DI and ADX smoothing'
+            },
+            {
+                'name': 'adxColor',
+                'displayName': 'ADX Line Color',
+                'type': 'color',
+                'default': '#2196F3',
+                'description': 'ADX line color'
+            },
+            {
+                'name': 'plusDIColor',
+                'displayName': '+DI Line Color',
+                'type': 'color',
+                'default': '#66BB6A',
+                'description': '+DI line color'
+            },
+            {
+                'name': 'minusDIColor',
+                'displayName': '-DI Line Color',
+                'type': 'color',
+                'default': '#ef5350',
+                'description': '-DI line color'
+            },
+            {
+                'name': 'lineWidth',
+                'displayName': 'Line Width',
+                'type': 'number',
+                'default': 2,
+                'min': 1,
+                'max': 5,
+                'step': 1,
+                'description': 'Line thickness'
+            },
+            {
+                'name': 'trendLevel',
+                'displayName': 'Trend Level',
+                'type': 'number',
+                'default': 25,
+                'min': 10,
+                'max': 50,
+                'step': 5,
+                'description': 'ADX level above which the market is trending'
+            }
+        ]
+
+    def validate_params(self, params: Dict[str, Any]) -> bool:
+        """パラメータバリデーション"""
+        period = params.get('period', 14)
+        if not isinstance(period, int) or period < 2:
+            return False
+        return True
+
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # DIとADXの2段のWilder平滑化が収束する本数
+        return params.get('period', 14) * 40
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """ADX・+DI・-DIの3系列"""
+        return 3 * points
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
+        """ADX/DMI計算"""
+        period = params.get('period', 14)
+        adx_color = params.get('adxColor', '#2196F3')
+        plus_color = params.get('plusDIColor', '#66BB6A')
+        minus_color = params.get('minusDIColor', '#ef5350')
+        line_width = params.get('lineWidth', 2)
+        trend_level = params.get('trendLevel', 25)
+
+        columns = candle_columns(candle_data)
+        times = columns['time']
+        directional = get_kernel(columns['high'], columns['low'], columns['close']).directional(period)
+        adx = directional['adx']
+        adx_values = Series(times, adx)
+
+        current_adx = float(adx[-1]) if len(adx) and not np.isnan(adx[-1]) else None
+
+        return IndicatorResult.multi(
+            [
+                Line('ADX', adx_values, {
+                    'color': adx_color,
+                    'lineWidth': line_width,
+                    'title': f'ADX({period})'
+                }),
+                Line('+DI', Series(times, directional['plusDI']), {
+                    'color': plus_color,
+                    'lineWidth': 1,
+                    'title': f'+DI({period})'
+                }),
+                Line('-DI', Series(times, directional['minusDI']), {
+                    'color': minus_color,
+                    'lineWidth': 1,
+                    'title': f'-DI({period})'
+                })
+            ],
+            levels=[
+                {'value': trend_level, 'color': '#666', 'style': 'dashed'}
+            ],
+            metadata={
+                'period': period,
+                'trendLevel': trend_level,
+                'currentValue': current_adx,
+                'calculatedPoints': len(adx_values),
+                'interpretation': self._interpret_adx(current_adx, trend_level) if current_adx is not None else None
+            }
+        )
+
+    def _interpret_adx(self, adx: float, trend_level: float) -> str:
+        """ADX値の解釈"""
+        if adx >= trend_level:
+            return 'Trending (トレンド相場)'
+        return 'Ranging (レンジ相場)'
+
+
+if __name__ == '__main__':
+    main_runner(ADXIndicator)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+平均真の範囲 (ATR) インジケーター
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from typing import Dict, Any, List
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series
+from price_range import get_kernel
+
+
+class ATRIndicator(IndicatorBase):
+    """平均真の範囲インジケーター"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "atr"
+        self.version = "1.0.0"
+        self.display_type = "single-line"
+        self.chart_type = "sub"
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'displayName': 'Average True Range (ATR)',
+            'version': self.version,
+            'displayType': self.display_type,
+            'chartType': self.chart_type,
+            'parameters': self.get_parameter_definitions(),
+            'description': 'Volatility indicator - Wilder-smoothed average of the true range'
+        }
+
+    def get_parameter_definitions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'name': 'period',
+                'displayName': 'Period',
+                'type': 'number',
+                'default': 14,
+                'min': 1,
+                'max': 100,
+                'step': 1,
+                'description': 'Number of periods for ATR calculation'
+            },
+            {
+                'name': 'color',
+                'displayName': 'Line Color',
+                'type': 'color',
+                'default': '#FF9800',
+                'description': 'ATR line color'
+            },
+            {
+                'name': 'lineWidth',
+                'displayName': 'Line Width',
+                'type': 'number',
+                'default': 2,
+                'min': 1,
+                'max': 5,
+                'step': 1,
+                'description': 'Line thickness'
+            }
+        ]
+
+    def validate_params(self, params: Dict[str, Any]) -> bool:
+        """パラメータバリデーション"""
+        period = params.get('period', 14)
+        if not isinstance(period, int) or period < 1:
+            return False
+        return True
+
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # Wilder平滑化の初期値の影響が無視できる本数 (RSIと同じ)
+        return params.get('period', 14) * 20
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
+        """ATR計算"""
+        period = params.get('period', 14)
+        color = params.get('color', '#FF9800')
+        line_width = params.get('lineWidth', 2)
+
+        columns = candle_columns(candle_data)
+        times = columns['time']
+        atr_values = get_kernel(columns['high'], columns['low'], columns['close']).atr(period)
+        values = Series(times, atr_values)
+
+        current_atr = float(atr_values[-1]) if len(atr_values) and not np.isnan(atr_values[-1]) else None
+
+        return IndicatorResult.single(
+            values,
+            line_config={
+                'color': color,
+                'lineWidth': line_width,
+                'lineStyle': 'solid',
+                'title': f'ATR({period})'
+            },
+            metadata={
+                'period': period,
+                'currentValue': current_atr,
+                'calculatedPoints': len(values)
+            }
+        )
+
+
+if __name__ == '__main__':
+    main_runner(ATRIndicator)
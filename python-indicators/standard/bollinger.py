@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
 ボリンジャーバンド インジケーター
+'prefixIndex' 付きのデータセットでは、中央線と標準偏差を累積和・累積二乗和から求める
 """
 
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
 import numpy as np
-from typing import Dict, Any, List
-from indicator_interface import IndicatorBase, CandleData, main_runner
+from typing import Dict, Any, List, Tuple
+from indicator_interface import IndicatorBase, CandleData, candle_columns, candle_index, main_runner
+from results import IndicatorResult, Series, Line
 from talib_wrapper import TALibWrapper
+from events import crossings, build_events, sort_events
 
 
 class BollingerBandsIndicator(IndicatorBase):
@@ -21,6 +23,7 @@ class BollingerBandsIndicator(IndicatorBase):
         super().__init__()
         self.name = "bollinger"
         self.version = "1.0.0"
+        self.input_columns = ('close',)
         self.display_type = "multi-line"
         self.chart_type = "main"
 
@@ -101,7 +104,54 @@ class BollingerBandsIndicator(IndicatorBase):
             return False
         return True
 
-    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # 最後のperiod本で最新値が確定する
+        return params.get('period', 20)
+
+    @staticmethod
+    def bands(candle_data: List[CandleData], period: int, std_dev: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """上・中・下のバンド (データセットの累積和のインデックスがあればそれを使う)"""
+        index = candle_index(candle_data, 'close')
+        if index is None:
+            return TALibWrapper.BBANDS(
+                candle_columns(candle_data)['close'],
+                timeperiod=period,
+                nbdevup=std_dev,
+                nbdevdn=std_dev
+            )
+        middle = index.rolling_mean(period)
+        deviation = index.rolling_std(period)
+        return middle + deviation * std_dev, middle, middle - deviation * std_dev
+
+    def calculate_events(self, candle_data: List[CandleData], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        終値のバンド抜け
+        crossAboveUpper / crossBelowUpper: 上のバンドを上抜け・下抜け
+        crossBelowLower / crossAboveLower: 下のバンドを下抜け・上抜け
+        """
+        std_dev = params.get('stdDev', 2)
+        columns = candle_columns(candle_data)
+        close = columns['close']
+        upper, middle, lower = self.bands(candle_data, params.get('period', 20), std_dev)
+
+        times = columns['time']
+        upper_crosses = crossings(close, upper)
+        lower_crosses = crossings(close, lower)
+        upper_fields = {'close': close, 'upper': upper, 'middle': middle}
+        lower_fields = {'close': close, 'lower': lower, 'middle': middle}
+        return sort_events(
+            build_events(times, 'crossAboveUpper', upper_crosses['up'], upper_fields)
+            + build_events(times, 'crossBelowUpper', upper_crosses['down'], upper_fields)
+            + build_events(times, 'crossBelowLower', lower_crosses['down'], lower_fields)
+            + build_events(times, 'crossAboveLower', lower_crosses['up'], lower_fields)
+        )
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """上・中・下のバンドの3系列"""
+        return 3 * points
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
         """ボリンジャーバンド計算"""
         period = params.get('period', 20)
         std_dev = params.get('stdDev', 2)
@@ -110,73 +160,34 @@ class BollingerBandsIndicator(IndicatorBase):
         lower_color = params.get('lowerColor', '#66BB6A')
         line_width = params.get('lineWidth', 2)
 
-        df = pd.DataFrame(candle_data)
-        close_array = df['close'].values
-
-        upper, middle, lower = TALibWrapper.BBANDS(
-            close_array,
-            timeperiod=period,
-            nbdevup=std_dev,
-            nbdevdn=std_dev
-        )
+        times = candle_columns(candle_data)['time']
+        upper, middle, lower = self.bands(candle_data, period, std_dev)
+        middle_values = Series(times, middle)
 
-        upper_values = []
-        middle_values = []
-        lower_values = []
-        
-        for i in range(len(candle_data)):
-            if not np.isnan(middle[i]):
-                upper_values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(upper[i])
-                })
-                middle_values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(middle[i])
-                })
-                lower_values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(lower[i])
+        return IndicatorResult.multi(
+            [
+                Line('Upper', Series(times, upper), {
+                    'color': upper_color,
+                    'lineWidth': line_width,
+                    'title': f'BB Upper({period},{std_dev})'
+                }),
+                Line('Middle', middle_values, {
+                    'color': middle_color,
+                    'lineWidth': line_width,
+                    'title': f'BB Middle({period})'
+                }),
+                Line('Lower', Series(times, lower), {
+                    'color': lower_color,
+                    'lineWidth': line_width,
+                    'title': f'BB Lower({period},{std_dev})'
                 })
-
-        return {
-            'success': True,
-            'displayType': 'multi-line',
-            'lines': [
-                {
-                    'name': 'Upper',
-                    'values': upper_values,
-                    'config': {
-                        'color': upper_color,
-                        'lineWidth': line_width,
-                        'title': f'BB Upper({period},{std_dev})'
-                    }
-                },
-                {
-                    'name': 'Middle',
-                    'values': middle_values,
-                    'config': {
-                        'color': middle_color,
-                        'lineWidth': line_width,
-                        'title': f'BB Middle({period})'
-                    }
-                },
-                {
-                    'name': 'Lower',
-                    'values': lower_values,
-                    'config': {
-                        'color': lower_color,
-                        'lineWidth': line_width,
-                        'title': f'BB Lower({period},{std_dev})'
-                    }
-                }
             ],
-            'metadata': {
+            metadata={
                 'period': period,
                 'stdDev': std_dev,
                 'calculatedPoints': len(middle_values)
             }
-        }
+        )
 
 
 if __name__ == '__main__':
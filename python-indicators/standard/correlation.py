@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+ローリング相関 インジケーター (複数銘柄)
+リクエストのローソク足をベンチマークとし、params.series の各銘柄の終値と合わせて
+全ペアのリターンの相関・共分散・ベータを移動窓で計算する
+
+    params: {
+        'period': 20,
+        'series': {'MSFT': [{'time': ..., 'close': ...}, ...], 'GOOG': {'time': [...], 'close': [...]}},
+        'metrics': ['correlation', 'beta'],   # 系列として返す指標
+        'matrixOnly': false                   # true なら最新の行列だけを計算して返す
+    }
+
+各銘柄の終値はベンチマークの各足のtime以前で最も新しい値に揃える。
+窓内の積和はブロックごとの累積和の差で求めるため、計算量は O(足 × 銘柄²) で、
+メモリは出力とブロック分 (ブロックの足数 × 銘柄²) に抑えられる。
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from typing import Dict, Any, Iterator, List, Tuple
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series, Line
+from scheduler import checkpoint
+
+
+METRICS = ('correlation', 'covariance', 'beta')
+# 1ブロックの (足 × 銘柄²) の要素数の上限
+BLOCK_ELEMENTS = 4_000_000
+LINE_COLORS = ('#2196F3', '#FF6B35', '#66BB6A', '#9C27B0', '#ef5350', '#FF9800', '#00BCD4', '#795548')
+
+
+def align_closes(times: np.ndarray, points: Any) -> np.ndarray:
+    """
+    銘柄の終値をベンチマークのtimeに揃える (各足のtime以前で最も新しい終値、なければNaN)
+
+    Args:
+        times: ベンチマークのtime配列 (昇順)
+        points: [{'time', 'close'}, ...] または {'time': [...], 'close': [...]}
+
+    Returns:
+        timesと同じ長さの終値
+    """
+    if isinstance(points, dict):
+        series_times = np.asarray(points.get('time', []), dtype=np.int64)
+        closes = np.asarray(points.get('close', []), dtype=np.float64)
+    else:
+        series_times = np.fromiter((p['time'] for p in points), dtype=np.int64, count=len(points))
+        closes = np.fromiter((p['close'] for p in points), dtype=np.float64, count=len(points))
+
+    if len(series_times) != len(closes):
+        raise ValueError("series time and close must have the same length")
+
+    order = np.argsort(series_times, kind='stable')
+    series_times, closes = series_times[order], closes[order]
+
+    positions = np.searchsorted(series_times, times, side='right') - 1
+    aligned = np.full(len(times), np.nan)
+    found = positions >= 0
+    aligned[found] = closes[positions[found]]
+    return aligned
+
+
+def window_moments(returns: np.ndarray, period: int, start: int = 0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    移動窓の共分散行列をブロックごとに計算するジェネレーター
+
+    窓内の各銘柄の和と全ペアの積和を、ブロック (と直前の period 行) の累積和の差で求める。
+    窓に欠損 (NaN) を含む銘柄が関わる要素はNaN。
+
+    Args:
+        returns: (足 × 銘柄) のリターン
+        period: 窓の足数
+        start: 計算を始める行 (窓の最後の行)
+
+    Yields:
+        (行のインデックス, (行 × 銘柄 × 銘柄) の共分散)
+    """
+    rows, count = returns.shape
+    valid = np.isfinite(returns)
+    filled = np.where(valid, returns, 0.0)
+    block = max(64, BLOCK_ELEMENTS // max(count * count, 1) - period)
+
+    for block_start in range(max(start, period - 1), rows, block):
+        checkpoint()
+        block_end = min(block_start + block, rows)
+        first = block_start - period + 1
+        window = filled[first:block_end]
+
+        # 先頭に0を置いた累積和の差 = 窓の和
+        products = np.zeros((len(window) + 1, count, count))
+        np.cumsum(window[:, :, None] * window[:, None, :], axis=0, out=products[1:])
+        sums = np.zeros((len(window) + 1, count))
+        np.cumsum(window, axis=0, out=sums[1:])
+        valid_counts = np.zeros((len(window) + 1, count), dtype=np.int64)
+        np.cumsum(valid[first:block_end], axis=0, out=valid_counts[1:])
+
+        sum_xy = products[period:] - products[:-period]
+        sum_x = sums[period:] - sums[:-period]
+        complete = (valid_counts[period:] - valid_counts[:-period]) == period
+
+        covariance = (sum_xy - sum_x[:, :, None] * sum_x[:, None, :] / period) / (period - 1)
+        pair_complete = complete[:, :, None] & complete[:, None, :]
+        covariance[~pair_complete] = np.nan
+
+        yield np.arange(block_start, block_end), covariance
+
+
+def derive(covariance: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    共分散行列 (... × 銘柄 × 銘柄) から相関とベータを求める
+
+    Returns:
+        {'covariance', 'correlation', 'beta'} (beta[i][j] は銘柄iの銘柄jに対するベータ)
+    """
+    variance = np.diagonal(covariance, axis1=-2, axis2=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.sqrt(variance[..., :, None] * variance[..., None, :])
+        correlation = np.where(scale > 0, covariance / scale, np.nan)
+        beta = np.where(variance[..., None, :] > 0, covariance / variance[..., None, :], np.nan)
+    return {'covariance': covariance, 'correlation': correlation, 'beta': beta}
+
+
+def _matrix_to_lists(matrix: np.ndarray) -> List[List[Any]]:
+    """NaNをNoneにした入れ子のリスト (JSON用)"""
+    return [[None if np.isnan(value) else float(value) for value in row] for row in matrix]
+
+
+class CorrelationIndicator(IndicatorBase):
+    """複数銘柄のローリング相関・共分散・ベータ"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "correlation"
+        self.version = "1.0.0"
+        self.input_columns = ('close',)
+        self.display_type = "multi-line"
+        self.chart_type = "sub"
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'displayName': 'Rolling Correlation',
+            'version': self.version,
+            'displayType': self.display_type,
+            'chartType': self.chart_type,
+            'parameters': self.get_parameter_definitions(),
+            'description': 'Rolling return correlation, covariance and beta between the chart symbol '
+                           'and the symbols passed in params.series'
+        }
+
+    def get_parameter_definitions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'name': 'period',
+                'displayName': 'Period',
+                'type': 'number',
+                'default': 20,
+                'min': 2,
+                'max': 500,
+                'step': 1,
+                'description': 'Number of returns in the rolling window'
+            },
+            {
+                'name': 'lineWidth',
+                'displayName': 'Line Width',
+                'type': 'number',
+                'default': 1,
+                'min': 1,
+                'max': 5,
+                'step': 1,
+                'description': 'Line thickness'
+            }
+        ]
+
+    def validate_params(self, params: Dict[str, Any]) -> bool:
+        """パラメータバリデーション"""
+        period = params.get('period', 20)
+        series = params.get('series')
+        metrics = params.get('metrics', ['correlation'])
+
+        if not isinstance(period, int) or isinstance(period, bool) or period < 2:
+            return False
+        if not isinstance(series, dict) or len(series) == 0:
+            return False
+        if not all(isinstance(points, (list, dict)) for points in series.values()):
+            return False
+        if not isinstance(metrics, list) or not all(metric in METRICS for metric in metrics):
+            return False
+        return True
+
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数 (period本のリターン = period + 1本の終値)"""
+        return params.get('period', 20) + 1
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """系列数 (指標ごとの全ペア、ベータはベンチマークに対する銘柄数) × 本数"""
+        if params.get('matrixOnly'):
+            return 0
+        count = len(params.get('series') or {}) + 1
+        lines = sum(count - 1 if metric == 'beta' else count * (count - 1) // 2
+                    for metric in params.get('metrics', ['correlation']))
+        return lines * points
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
+        """ローリング相関計算"""
+        period = params.get('period', 20)
+        metrics = params.get('metrics', ['correlation'])
+        matrix_only = bool(params.get('matrixOnly', False))
+        benchmark = str(params.get('benchmark', 'base'))
+        line_width = params.get('lineWidth', 1)
+
+        columns = candle_columns(candle_data)
+        times = columns['time']
+        symbols = [benchmark] + [str(name) for name in params['series']]
+        if len(set(symbols)) != len(symbols):
+            raise ValueError(f"Duplicate symbol names: {', '.join(symbols)}")
+
+        closes = np.column_stack(
+            [columns['close'].astype(np.float64)]
+            + [align_closes(times, points) for points in params['series'].values()]
+        )
+        returns = np.full(closes.shape, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns[1:] = closes[1:] / closes[:-1] - 1
+
+        count = len(symbols)
+        pairs = [(i, j) for i in range(count) for j in range(i + 1, count)]
+        # 系列として返す (指標, i, j): ベータは各銘柄のベンチマークに対する値
+        outputs = []
+        for metric in ([] if matrix_only else metrics):
+            if metric == 'beta':
+                outputs.extend(('beta', i, 0) for i in range(1, count))
+            else:
+                outputs.extend((metric, i, j) for i, j in pairs)
+        series_values = np.full((len(outputs), len(times)), np.nan)
+
+        latest = np.full((count, count), np.nan)
+        # matrixOnly では最後の窓だけを計算する
+        start = len(times) - 1 if matrix_only else 0
+        for rows, covariance in window_moments(returns, period, start):
+            derived = derive(covariance)
+            for position, (metric, i, j) in enumerate(outputs):
+                series_values[position, rows] = derived[metric][:, i, j]
+            latest = covariance[-1]
+
+        matrix = {name: _matrix_to_lists(values) for name, values in derive(latest).items()}
+        lines = []
+        for position, (metric, i, j) in enumerate(outputs):
+            name = f'{metric}:{symbols[i]}/{symbols[j]}'
+            lines.append(Line(name, Series(times, series_values[position]), {
+                'color': LINE_COLORS[position % len(LINE_COLORS)],
+                'lineWidth': line_width,
+                'title': f'{metric.capitalize()} {symbols[i]}/{symbols[j]} ({period})'
+            }))
+
+        return IndicatorResult.multi(
+            lines,
+            levels=[{'value': 0, 'color': '#666', 'style': 'dashed'}],
+            metadata={
+                'period': period,
+                'symbols': symbols,
+                'metrics': [] if matrix_only else metrics,
+                'matrix': {'time': int(times[-1]) if len(times) else None, **matrix},
+                'calculatedPoints': int(np.count_nonzero(~np.isnan(series_values[0]))) if outputs else 0
+            }
+        )
+
+
+if __name__ == '__main__':
+    main_runner(CorrelationIndicator)
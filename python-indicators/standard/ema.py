@@ -7,10 +7,9 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
-import numpy as np
 from typing import Dict, Any, List
-from indicator_interface import IndicatorBase, CandleData, main_runner
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series
 from talib_wrapper import TALibWrapper
 
 
@@ -21,6 +20,7 @@ class EMAIndicator(IndicatorBase):
         super().__init__()
         self.name = "ema"
         self.version = "1.0.0"
+        self.input_columns = ('close',)
         self.display_type = "single-line"
         self.chart_type = "main"
 
@@ -73,71 +73,36 @@ class EMAIndicator(IndicatorBase):
             return False
         return True
 
-    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # EMAは再帰的なため、初期値の影響が (1 - 2/(period+1))^n で減衰して
+        # 無視できる本数 (period * 10 ≒ 誤差 e^-20) を使う
+        return params.get('period', 20) * 10
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
         """EMA計算"""
         period = params.get('period', 20)
         color = params.get('color', '#FF6B35')
         line_width = params.get('lineWidth', 2)
 
-        df = pd.DataFrame(candle_data)
-        close_array = df['close'].values
-        ema_values = TALibWrapper.EMA(close_array, timeperiod=period)
-
-        values = []
-        for i, value in enumerate(ema_values):
-            if not np.isnan(value):
-                values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(value)
-                })
+        columns = candle_columns(candle_data)
+        close_array = columns['close']
+        times = columns['time']
+        values = Series(times, TALibWrapper.EMA(close_array, timeperiod=period))
 
-        return {
-            'success': True,
-            'displayType': 'single-line',
-            'values': values,
-            'lineConfig': {
+        return IndicatorResult.single(
+            values,
+            line_config={
                 'color': color,
                 'lineWidth': line_width,
                 'lineStyle': 'solid',
                 'title': f'EMA({period})'
             },
-            'metadata': {
+            metadata={
                 'period': period,
                 'calculatedPoints': len(values)
             }
-        }
-
-        # DataFrameに変換
-        df = pd.DataFrame(candle_data)
-        close_array = df['close'].values
-
-        # TA-LibでEMA計算
-        ema_values = TALibWrapper.EMA(close_array, timeperiod=period)
-
-        # 結果を整形
-        values = []
-        for i, value in enumerate(ema_values):
-            if not np.isnan(value):
-                values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(value)
-                })
-
-        return {
-            'success': True,
-            'displayType': 'single-line',
-            'values': values,
-            'lineConfig': {
-                'color': color,
-                'lineWidth': 2,
-                'lineStyle': 'solid',
-                'title': f'EMA({period})'
-            },
-            'metadata': {
-                'period': period,
-                'calculatedPoints': len(values)
-            }
-        }
+        )
 
 
 if __name__ == '__main__':
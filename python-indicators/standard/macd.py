@@ -7,11 +7,11 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
-import numpy as np
 from typing import Dict, Any, List
-from indicator_interface import IndicatorBase, CandleData, main_runner
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series, Line
 from talib_wrapper import TALibWrapper
+from events import crossings, build_events, sort_events
 
 
 class MACDIndicator(IndicatorBase):
@@ -20,7 +20,8 @@ class MACDIndicator(IndicatorBase):
     def __init__(self):
         super().__init__()
         self.name = "macd"
-        self.version = "1.0.0"
+        self.version = "1.1.0"
+        self.input_columns = ('close',)
         self.display_type = "multi-line"
         self.chart_type = "sub"
 
@@ -112,7 +113,33 @@ class MACDIndicator(IndicatorBase):
             return False
         return True
 
-    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # 遅いEMAとシグナルEMAが初期値の影響を無視できるまで収束する本数
+        return (params.get('slowPeriod', 26) + params.get('signalPeriod', 9)) * 10
+
+    def calculate_events(self, candle_data: List[CandleData], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """MACDとシグナルのクロス (bullishCross: 上抜け, bearishCross: 下抜け)"""
+        columns = candle_columns(candle_data)
+        macd, signal, histogram = TALibWrapper.MACD(
+            columns['close'],
+            fastperiod=params.get('fastPeriod', 12),
+            slowperiod=params.get('slowPeriod', 26),
+            signalperiod=params.get('signalPeriod', 9)
+        )
+
+        crosses = crossings(macd, signal)
+        fields = {'macd': macd, 'signal': signal, 'histogram': histogram}
+        return sort_events(
+            build_events(columns['time'], 'bullishCross', crosses['up'], fields)
+            + build_events(columns['time'], 'bearishCross', crosses['down'], fields)
+        )
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """MACD・シグナル・ヒストグラムの3系列"""
+        return 3 * points
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
         """MACD計算"""
         fast_period = params.get('fastPeriod', 12)
         slow_period = params.get('slowPeriod', 26)
@@ -122,8 +149,9 @@ class MACDIndicator(IndicatorBase):
         histogram_color = params.get('histogramColor', '#9C27B0')
         line_width = params.get('lineWidth', 2)
 
-        df = pd.DataFrame(candle_data)
-        close_array = df['close'].values
+        columns = candle_columns(candle_data)
+        close_array = columns['close']
+        times = columns['time']
 
         macd, signal, histogram = TALibWrapper.MACD(
             close_array,
@@ -131,68 +159,34 @@ class MACDIndicator(IndicatorBase):
             slowperiod=slow_period,
             signalperiod=signal_period
         )
+        macd_values = Series(times, macd)
 
-        macd_values = []
-        signal_values = []
-        histogram_values = []
-        
-        for i in range(len(candle_data)):
-            if not np.isnan(macd[i]):
-                macd_values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(macd[i])
-                })
-            if not np.isnan(signal[i]):
-                signal_values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(signal[i])
+        return IndicatorResult.multi(
+            [
+                Line('MACD', macd_values, {
+                    'color': macd_color,
+                    'lineWidth': line_width,
+                    'title': 'MACD'
+                }),
+                Line('Signal', Series(times, signal), {
+                    'color': signal_color,
+                    'lineWidth': line_width,
+                    'title': 'Signal'
+                }),
+                Line('Histogram', Series(times, histogram), {
+                    'color': histogram_color,
+                    'lineWidth': 1,
+                    'title': 'Histogram',
+                    'style': 'histogram'
                 })
-            if not np.isnan(histogram[i]):
-                histogram_values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(histogram[i])
-                })
-
-        return {
-            'success': True,
-            'displayType': 'multi-line',
-            'lines': [
-                {
-                    'name': 'MACD',
-                    'values': macd_values,
-                    'config': {
-                        'color': macd_color,
-                        'lineWidth': line_width,
-                        'title': 'MACD'
-                    }
-                },
-                {
-                    'name': 'Signal',
-                    'values': signal_values,
-                    'config': {
-                        'color': signal_color,
-                        'lineWidth': line_width,
-                        'title': 'Signal'
-                    }
-                },
-                {
-                    'name': 'Histogram',
-                    'values': histogram_values,
-                    'config': {
-                        'color': histogram_color,
-                        'lineWidth': 1,
-                        'title': 'Histogram',
-                        'style': 'histogram'
-                    }
-                }
             ],
-            'metadata': {
+            metadata={
                 'fastPeriod': fast_period,
                 'slowPeriod': slow_period,
                 'signalPeriod': signal_period,
                 'calculatedPoints': len(macd_values)
             }
-        }
+        )
 
 
 if __name__ == '__main__':
@@ -7,11 +7,12 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
 import numpy as np
 from typing import Dict, Any, List
-from indicator_interface import IndicatorBase, CandleData, main_runner
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series
 from talib_wrapper import TALibWrapper
+from events import crossings, build_events, sort_events
 
 
 class RSIIndicator(IndicatorBase):
@@ -21,6 +22,7 @@ class RSIIndicator(IndicatorBase):
         super().__init__()
         self.name = "rsi"
         self.version = "1.0.0"
+        self.input_columns = ('close',)
         self.display_type = "single-line"
         self.chart_type = "sub"
 
@@ -93,7 +95,30 @@ class RSIIndicator(IndicatorBase):
             return False
         return True
 
-    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # Wilder平滑化は (1 - 1/period)^n で減衰するため、
+        # 初期値の影響が無視できる本数 (period * 20 ≒ 誤差 e^-20) を使う
+        return params.get('period', 14) * 20
+
+    def calculate_events(self, candle_data: List[CandleData], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """買われすぎ・売られすぎ水準への到達 (enterOverbought: 上抜け, enterOversold: 下抜け)"""
+        overbought = params.get('overbought', 70)
+        oversold = params.get('oversold', 30)
+        columns = candle_columns(candle_data)
+        rsi_values = TALibWrapper.RSI(columns['close'], timeperiod=params.get('period', 14))
+
+        times = columns['time']
+        fields = {'value': rsi_values}
+        events = (
+            build_events(times, 'enterOverbought', crossings(rsi_values, overbought)['up'], fields)
+            + build_events(times, 'enterOversold', crossings(rsi_values, oversold)['down'], fields)
+        )
+        for event in events:
+            event['level'] = overbought if event['type'] == 'enterOverbought' else oversold
+        return sort_events(events)
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
         """RSI計算"""
         period = params.get('period', 14)
         color = params.get('color', '#9C27B0')
@@ -101,36 +126,28 @@ class RSIIndicator(IndicatorBase):
         overbought = params.get('overbought', 70)
         oversold = params.get('oversold', 30)
 
-        df = pd.DataFrame(candle_data)
-        close_array = df['close'].values
+        columns = candle_columns(candle_data)
+        close_array = columns['close']
+        times = columns['time']
         rsi_values = TALibWrapper.RSI(close_array, timeperiod=period)
-
-        values = []
-        for i, value in enumerate(rsi_values):
-            if not np.isnan(value):
-                values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(value)
-                })
+        values = Series(times, rsi_values)
 
         current_rsi = float(rsi_values[-1]) if not np.isnan(rsi_values[-1]) else None
 
-        return {
-            'success': True,
-            'displayType': 'single-line',
-            'values': values,
-            'lineConfig': {
+        return IndicatorResult.single(
+            values,
+            line_config={
                 'color': color,
                 'lineWidth': line_width,
                 'lineStyle': 'solid',
                 'title': f'RSI({period})'
             },
-            'levels': [
+            levels=[
                 {'value': overbought, 'color': '#ef5350', 'style': 'dashed'},
                 {'value': 50, 'color': '#666', 'style': 'solid'},
                 {'value': oversold, 'color': '#66BB6A', 'style': 'dashed'}
             ],
-            'metadata': {
+            metadata={
                 'period': period,
                 'overbought': overbought,
                 'oversold': oversold,
@@ -138,7 +155,7 @@ class RSIIndicator(IndicatorBase):
                 'calculatedPoints': len(values),
                 'interpretation': self._interpret_rsi(current_rsi) if current_rsi else None
             }
-        }
+        )
 
     def _interpret_rsi(self, rsi: float) -> str:
         """RSI値の解釈"""
@@ -1,16 +1,16 @@
 #!/usr/bin/env python3
 """
 単純移動平均 (SMA) インジケーター
+累積和のインデックスを持つデータセットでは、インデックスの差から窓ごとの集計なしで計算する
 """
 
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import pandas as pd
-import numpy as np
 from typing import Dict, Any, List
-from indicator_interface import IndicatorBase, CandleData, main_runner
+from indicator_interface import IndicatorBase, CandleData, candle_columns, candle_index, main_runner
+from results import IndicatorResult, Series
 from talib_wrapper import TALibWrapper
 
 
@@ -21,6 +21,7 @@ class SMAIndicator(IndicatorBase):
         super().__init__()
         self.name = "sma"
         self.version = "1.0.0"
+        self.input_columns = ('close',)
         self.display_type = "single-line"
         self.chart_type = "main"
 
@@ -75,44 +76,44 @@ class SMAIndicator(IndicatorBase):
             return False
         return True
 
-    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> Dict[str, Any]:
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # 最後のperiod本で最新値が確定する
+        return params.get('period', 20)
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
         """SMA計算"""
         # パラメータ取得
         period = params.get('period', 20)
         color = params.get('color', '#2196F3')
         line_width = params.get('lineWidth', 2)
 
-        # DataFrameに変換
-        df = pd.DataFrame(candle_data)
-        close_array = df['close'].values
-
-        # TA-LibでSMA計算
-        sma_values = TALibWrapper.SMA(close_array, timeperiod=period)
+        # 列を取り出す
+        columns = candle_columns(candle_data)
+        close_array = columns['close']
+        times = columns['time']
 
-        # 結果を整形
-        values = []
-        for i, value in enumerate(sma_values):
-            if not np.isnan(value):
-                values.append({
-                    'time': int(candle_data[i]['time']),
-                    'value': float(value)
-                })
+        index = candle_index(candle_data, 'close')
+        if index is not None:
+            # データセットの累積和のインデックスから計算
+            values = Series(times, index.rolling_mean(period))
+        else:
+            # TA-LibでSMA計算
+            values = Series(times, TALibWrapper.SMA(close_array, timeperiod=period))
 
-        return {
-            'success': True,
-            'displayType': 'single-line',
-            'values': values,
-            'lineConfig': {
+        return IndicatorResult.single(
+            values,
+            line_config={
                 'color': color,
                 'lineWidth': line_width,
                 'lineStyle': 'solid',
                 'title': f'SMA({period})'
             },
-            'metadata': {
+            metadata={
                 'period': period,
                 'calculatedPoints': len(values)
             }
-        }
+        )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+ストキャスティクス インジケーター
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Dict, Any, List
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from results import IndicatorResult, Series, Line
+from price_range import get_kernel
+
+
+class StochasticIndicator(IndicatorBase):
+    """スローストキャスティクスインジケーター"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "stochastic"
+        self.version = "1.0.0"
+        self.display_type = "multi-line"
+        self.chart_type = "sub"
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'displayName': 'Stochastic Oscillator',
+            'version': self.version,
+            'displayType': self.display_type,
+            'chartType': self.chart_type,
+            'parameters': self.get_parameter_definitions(),
+            'description': 'Momentum oscillator comparing the close to the recent high-low range'
+        }
+
+    def get_parameter_definitions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'name': 'kPeriod',
+                'displayName': '%K Period',
+                'type': 'number',
+                'default': 14,
+                'min': 1,
+                'max': 100,
+                'step': 1,
+                'description': 'Lookback period for the highest high and lowest low'
+            },
+            {
+                'name': 'kSmoothing',
+                'displayName': '%K Smoothing',
+                'type': 'number',
+                'default': 3,
+                'min': 1,
+                'max': 20,
+                'step': 1,
+                'description': 'SMA period applied to the raw %K'
+            },
+            {
+                'name': 'dPeriod',
+                'displayName': '%D Period',
+                'type': 'number',
+                'default': 3,
+                'min': 1,
+                'max': 20,
+                'step': 1,
+                'description': 'SMA period of %D'
+            },
+            {
+                'name': 'kColor',
+                'displayName': '%K Line Color',
+                'type': 'color',
+                'default': '#2196F3',
+                'description': '%K line color'
+            },
+            {
+                'name': 'dColor',
+                'displayName': '%D Line Color',
+                'type': 'color',
+                'default': '#FF6B35',
+                'description': '%D line color'
+            },
+            {
+                'name': 'lineWidth',
+                'displayName': 'Line Width',
+                'type': 'number',
+                'default': 2,
+                'min': 1,
+                'max': 5,
+                'step': 1,
+                'description': 'Line thickness'
+            },
+            {
+                'name': 'overbought',
+                'displayName': 'Overbought Level',
+                'type': 'number',
+                'default': 80,
+                'min': 50,
+                'max': 95,
+                'step': 5,
+                'description': 'Overbought threshold line'
+            },
+            {
+                'name': 'oversold',
+                'displayName': 'Oversold Level',
+                'type': 'number',
+                'default': 20,
+                'min': 5,
+                'max': 50,
+                'step': 5,
+                'description': 'Oversold threshold line'
+            }
+        ]
+
+    def validate_params(self, params: Dict[str, Any]) -> bool:
+        """パラメータバリデーション"""
+        periods = [params.get('kPeriod', 14), params.get('kSmoothing', 3), params.get('dPeriod', 3)]
+        if not all(isinstance(p, int) and p > 0 for p in periods):
+            return False
+        return True
+
+    def get_lookback(self, params: Dict[str, Any]) -> int:
+        """最新値の計算に必要な入力本数"""
+        # 移動窓だけで構成されるため、3つの窓を重ねた本数で最新値が確定する
+        return params.get('kPeriod', 14) + params.get('kSmoothing', 3) + params.get('dPeriod', 3) - 2
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """%K・%Dの2系列"""
+        return 2 * points
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
+        """ストキャスティクス計算"""
+        k_period = params.get('kPeriod', 14)
+        k_smoothing = params.get('kSmoothing', 3)
+        d_period = params.get('dPeriod', 3)
+        k_color = params.get('kColor', '#2196F3')
+        d_color = params.get('dColor', '#FF6B35')
+        line_width = params.get('lineWidth', 2)
+        overbought = params.get('overbought', 80)
+        oversold = params.get('oversold', 20)
+
+        columns = candle_columns(candle_data)
+        times = columns['time']
+        slow_k, slow_d = get_kernel(columns['high'], columns['low'], columns['close']).stochastic(
+            k_period, k_smoothing, d_period
+        )
+        # %Kは%Dが計算できる位置だけに値を持つ
+        k_values = Series(times, slow_k)
+
+        return IndicatorResult.multi(
+            [
+                Line('%K', k_values, {
+                    'color': k_color,
+                    'lineWidth': line_width,
+                    'title': f'%K({k_period},{k_smoothing})'
+                }),
+                Line('%D', Series(times, slow_d), {
+                    'color': d_color,
+                    'lineWidth': line_width,
+                    'title': f'%D({d_period})'
+                })
+            ],
+            levels=[
+                {'value': overbought, 'color': '#ef5350', 'style': 'dashed'},
+                {'value': oversold, 'color': '#66BB6A', 'style': 'dashed'}
+            ],
+            metadata={
+                'kPeriod': k_period,
+                'kSmoothing': k_smoothing,
+                'dPeriod': d_period,
+                'overbought': overbought,
+                'oversold': oversold,
+                'calculatedPoints': len(k_values)
+            }
+        )
+
+
+if __name__ == '__main__':
+    main_runner(StochasticIndicator)
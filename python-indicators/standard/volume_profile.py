@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Volume Profile (価格帯別出来高) インジケーター
+各足の出来高を価格帯 (ビン) に配分して集計し、POC (最大出来高の価格帯) と
+バリューエリア (POCから出来高の valueArea 割合を含む範囲) を返す
+
+    params: {
+        'bins': 24,                     # 価格帯の数
+        'priceMin': null, 'priceMax': null,  # 集計する価格範囲 (省略時は安値・高値の範囲)
+        'distribution': 'uniform',      # 'uniform': 高値〜安値に均等配分 / 'close': 終値の価格帯に全量
+        'valueArea': 0.7,
+        'session': null,                # '1d' 等を指定するとセッションごとのプロファイルを返す
+        'sessionLevels': 'previous'     # セッションごとの POC/VAH/VAL の系列で各足に割り当てる値
+    }
+
+セッションごとの系列は、デフォルト ('previous') では各足に直前の確定したセッションの値を割り当てる
+(最初のセッションの足はNaN)。'complete' は足が属するセッション全体の値で、その足より後の足の
+出来高を含む (先読みになるため、チャート表示用)。価格帯の境界は priceMin/priceMax を省略すると
+全期間の安値・高値から決まるため、先読みなしで使う場合 (バックテスト等) は価格範囲も指定する。
+
+均等配分では各足の両端の価格帯に部分量、間の価格帯に一定量を加える。
+間の価格帯は差分配列 (始点に+、終点に-) で表し、np.bincount で集計してから累積和をとるため、
+計算量は O(足 + セッション × 価格帯) で足ごとの価格帯のループはない。
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+from indicator_interface import IndicatorBase, CandleData, candle_columns, main_runner
+from resample import parse_timeframe
+from results import IndicatorResult, Series, Line
+
+
+DISTRIBUTIONS = ('uniform', 'close')
+SESSION_LEVELS = ('previous', 'complete')
+MAX_BINS = 1000
+
+
+def bin_volumes(
+    columns: Dict[str, np.ndarray],
+    edges: np.ndarray,
+    groups: np.ndarray,
+    group_count: int,
+    distribution: str = 'uniform'
+) -> np.ndarray:
+    """
+    出来高を価格帯に配分してグループ (セッション) ごとに集計する
+
+    価格範囲の外にある部分の出来高は数えない。
+    高値と安値が同じ足は終値の価格帯に全量を加える。
+
+    Args:
+        columns: ローソク足の列 (high, low, close, volume)
+        edges: 等間隔の価格帯の境界 (価格帯の数 + 1)
+        groups: 足ごとのグループ番号 (0 〜 group_count - 1)
+        group_count: グループ数
+        distribution: 'uniform' または 'close'
+
+    Returns:
+        (グループ × 価格帯) の出来高
+    """
+    bins = len(edges) - 1
+    width = (edges[-1] - edges[0]) / bins
+    volume = np.nan_to_num(columns['volume'].astype(np.float64))
+    offset = groups.astype(np.int64) * bins
+    size = group_count * bins
+
+    def position(price: np.ndarray) -> np.ndarray:
+        # 価格帯の単位での位置 (範囲外は端に寄せる)
+        return np.clip((price - edges[0]) / width, 0, bins)
+
+    def bin_of(at: np.ndarray) -> np.ndarray:
+        return np.minimum(at.astype(np.int64), bins - 1)
+
+    close = position(columns['close'])
+    close_inside = (columns['close'] >= edges[0]) & (columns['close'] <= edges[-1])
+    if distribution == 'close':
+        return np.bincount(
+            (offset + bin_of(close))[close_inside], weights=volume[close_inside], minlength=size
+        ).reshape(group_count, bins)
+
+    raw_low = (columns['low'] - edges[0]) / width
+    raw_high = (columns['high'] - edges[0]) / width
+    low, high = position(columns['low']), position(columns['high'])
+    ranged = raw_high > raw_low
+    point = ~ranged & close_inside
+
+    # 価格帯1つ分あたりの出来高
+    density = np.zeros(len(volume))
+    density[ranged] = volume[ranged] / (raw_high[ranged] - raw_low[ranged])
+    low_bin, high_bin = bin_of(low), bin_of(high)
+    same = ranged & (low_bin == high_bin)
+    spans = ranged & (low_bin < high_bin)
+
+    # 両端の部分量 (同じ価格帯に収まる足はその幅の分だけ)
+    indices = np.concatenate([
+        (offset + low_bin)[same], (offset + low_bin)[spans], (offset + high_bin)[spans], (offset + bin_of(close))[point]
+    ])
+    weights = np.concatenate([
+        (density * (high - low))[same],
+        (density * (low_bin + 1 - low))[spans],
+        (density * (high - high_bin))[spans],
+        volume[point]
+    ])
+    volumes = np.bincount(indices, weights=weights, minlength=size)
+
+    # 間の価格帯 (low_bin + 1 〜 high_bin - 1) は差分配列で一定量を加える
+    inner = spans & (high_bin - low_bin > 1)
+    diff = np.bincount(
+        np.concatenate([(offset + low_bin + 1)[inner], (offset + high_bin)[inner]]),
+        weights=np.concatenate([density[inner], -density[inner]]),
+        minlength=size
+    ).reshape(group_count, bins)
+    return volumes.reshape(group_count, bins) + np.cumsum(diff, axis=1)
+
+
+def value_area(volumes: np.ndarray, ratio: float) -> Tuple[int, int, int]:
+    """
+    POCとバリューエリアの価格帯
+
+    POCから始めて、上下の隣接する価格帯のうち出来高の多い方へ
+    合計が全体の ratio 以上になるまで広げる
+
+    Args:
+        volumes: 価格帯ごとの出来高
+        ratio: バリューエリアに含める出来高の割合
+
+    Returns:
+        (POC, バリューエリア下端, バリューエリア上端) の価格帯のインデックス
+    """
+    poc = int(np.argmax(volumes))
+    target = volumes.sum() * ratio
+    low = high = poc
+    total = volumes[poc]
+    while total < target and (low > 0 or high < len(volumes) - 1):
+        below = volumes[low - 1] if low > 0 else -1.0
+        above = volumes[high + 1] if high < len(volumes) - 1 else -1.0
+        if above >= below:
+            high += 1
+            total += above
+        else:
+            low -= 1
+            total += below
+    return poc, low, high
+
+
+class VolumeProfileIndicator(IndicatorBase):
+    """Volume Profile インジケータークラス"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "volume_profile"
+        self.version = "1.1.0"
+        self.display_type = "volume-profile"
+        self.chart_type = "main"
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'displayName': 'Volume Profile',
+            'version': self.version,
+            'displayType': self.display_type,
+            'chartType': self.chart_type,
+            'parameters': self.get_parameter_definitions(),
+            'description': 'Volume traded at each price level with point of control and value area'
+        }
+
+    def get_parameter_definitions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'name': 'bins',
+                'displayName': 'Rows',
+                'type': 'number',
+                'default': 24,
+                'min': 2,
+                'max': MAX_BINS,
+                'step': 1,
+                'description': 'Number of price rows'
+            },
+            {
+                'name': 'valueArea',
+                'displayName': 'Value Area',
+                'type': 'number',
+                'default': 0.7,
+                'min': 0.1,
+                'max': 1,
+                'step': 0.05,
+                'description': 'Share of volume inside the value area'
+            },
+            {
+                'name': 'pocColor',
+                'displayName': 'POC Color',
+                'type': 'color',
+                'default': '#FF6B35',
+                'description': 'Point of control line color'
+            },
+            {
+                'name': 'valueAreaColor',
+                'displayName': 'Value Area Color',
+                'type': 'color',
+                'default': '#2196F3',
+                'description': 'Value area line color'
+            }
+        ]
+
+    def validate_params(self, params: Dict[str, Any]) -> bool:
+        """パラメータバリデーション"""
+        bins = params.get('bins', 24)
+        ratio = params.get('valueArea', 0.7)
+        price_min = params.get('priceMin')
+        price_max = params.get('priceMax')
+        session = params.get('session')
+
+        if not isinstance(bins, int) or isinstance(bins, bool) or bins < 2 or bins > MAX_BINS:
+            return False
+        if not isinstance(ratio, (int, float)) or not 0 < ratio <= 1:
+            return False
+        if params.get('distribution', 'uniform') not in DISTRIBUTIONS:
+            return False
+        for price in (price_min, price_max):
+            if price is not None and (not isinstance(price, (int, float)) or isinstance(price, bool)):
+                return False
+        if price_min is not None and price_max is not None and price_min >= price_max:
+            return False
+        if session is not None and not isinstance(session, str):
+            return False
+        if params.get('sessionLevels', 'previous') not in SESSION_LEVELS:
+            return False
+        return True
+
+    def estimate_output_points(self, points: int, params: Dict[str, Any]) -> int:
+        """セッションごとのプロファイルではPOC・VAH・VALの3系列 (全体のプロファイルは系列なし)"""
+        return 3 * points if params.get('session') is not None else 0
+
+    def _edges(self, columns: Dict[str, np.ndarray], params: Dict[str, Any]) -> np.ndarray:
+        """価格帯の境界"""
+        price_min = params.get('priceMin')
+        price_max = params.get('priceMax')
+        if price_min is None:
+            price_min = float(np.min(columns['low']))
+        if price_max is None:
+            price_max = float(np.max(columns['high']))
+        if price_max <= price_min:
+            # 全ての足が同じ価格の場合は1ティック分の幅を持たせる
+            price_max = price_min + max(abs(price_min) * 1e-6, 1e-9)
+        return np.linspace(price_min, price_max, params.get('bins', 24) + 1)
+
+    @staticmethod
+    def _profile(volumes: np.ndarray, edges: np.ndarray, ratio: float) -> Optional[Dict[str, Any]]:
+        """1つのプロファイルの価格帯・POC・バリューエリア (出来高がなければNone)"""
+        if volumes.sum() <= 0:
+            return None
+        poc, low, high = value_area(volumes, ratio)
+        return {
+            'volume': float(volumes.sum()),
+            'poc': float((edges[poc] + edges[poc + 1]) / 2),
+            'valueAreaLow': float(edges[low]),
+            'valueAreaHigh': float(edges[high + 1]),
+            'volumes': volumes.tolist()
+        }
+
+    def calculate(self, candle_data: List[CandleData], params: Dict[str, Any]) -> IndicatorResult:
+        """Volume Profile計算"""
+        ratio = params.get('valueArea', 0.7)
+        distribution = params.get('distribution', 'uniform')
+        session = params.get('session')
+        poc_color = params.get('pocColor', '#FF6B35')
+        value_area_color = params.get('valueAreaColor', '#2196F3')
+
+        columns = candle_columns(candle_data)
+        times = columns['time']
+        if len(times) == 0:
+            raise ValueError("candleData must not be empty")
+        edges = self._edges(columns, params)
+
+        metadata = {
+            'bins': len(edges) - 1,
+            'priceMin': float(edges[0]),
+            'priceMax': float(edges[-1]),
+            'distribution': distribution,
+            'valueArea': ratio
+        }
+
+        if session is None:
+            volumes = bin_volumes(columns, edges, np.zeros(len(times), dtype=np.int64), 1, distribution)[0]
+            profile = self._profile(volumes, edges, ratio)
+            levels = [] if profile is None else [
+                {'value': profile['poc'], 'color': poc_color, 'style': 'solid', 'label': 'POC'},
+                {'value': profile['valueAreaHigh'], 'color': value_area_color, 'style': 'dashed', 'label': 'VAH'},
+                {'value': profile['valueAreaLow'], 'color': value_area_color, 'style': 'dashed', 'label': 'VAL'}
+            ]
+            result = IndicatorResult(self.display_type, levels=levels, metadata=metadata)
+            result['edges'] = edges.tolist()
+            result['profile'] = profile
+            return result
+
+        # セッションごとのプロファイル (価格帯は全セッション共通)
+        seconds = parse_timeframe(session)
+        session_times, groups = np.unique(times // seconds * seconds, return_inverse=True)
+        volumes = bin_volumes(columns, edges, groups, len(session_times), distribution)
+
+        sessions = []
+        session_levels = np.full((len(session_times), 3), np.nan)
+        for index, session_time in enumerate(session_times.tolist()):
+            profile = self._profile(volumes[index], edges, ratio)
+            if profile is None:
+                continue
+            session_levels[index] = (profile['poc'], profile['valueAreaHigh'], profile['valueAreaLow'])
+            sessions.append({'time': int(session_time), **profile})
+
+        if params.get('sessionLevels', 'previous') == 'complete':
+            # 各足にその足が属するセッション全体の値 (セッション確定後の値で、先読みを含む)
+            per_bar = session_levels[groups]
+        else:
+            # 各足に直前の確定したセッションの値
+            per_bar = np.vstack([np.full((1, 3), np.nan), session_levels])[groups]
+        lines = [
+            Line('POC', Series(times, per_bar[:, 0]), {'color': poc_color, 'lineWidth': 2, 'title': 'POC'}),
+            Line('VAH', Series(times, per_bar[:, 1]), {'color': value_area_color, 'lineWidth': 1, 'title': 'VAH'}),
+            Line('VAL', Series(times, per_bar[:, 2]), {'color': value_area_color, 'lineWidth': 1, 'title': 'VAL'})
+        ]
+        metadata['session'] = session
+        metadata['sessionLevels'] = params.get('sessionLevels', 'previous')
+        metadata['sessionCount'] = len(sessions)
+        result = IndicatorResult(self.display_type, lines=lines, metadata=metadata)
+        result['edges'] = edges.tolist()
+        result['sessions'] = sessions
+        return result
+
+
+if __name__ == '__main__':
+    main_runner(VolumeProfileIndicator)
@@ -1,11 +1,27 @@
 """
 TA-Libラッパー
 TA-Lib関数の統一インターフェイスを提供
+
+関数ごとに複数のバックエンド (TA-Lib / numba JIT / numpy) を持ち、
+キャリブレーション結果 (backend_calibration.py) があれば入力サイズごとに
+最速のバックエンドへ振り分ける。結果がなければ TA-Lib > numba > numpy の順で選ぶ。
+
+環境変数:
+    INDICATOR_BACKEND: 全関数のバックエンドを固定 (再現性の確保用)
+    INDICATOR_BACKEND_PROFILE: キャリブレーション結果のJSONファイル
 """
 
+import os
 import sys
+import json
+import math
+import threading
 import numpy as np
-from typing import Tuple, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from jit_kernels import NUMBA_AVAILABLE
+from price_range import RangeKernel
+from metrics import BACKEND_CALLS
 
 try:
     import talib
@@ -14,6 +30,114 @@ except ImportError:
     TALIB_AVAILABLE = False
     # 警告はstderrではなくログに記録（Node.jsでエラー扱いされないように）
 
+if NUMBA_AVAILABLE:
+    from jit_kernels import sma_kernel, ema_kernel, rsi_kernel
+
+
+# 優先順 (キャリブレーション結果がない場合に使う)
+BACKENDS = ('talib', 'numba', 'numpy')
+DEFAULT_PROFILE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'aiblack', 'backend_profile.json')
+
+_pinned_backend: Optional[str] = os.environ.get('INDICATOR_BACKEND') or None
+_profile: Optional[Dict[str, Any]] = None
+_profile_loaded = False
+_profile_lock = threading.Lock()
+
+
+def profile_path() -> str:
+    """キャリブレーション結果の保存先"""
+    return os.environ.get('INDICATOR_BACKEND_PROFILE') or DEFAULT_PROFILE_PATH
+
+
+def load_profile() -> Optional[Dict[str, Any]]:
+    """キャリブレーション結果を読み込む (初回のみファイルを読む)"""
+    global _profile, _profile_loaded
+    with _profile_lock:
+        if not _profile_loaded:
+            _profile_loaded = True
+            try:
+                with open(profile_path(), 'r', encoding='utf-8') as f:
+                    _profile = json.load(f)
+            except (OSError, ValueError):
+                _profile = None
+        return _profile
+
+
+def set_profile(profile: Optional[Dict[str, Any]]) -> None:
+    """キャリブレーション結果を設定 (Noneでデフォルトの優先順に戻す)"""
+    global _profile, _profile_loaded
+    with _profile_lock:
+        _profile = profile
+        _profile_loaded = True
+
+
+def pin_backend(backend: Optional[str]) -> None:
+    """
+    全関数のバックエンドを固定 (Noneで解除)
+    固定したバックエンドがその関数で使えない場合は通常の選択に戻る
+    """
+    global _pinned_backend
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    _pinned_backend = backend
+
+
+def available_backends(function: str) -> List[str]:
+    """関数で利用可能なバックエンド (優先順)"""
+    return [backend for backend in BACKENDS if backend in _IMPLEMENTATIONS[function]]
+
+
+def select_backend(function: str, size: int) -> str:
+    """
+    関数と入力サイズからバックエンドを選ぶ
+
+    Args:
+        function: 関数名 (例: 'SMA')
+        size: 入力配列の長さ
+
+    Returns:
+        バックエンド名
+    """
+    candidates = available_backends(function)
+
+    if _pinned_backend in candidates:
+        return _pinned_backend
+
+    profile = load_profile()
+    choices = (profile or {}).get('functions', {}).get(function)
+    if choices:
+        # 対数スケールで最も近いサイズクラスの計測結果を使う
+        nearest = min(choices, key=lambda size_class: abs(math.log(max(size, 1)) - math.log(int(size_class))))
+        if choices[nearest] in candidates:
+            return choices[nearest]
+
+    return candidates[0]
+
+
+def backend_signature() -> Dict[str, Any]:
+    """
+    バックエンドの選択を決める設定 (固定したバックエンド・キャリブレーション結果・利用可能なバックエンド)
+
+    バックエンドごとに結果が丸めの範囲で異なるため、結果キャッシュのキーに含める
+    """
+    profile = load_profile()
+    return {
+        'pinned': _pinned_backend,
+        'profile': (profile or {}).get('functions'),
+        'available': {function: available_backends(function) for function in _IMPLEMENTATIONS}
+    }
+
+
+def call_backend(function: str, backend: str, *args, **kwargs):
+    """バックエンドを指定して関数を呼び出す (キャリブレーション用)"""
+    return _IMPLEMENTATIONS[function][backend](*args, **kwargs)
+
+
+def _dispatch(function: str, size: int, *args, **kwargs):
+    backend = select_backend(function, size)
+    BACKEND_CALLS.inc(function=function, backend=backend)
+    return _IMPLEMENTATIONS[function][backend](*args, **kwargs)
+
 
 class TALibWrapper:
     """TA-Lib関数のラッパークラス"""
@@ -30,19 +154,12 @@ class TALibWrapper:
     @staticmethod
     def SMA(close: np.ndarray, timeperiod: int = 30) -> np.ndarray:
         """単純移動平均 (Simple Moving Average)"""
-        if TALIB_AVAILABLE:
-            return talib.SMA(close, timeperiod=timeperiod)
-        else:
-            # フォールバック実装
-            return TALibWrapper._sma_fallback(close, timeperiod)
+        return _dispatch('SMA', len(close), close, timeperiod)
 
     @staticmethod
     def EMA(close: np.ndarray, timeperiod: int = 30) -> np.ndarray:
         """指数移動平均 (Exponential Moving Average)"""
-        if TALIB_AVAILABLE:
-            return talib.EMA(close, timeperiod=timeperiod)
-        else:
-            return TALibWrapper._ema_fallback(close, timeperiod)
+        return _dispatch('EMA', len(close), close, timeperiod)
 
     @staticmethod
     def BBANDS(
@@ -53,10 +170,7 @@ class TALibWrapper:
         matype: int = 0
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """ボリンジャーバンド (upper, middle, lower)"""
-        if TALIB_AVAILABLE:
-            return talib.BBANDS(close, timeperiod, nbdevup, nbdevdn, matype)
-        else:
-            return TALibWrapper._bbands_fallback(close, timeperiod, nbdevup, nbdevdn)
+        return _dispatch('BBANDS', len(close), close, timeperiod, nbdevup, nbdevdn, matype)
 
     # ========================
     # モメンタム指標
@@ -65,10 +179,7 @@ class TALibWrapper:
     @staticmethod
     def RSI(close: np.ndarray, timeperiod: int = 14) -> np.ndarray:
         """相対力指数 (Relative Strength Index)"""
-        if TALIB_AVAILABLE:
-            return talib.RSI(close, timeperiod=timeperiod)
-        else:
-            return TALibWrapper._rsi_fallback(close, timeperiod)
+        return _dispatch('RSI', len(close), close, timeperiod)
 
     @staticmethod
     def MACD(
@@ -78,10 +189,7 @@ class TALibWrapper:
         signalperiod: int = 9
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """MACD (macd, signal, histogram)"""
-        if TALIB_AVAILABLE:
-            return talib.MACD(close, fastperiod, slowperiod, signalperiod)
-        else:
-            return TALibWrapper._macd_fallback(close, fastperiod, slowperiod, signalperiod)
+        return _dispatch('MACD', len(close), close, fastperiod, slowperiod, signalperiod)
 
     @staticmethod
     def STOCH(
@@ -95,14 +203,10 @@ class TALibWrapper:
         slowd_matype: int = 0
     ) -> Tuple[np.ndarray, np.ndarray]:
         """ストキャスティクス (slowk, slowd)"""
-        if TALIB_AVAILABLE:
-            return talib.STOCH(
-                high, low, close,
-                fastk_period, slowk_period, slowk_matype,
-                slowd_period, slowd_matype
-            )
-        else:
-            return TALibWrapper._stoch_fallback(high, low, close, fastk_period)
+        return _dispatch(
+            'STOCH', len(close), high, low, close,
+            fastk_period, slowk_period, slowk_matype, slowd_period, slowd_matype
+        )
 
     # ========================
     # ボラティリティ指標
@@ -116,10 +220,7 @@ class TALibWrapper:
         timeperiod: int = 14
     ) -> np.ndarray:
         """平均真の範囲 (Average True Range)"""
-        if TALIB_AVAILABLE:
-            return talib.ATR(high, low, close, timeperiod)
-        else:
-            return TALibWrapper._atr_fallback(high, low, close, timeperiod)
+        return _dispatch('ATR', len(close), high, low, close, timeperiod)
 
     # ========================
     # フォールバック実装
@@ -129,8 +230,8 @@ class TALibWrapper:
     def _sma_fallback(close: np.ndarray, period: int) -> np.ndarray:
         """SMAフォールバック実装"""
         result = np.full_like(close, np.nan, dtype=float)
-        for i in range(period - 1, len(close)):
-            result[i] = np.mean(close[i - period + 1:i + 1])
+        if len(close) >= period:
+            result[period - 1:] = sliding_window_view(close, period).mean(axis=1)
         return result
 
     @staticmethod
@@ -138,6 +239,10 @@ class TALibWrapper:
         """EMAフォールバック実装"""
         result = np.full_like(close, np.nan, dtype=float)
         multiplier = 2 / (period + 1)
+
+        # データ不足時はTA-Libと同様にすべてNaN
+        if len(close) < period:
+            return result
         
         # 初期値はSMA
         result[period - 1] = np.mean(close[:period])
@@ -150,6 +255,10 @@ class TALibWrapper:
     @staticmethod
     def _rsi_fallback(close: np.ndarray, period: int) -> np.ndarray:
         """RSIフォールバック実装"""
+        # データ不足時はTA-Libと同様にすべてNaN
+        if len(close) <= period:
+            return np.full(len(close), np.nan)
+
         delta = np.diff(close)
         gain = np.where(delta > 0, delta, 0)
         loss = np.where(delta < 0, -delta, 0)
@@ -176,35 +285,8 @@ class TALibWrapper:
         slow: int,
         signal: int
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-        """MACDフォールバック実装"""
-        ema_fast = TALibWrapper._ema_fallback(close, fast)
-        ema_slow = TALibWrapper._ema_fallback(close, slow)
-        
-        macd_line = ema_fast - ema_slow
-        
-        # NaNでないMACD値を取得
-        valid_macd = macd_line[~np.isnan(macd_line)]
-        
-        # シグナルラインが計算可能かチェック
-        if len(valid_macd) < signal:
-            # データが不足している場合、すべてNaNを返す
-            return (
-                macd_line,
-                np.full_like(macd_line, np.nan),
-                np.full_like(macd_line, np.nan)
-            )
-        
-        signal_line_values = TALibWrapper._ema_fallback(valid_macd, signal)
-        
-        # signal_lineの長さを調整
-        full_signal = np.full_like(macd_line, np.nan)
-        valid_count = len(signal_line_values[~np.isnan(signal_line_values)])
-        if valid_count > 0:
-            full_signal[-valid_count:] = signal_line_values[~np.isnan(signal_line_values)]
-        
-        histogram = macd_line - full_signal
-        
-        return macd_line, full_signal, histogram
+        """MACDフォールバック実装 (初期値はTA-LibのMACDと同じ)"""
+        return _macd_from_ema(TALibWrapper._ema_fallback, close, fast, slow, signal)
 
     @staticmethod
     def _bbands_fallback(
@@ -217,8 +299,8 @@ class TALibWrapper:
         middle = TALibWrapper._sma_fallback(close, period)
         
         std = np.full_like(close, np.nan, dtype=float)
-        for i in range(period - 1, len(close)):
-            std[i] = np.std(close[i - period + 1:i + 1])
+        if len(close) >= period:
+            std[period - 1:] = sliding_window_view(close, period).std(axis=1)
         
         upper = middle + (std * nbdevup)
         lower = middle - (std * nbdevdn)
@@ -232,37 +314,96 @@ class TALibWrapper:
         close: np.ndarray,
         period: int
     ) -> np.ndarray:
-        """ATRフォールバック実装"""
-        tr = np.maximum(
-            high - low,
-            np.maximum(
-                np.abs(high - np.roll(close, 1)),
-                np.abs(low - np.roll(close, 1))
-            )
-        )
-        tr[0] = high[0] - low[0]
-        
-        return TALibWrapper._sma_fallback(tr, period)
+        """ATRフォールバック実装 (Wilder平滑化)"""
+        return RangeKernel(high, low, close).atr(period)
 
     @staticmethod
     def _stoch_fallback(
         high: np.ndarray,
         low: np.ndarray,
         close: np.ndarray,
-        period: int
+        fastk_period: int,
+        slowk_period: int = 3,
+        slowd_period: int = 3
     ) -> Tuple[np.ndarray, np.ndarray]:
-        """ストキャスティクスフォールバック実装（簡易版）"""
-        k = np.full_like(close, np.nan, dtype=float)
-        
-        for i in range(period - 1, len(close)):
-            highest = np.max(high[i - period + 1:i + 1])
-            lowest = np.min(low[i - period + 1:i + 1])
-            
-            if highest != lowest:
-                k[i] = 100 * (close[i] - lowest) / (highest - lowest)
-            else:
-                k[i] = 50
-        
-        d = TALibWrapper._sma_fallback(k, 3)
-        
-        return k, d
+        """ストキャスティクスフォールバック実装 (移動平均はSMA)"""
+        return RangeKernel(high, low, close).stochastic(fastk_period, slowk_period, slowd_period)
+
+
+def _macd_from_ema(
+    ema: Callable[[np.ndarray, int], np.ndarray],
+    close: np.ndarray,
+    fast: int,
+    slow: int,
+    signal: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    EMAの実装を指定したMACD (TA-LibのMACDと同じ初期値)
+
+    TA-Libは速いEMAも遅いEMAと同じ位置 (slow-1) から始めるため、速いEMAの初期値は
+    close[slow-fast:slow] の平均になる。3本とも最初のシグナル値の位置から出力する
+    """
+    if slow < fast:
+        fast, slow = slow, fast
+    close = np.asarray(close, dtype=np.float64)
+    skip = min(slow - fast, len(close))
+
+    ema_fast = np.full(len(close), np.nan)
+    ema_fast[skip:] = ema(close[skip:], fast)
+    macd_line = ema_fast - ema(close, slow)
+
+    valid = ~np.isnan(macd_line)
+    full_signal = np.full_like(macd_line, np.nan)
+    full_signal[valid] = ema(macd_line[valid], signal)
+    macd_line[np.isnan(full_signal)] = np.nan
+    return macd_line, full_signal, macd_line - full_signal
+
+
+def _numba_macd(close: np.ndarray, fast: int, slow: int, signal: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD (numpy実装と同じ構成で、EMAだけJITカーネルを使う)"""
+    return _macd_from_ema(ema_kernel, close, fast, slow, signal)
+
+
+# 関数ごとのバックエンド実装 (引数は TALibWrapper の公開メソッドと同じ)
+_IMPLEMENTATIONS: Dict[str, Dict[str, Callable]] = {
+    'SMA': {
+        'numpy': TALibWrapper._sma_fallback,
+    },
+    'EMA': {
+        'numpy': TALibWrapper._ema_fallback,
+    },
+    'BBANDS': {
+        'numpy': lambda close, period, nbdevup, nbdevdn, matype: TALibWrapper._bbands_fallback(
+            close, period, nbdevup, nbdevdn
+        ),
+    },
+    'RSI': {
+        'numpy': TALibWrapper._rsi_fallback,
+    },
+    'MACD': {
+        'numpy': TALibWrapper._macd_fallback,
+    },
+    'STOCH': {
+        'numpy': lambda high, low, close, fastk, slowk, slowk_matype, slowd, slowd_matype: (
+            TALibWrapper._stoch_fallback(high, low, close, fastk, slowk, slowd)
+        ),
+    },
+    'ATR': {
+        'numpy': TALibWrapper._atr_fallback,
+    },
+}
+
+if TALIB_AVAILABLE:
+    _IMPLEMENTATIONS['SMA']['talib'] = lambda close, period: talib.SMA(close, timeperiod=period)
+    _IMPLEMENTATIONS['EMA']['talib'] = lambda close, period: talib.EMA(close, timeperiod=period)
+    _IMPLEMENTATIONS['BBANDS']['talib'] = talib.BBANDS
+    _IMPLEMENTATIONS['RSI']['talib'] = lambda close, period: talib.RSI(close, timeperiod=period)
+    _IMPLEMENTATIONS['MACD']['talib'] = talib.MACD
+    _IMPLEMENTATIONS['STOCH']['talib'] = talib.STOCH
+    _IMPLEMENTATIONS['ATR']['talib'] = talib.ATR
+
+if NUMBA_AVAILABLE:
+    _IMPLEMENTATIONS['SMA']['numba'] = sma_kernel
+    _IMPLEMENTATIONS['EMA']['numba'] = ema_kernel
+    _IMPLEMENTATIONS['RSI']['numba'] = rsi_kernel
+    _IMPLEMENTATIONS['MACD']['numba'] = _numba_macd
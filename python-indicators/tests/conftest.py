@@ -0,0 +1,60 @@
+"""
+python-indicators のテスト共通設定
+モジュールは standard/ のインジケーターと同じく python-indicators/ を import パスに加えて読み込む
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+import talib_wrapper
+from indicator_runtime import IndicatorRuntime
+
+
+def random_walk_candles(count: int, seed: int = 0, start: int = 1_600_000_000, step: int = 60):
+    """ランダムウォークのローソク足 (リクエストの candleData 形式)"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, count))
+    spread = np.abs(rng.normal(0, 0.3, count))
+    return [
+        {
+            'time': start + i * step,
+            'open': float(c - d / 2),
+            'high': float(c + d),
+            'low': float(c - d),
+            'close': float(c),
+            'volume': float(1000 + i % 7 * 100)
+        }
+        for i, (c, d) in enumerate(zip(close.tolist(), spread.tolist()))
+    ]
+
+
+def result_arrays(result):
+    """IndicatorResult の系列 (名前 -> 値の配列、単一系列は 'values')"""
+    arrays = {}
+    if result.values is not None:
+        arrays['values'] = result.values.values
+    for line in result.lines:
+        arrays[line.name] = line.series.values
+    return arrays
+
+
+@pytest.fixture(scope='session')
+def runtime():
+    return IndicatorRuntime()
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache(monkeypatch):
+    # 環境のキャッシュ設定でテストの結果が変わらないようにする (使うテストは自分で設定する)
+    monkeypatch.delenv('INDICATOR_CACHE_DIR', raising=False)
+
+
+@pytest.fixture(autouse=True, scope='session')
+def default_backends():
+    # 手元のキャリブレーション結果に依らず既定の優先順 (TA-Libがあれば TA-Lib) で計算する
+    talib_wrapper.set_profile(None)
+    talib_wrapper.pin_backend(None)
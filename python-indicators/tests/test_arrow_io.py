@@ -0,0 +1,48 @@
+"""
+結果ファイルの書き出し (arrow_io.write_result)
+"""
+
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from conftest import random_walk_candles
+from arrow_io import write_result
+
+
+def sma_result(runtime, count=500):
+    return runtime.handle({'name': 'sma', 'candleData': random_walk_candles(count), 'params': {'period': 20}})
+
+
+def test_concurrent_writes_to_same_path(runtime, monkeypatch, tmp_path):
+    monkeypatch.setenv('INDICATOR_DATA_DIR', str(tmp_path))
+    result = sma_result(runtime)
+    errors = []
+
+    def write():
+        try:
+            for _ in range(10):
+                write_result(result, {'format': 'parquet', 'path': 'out.parquet'})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ['out.parquet']
+
+
+def test_failed_write_leaves_no_temp_file(runtime, monkeypatch, tmp_path):
+    monkeypatch.setenv('INDICATOR_DATA_DIR', str(tmp_path))
+    # 出力先がディレクトリなので、書き込み後の置き換えで失敗する
+    (tmp_path / 'out.arrow').mkdir()
+    with pytest.raises(OSError):
+        write_result(sma_result(runtime), {'format': 'arrow', 'path': 'out.arrow'})
+    assert os.listdir(tmp_path) == ['out.arrow']
@@ -0,0 +1,373 @@
+"""
+一括計算と同じ値になるとしている計算の照合
+(チャンク分割計算・バックエンド・値幅カーネル・累積和インデックス・バックテスト・相関)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import talib
+
+from conftest import random_walk_candles, result_arrays
+from backend_calibration import BENCHMARK_ARGS, equivalent_backends, synthetic_candles
+import chunked
+from chunked import create_state
+import prefix_index
+from prefix_index import PrefixSumIndex
+from talib_wrapper import available_backends, call_backend
+from price_range import RangeKernel
+
+
+def assert_same(actual, expected, rtol=1e-9, atol=1e-9):
+    """NaNの位置が同じで、値が許容誤差内"""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+
+
+# ---- チャンク分割計算 (chunked.py) ----
+
+CHUNKED_CASES = [
+    ('sma', {'period': 20}, {'sma': 'values'}),
+    ('ema', {'period': 20}, {'ema': 'values'}),
+    ('rsi', {'period': 14}, {'rsi': 'values'}),
+    ('macd', {'fastPeriod': 12, 'slowPeriod': 26, 'signalPeriod': 9},
+     {'macd': 'MACD', 'signal': 'Signal', 'histogram': 'Histogram'}),
+    ('bollinger', {'period': 20, 'stdDev': 2}, {'upper': 'Upper', 'middle': 'Middle', 'lower': 'Lower'}),
+]
+
+
+@pytest.mark.parametrize('name, params, outputs', CHUNKED_CASES, ids=[case[0] for case in CHUNKED_CASES])
+@pytest.mark.parametrize('chunk_size', [7, 100, 5000])
+def test_chunked_matches_indicator(runtime, name, params, outputs, chunk_size):
+    candles = random_walk_candles(2000)
+    close = np.array([candle['close'] for candle in candles])
+    expected = result_arrays(runtime.handle({'name': name, 'candleData': candles, 'params': params, 'cache': False}))
+
+    step = create_state(name, params)
+    blocks = [step(close[start:start + chunk_size]) for start in range(0, len(close), chunk_size)]
+    for output, line in outputs.items():
+        assert_same(np.concatenate([block[output] for block in blocks]), expected[line])
+
+
+# ---- バックエンド (talib_wrapper.py / backend_calibration.py) ----
+
+def as_outputs(result):
+    return result if isinstance(result, tuple) else (result,)
+
+
+@pytest.mark.parametrize('function', list(BENCHMARK_ARGS))
+@pytest.mark.parametrize('size', [10, 40, 3000])
+def test_backends_match_default(function, size):
+    args = BENCHMARK_ARGS[function](synthetic_candles(size, seed=3))
+    backends = available_backends(function)
+    expected = as_outputs(call_backend(function, backends[0], *args))
+    for backend in backends[1:]:
+        actual = as_outputs(call_backend(function, backend, *args))
+        assert len(actual) == len(expected)
+        for output, reference in zip(actual, expected):
+            assert_same(output, reference)
+
+
+@pytest.mark.parametrize('function', list(BENCHMARK_ARGS))
+def test_calibration_keeps_every_backend(function):
+    # どのバックエンドも同じ結果なので、キャリブレーションで除外されない
+    args = BENCHMARK_ARGS[function](synthetic_candles(2000, seed=1))
+    assert equivalent_backends(function, args) == available_backends(function)
+
+
+# ---- 値幅カーネル (price_range.py) ----
+
+def price_columns(count=1000, seed=0):
+    candles = random_walk_candles(count, seed=seed)
+    return tuple(np.array([candle[key] for candle in candles]) for key in ('high', 'low', 'close'))
+
+
+@pytest.mark.parametrize('period', [2, 5, 14, 30])
+def test_range_kernel_matches_talib(period):
+    high, low, close = price_columns()
+    kernel = RangeKernel(high, low, close)
+
+    assert_same(kernel.atr(period), talib.ATR(high, low, close, period))
+    directional = kernel.directional(period)
+    assert_same(directional['plusDI'], talib.PLUS_DI(high, low, close, period))
+    assert_same(directional['minusDI'], talib.MINUS_DI(high, low, close, period))
+    assert_same(directional['dx'], talib.DX(high, low, close, period))
+    assert_same(directional['adx'], talib.ADX(high, low, close, period))
+
+
+@pytest.mark.parametrize('fastk, slowk, slowd', [(14, 3, 3), (5, 1, 1), (9, 3, 5)])
+def test_range_kernel_stochastic_matches_talib(fastk, slowk, slowd):
+    high, low, close = price_columns()
+    slow_k, slow_d = RangeKernel(high, low, close).stochastic(fastk, slowk, slowd)
+    expected_k, expected_d = talib.STOCH(high, low, close, fastk, slowk, 0, slowd, 0)
+    assert_same(slow_k, expected_k)
+    assert_same(slow_d, expected_d)
+
+
+# ---- 累積和インデックス (prefix_index.py / dataset_store.py) ----
+
+def level_prices(count=5000, level=1e6, seed=0):
+    """水準に対してばらつきの小さい価格 (二乗和の桁落ちが起きやすい)"""
+    rng = np.random.default_rng(seed)
+    return level + np.cumsum(rng.normal(0, 0.01, count))
+
+
+def test_prefix_windows_match_numpy():
+    values = level_prices()
+    index = PrefixSumIndex.build(values)
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        start = int(rng.integers(0, len(values) - 1))
+        stop = int(rng.integers(start + 1, len(values) + 1))
+        window = values[start:stop]
+        assert np.isclose(index.window_sum(start, stop), window.sum(), rtol=1e-14, atol=0)
+        assert np.isclose(index.window_mean(start, stop), window.mean(), rtol=1e-14, atol=0)
+        assert np.isclose(index.window_std(start, stop), window.std(), rtol=1e-9, atol=1e-12)
+        if stop - start > 1:
+            assert np.isclose(index.window_std(start, stop, ddof=1), window.std(ddof=1), rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('numba', [True, False])
+@pytest.mark.parametrize('period', [1, 2, 20, 500])
+def test_prefix_rolling_matches_talib(monkeypatch, numba, period):
+    if not numba:
+        monkeypatch.setattr(prefix_index, 'NUMBA_AVAILABLE', False)
+    values = level_prices()
+    index = PrefixSumIndex.build(values)
+
+    assert_same(index.rolling_mean(period), talib.SMA(values, period), rtol=1e-14, atol=0)
+    std = talib.STDDEV(values, period, 1.0) if period > 1 else np.zeros(len(values))
+    assert_same(index.rolling_std(period), std, rtol=1e-8, atol=1e-12)
+    # 連続する範囲のインデックスは、範囲の値から作ったインデックスと同じ
+    assert_same(index[100:900].rolling_mean(period), PrefixSumIndex.build(values[100:900]).rolling_mean(period),
+                rtol=1e-14, atol=0)
+
+
+def test_prefix_index_dataset_matches_candle_data(runtime):
+    candles = random_walk_candles(3000)
+    registered = runtime.handle({'_mode': 'registerDataset', 'candleData': candles, 'prefixIndex': True})
+    assert registered['prefixIndex'] == ['close']
+    handle = registered['datasetHandle']
+
+    # 最後の足の更新と新しい足の追記の後も、インデックスはローソク足全体から作った値と同じ
+    updated = random_walk_candles(3010)
+    updated = [dict(candle, close=candle['close'] + 0.5, high=candle['high'] + 0.5) for candle in updated[2999:]]
+    appended = runtime.handle({'_mode': 'appendCandles', 'datasetHandle': handle, 'candleData': updated})
+    assert appended['success'] is True, appended
+    candles = candles[:2999] + updated
+
+    try:
+        for name, params in (('sma', {'period': 20}), ('bollinger', {'period': 20, 'stdDev': 2})):
+            request = {'name': name, 'params': params, 'cache': False}
+            expected = result_arrays(runtime.handle({**request, 'candleData': candles}))
+            actual = result_arrays(runtime.handle({**request, 'datasetHandle': handle}))
+            assert actual.keys() == expected.keys()
+            for key in expected:
+                assert_same(actual[key], expected[key])
+    finally:
+        runtime.handle({'_mode': 'dropDataset', 'datasetHandle': handle})
+
+
+# ---- バックテスト (backtest.py) ----
+
+def crossed_below(a, b, t):
+    """足ごとのループで書いた crossBelow (b はスカラーまたは系列)"""
+    previous_b = b[t - 1] if np.ndim(b) else b
+    current_b = b[t] if np.ndim(b) else b
+    return bool(
+        a[t] < current_b and not a[t - 1] < previous_b
+        and not np.isnan(a[t - 1]) and not np.isnan(previous_b)
+    )
+
+
+def loop_backtest(close, entry, exit_, fee, direction, periods_per_year):
+    """1つの組み合わせを1本ずつ処理するバックテスト (ベクトル化した計算の照合用)"""
+    position = False
+    equity, peak, drawdown = 1.0, 1.0, 0.0
+    nets, positions, trades = [], [], []
+    entry_equity = None
+    for t in range(len(close)):
+        held = position
+        if exit_[t]:
+            position = False
+        elif entry[t]:
+            position = True
+        bar_return = close[t] / close[t - 1] - 1 if t else 0.0
+        net = (1 + direction * held * bar_return) * (1 - fee * (position != held)) - 1
+        if position and not held:
+            entry_equity = equity
+        equity *= 1 + max(net, -0.999999)
+        if held and not position:
+            trades.append(equity / entry_equity - 1)
+        peak = max(peak, equity)
+        drawdown = min(drawdown, equity / peak - 1)
+        nets.append(net)
+        positions.append(position)
+    if position:
+        trades.append(equity / entry_equity - 1)
+
+    nets = np.array(nets)
+    std = nets.std()
+    return {
+        'totalReturn': equity - 1,
+        'sharpe': nets.mean() * np.sqrt(periods_per_year) / std if std > 0 else 0.0,
+        'maxDrawdown': drawdown,
+        'winRate': np.mean(np.array(trades) > 0) if trades else 0.0,
+        'trades': len(trades),
+        'exposure': np.mean(positions)
+    }
+
+
+@pytest.mark.parametrize('side', ['long', 'short'])
+def test_backtest_matches_loop(runtime, side):
+    candles = random_walk_candles(400)
+    close = np.array([candle['close'] for candle in candles])
+    request = {
+        '_mode': 'backtest',
+        'symbols': [{'symbol': 'A', 'candleData': candles}],
+        'indicators': {
+            'rsi': {'name': 'rsi', 'params': {'period': [7, 14]}},
+            'fast': {'name': 'sma', 'params': {'period': [5, 10]}},
+            'slow': {'name': 'sma', 'params': {'period': 30}}
+        },
+        'entry': [{'left': 'rsi', 'op': 'crossBelow', 'right': [30, 40, 50]}],
+        'exit': [{'left': 'fast', 'op': 'crossBelow', 'right': 'slow'}],
+        'side': side,
+        'fee': 0.001,
+        'includeAll': True
+    }
+    response = runtime.handle(request)
+    assert response['success'] is True, response
+    params, metrics = response['all']['params'], response['all']['metrics']['A']
+
+    slow = talib.SMA(close, 30)
+    direction = 1.0 if side == 'long' else -1.0
+    periods_per_year = 365 * 24 * 60 * 60 / 60
+    for combo in range(response['metadata']['combinations']):
+        rsi = talib.RSI(close, params['rsi.period'][combo])
+        fast = talib.SMA(close, params['fast.period'][combo])
+        threshold = params['entry[0].right'][combo]
+        entry = [t > 0 and crossed_below(rsi, threshold, t) for t in range(len(close))]
+        exit_ = [t > 0 and crossed_below(fast, slow, t) for t in range(len(close))]
+        expected = loop_backtest(close, entry, exit_, 0.001, direction, periods_per_year)
+        for name, value in expected.items():
+            assert np.isclose(metrics[name][combo], value, rtol=1e-9, atol=1e-12), (combo, name)
+
+
+# ---- 相関 (standard/correlation.py) ----
+
+def test_correlation_matches_pandas(runtime):
+    candles = random_walk_candles(1500)
+    times = np.array([candle['time'] for candle in candles])
+    base = np.array([candle['close'] for candle in candles])
+    rng = np.random.default_rng(5)
+    base_returns = np.diff(np.log(base), prepend=np.log(base[0]))
+
+    # 足の一部が欠けた他銘柄の系列 (欠けた足は直前の終値で埋めてリターンを取る)
+    series = {}
+    for k in range(3):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(base)) + 0.5 * base_returns))
+        keep = rng.random(len(base)) > 0.05
+        series[f'S{k}'] = {'time': times[keep].tolist(), 'close': close[keep].tolist()}
+
+    period = 30
+    params = {'period': period, 'series': series, 'metrics': ['correlation', 'covariance', 'beta']}
+    result = runtime.handle({'name': 'correlation', 'candleData': candles, 'params': params, 'cache': False})
+
+    frame = pd.DataFrame({'base': base}, index=times)
+    for name, points in series.items():
+        frame[name] = pd.Series(points['close'], index=points['time']).reindex(times).ffill()
+    returns = frame.pct_change()
+
+    arrays = result_arrays(result)
+    assert len(arrays) == 6 + 6 + 3
+    for line, actual in arrays.items():
+        metric, pair = line.split(':')
+        a, b = pair.split('/')
+        if metric == 'correlation':
+            expected = returns[a].rolling(period).corr(returns[b])
+        elif metric == 'covariance':
+            expected = returns[a].rolling(period).cov(returns[b])
+        else:
+            expected = returns[a].rolling(period).cov(returns[b]) / returns[b].rolling(period).var()
+        assert_same(actual, expected.to_numpy(), rtol=1e-7, atol=1e-12)
+
+
+@pytest.mark.parametrize('name, params, outputs', CHUNKED_CASES[1:4], ids=[case[0] for case in CHUNKED_CASES[1:4]])
+def test_chunked_kernels_match_python_loop(monkeypatch, name, params, outputs):
+    close = np.array([candle['close'] for candle in random_walk_candles(3000)])
+
+    def run():
+        step = create_state(name, params)
+        blocks = [step(close[start:start + 250]) for start in range(0, len(close), 250)]
+        return {output: np.concatenate([block[output] for block in blocks]) for output in outputs}
+
+    jitted = run()
+    monkeypatch.setattr(chunked, 'NUMBA_AVAILABLE', False)
+    looped = run()
+    for output in outputs:
+        assert_same(jitted[output], looped[output], rtol=0, atol=0)
+
+
+# ---- 上位足の割り当て (resample.py) ----
+
+def test_confirmed_timeframe_values_use_only_past_bars(runtime):
+    candles = random_walk_candles(300, start=1_600_200_000)
+    request = {'name': 'sma', 'params': {'period': 3}, 'timeframes': ['15m'], 'cache': False}
+    full = result_arrays(runtime.handle({**request, 'candleData': candles})['timeframes']['15m'])['values']
+
+    # 各足の値は、その足までに確定した15分足だけで計算した値と同じ (先読みしない)
+    for end in (44, 45, 50, 59, 60, 61, 200, 298):
+        confirmed = (end + 1) // 15 * 15
+        partial = runtime.handle({**request, 'candleData': candles[:confirmed]})
+        known = result_arrays(partial['timeframes']['15m'])['values']
+        assert_same(full[end:end + 1], known[-1:])
+
+
+def test_bucket_alignment_is_opt_in(runtime):
+    candles = random_walk_candles(300, start=1_600_200_000)
+    request = {
+        'name': 'sma', 'candleData': candles, 'params': {'period': 3},
+        'timeframes': ['15m'], 'timeframeAlign': 'bucket', 'cache': False
+    }
+    aligned = result_arrays(runtime.handle(request)['timeframes']['15m'])['values']
+    resampled = result_arrays(runtime.handle({
+        'name': 'sma', 'params': {'period': 3}, 'cache': False,
+        'candleData': [candles[i] | {'close': candles[min(i + 14, 299)]['close']} for i in range(0, 300, 15)]
+    }))['values']
+    # 区間内の全ての足が区間の最終値 (区間の最後の足の終値で計算した値) を持つ
+    assert_same(aligned, np.repeat(resampled, 15))
+
+    invalid = runtime.handle({**request, 'timeframeAlign': 'latest'})
+    assert invalid['success'] is False
+
+
+# ---- 出来高プロファイル (standard/volume_profile.py) ----
+
+def test_session_levels_use_only_past_bars(runtime):
+    candles = random_walk_candles(600, start=1_600_200_000)
+    params = {'bins': 20, 'session': '1h', 'priceMin': 80.0, 'priceMax': 120.0}
+    request = {'name': 'volume_profile', 'params': params, 'cache': False}
+    full = result_arrays(runtime.handle({**request, 'candleData': candles}))
+    assert np.isnan(full['POC'][:59]).all()
+    assert not np.isnan(full['POC'][-1])
+
+    # 各足の値は、その足までのローソク足だけで計算した値と同じ (先読みしない)
+    for end in (59, 60, 61, 119, 120, 300, 599):
+        partial = result_arrays(runtime.handle({**request, 'candleData': candles[:end + 1]}))
+        for line in ('POC', 'VAH', 'VAL'):
+            assert_same(full[line][end:end + 1], partial[line][-1:])
+
+
+def test_complete_session_levels_are_opt_in(runtime):
+    candles = random_walk_candles(240, start=1_600_200_000)
+    params = {'bins': 20, 'session': '1h', 'sessionLevels': 'complete'}
+    result = runtime.handle({'name': 'volume_profile', 'candleData': candles, 'params': params, 'cache': False})
+    poc = result_arrays(result)['POC']
+    expected = np.repeat([session['poc'] for session in result['sessions']], 60)
+    assert_same(poc, expected)
+
@@ -0,0 +1,117 @@
+"""
+キャプチャの匿名化 (request_recorder.anonymize)
+"""
+
+import math
+
+import numpy as np
+
+from conftest import random_walk_candles, result_arrays
+from request_recorder import anonymize
+
+
+def correlation_params(candles):
+    other = random_walk_candles(len(candles), seed=1)
+    return {
+        'period': 20,
+        'series': {
+            'BTCUSDT': [{'time': c['time'], 'close': c['close']} for c in other],
+            'ETHUSDT': {'time': [c['time'] for c in other], 'close': [c['close'] for c in other]}
+        }
+    }
+
+
+def correlation_values(result):
+    """系列名には銘柄名が入るため、系列の順に並べた値"""
+    return np.concatenate(list(result_arrays(result).values()))
+
+
+def test_anonymize_correlation_series(runtime):
+    candles = random_walk_candles(200)
+    request = {'name': 'correlation', 'candleData': candles, 'params': correlation_params(candles)}
+
+    anonymized = anonymize(request)
+    series = anonymized['params']['series']
+    assert 'BTCUSDT' not in series and 'ETHUSDT' not in series
+    assert len(series) == 2
+
+    shift = candles[0]['time'] - anonymized['candleData'][0]['time']
+    scale = anonymized['candleData'][0]['close'] / candles[0]['close']
+    listed, columns = series.values()
+    assert listed[0]['time'] == request['params']['series']['BTCUSDT'][0]['time'] - shift
+    assert columns['time'][0] == request['params']['series']['ETHUSDT']['time'][0] - shift
+    assert math.isclose(columns['close'][0], request['params']['series']['ETHUSDT']['close'][0] * scale)
+
+    # 時刻の対応が保たれ、相関は元のリクエストと同じ (リターンは倍率に依存しない)
+    expected = correlation_values(runtime.handle(request))
+    actual = correlation_values(runtime.handle(anonymized))
+    assert np.count_nonzero(~np.isnan(expected)) > 0
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_anonymize_batch_items():
+    candles = random_walk_candles(100)
+    request = {
+        '_mode': 'batch',
+        'candleData': candles,
+        'indicators': [
+            {'name': 'sma', 'params': {'period': 20}},
+            {'name': 'correlation', 'params': {**correlation_params(candles), 'benchmark': 'SPY'}}
+        ]
+    }
+
+    anonymized = anonymize(request)
+    params = anonymized['indicators'][1]['params']
+    assert set(params['series']).isdisjoint({'BTCUSDT', 'ETHUSDT'})
+    assert params['benchmark'] != 'SPY'
+    assert anonymized['indicators'][0] == request['indicators'][0]
+
+    shift = candles[0]['time'] - anonymized['candleData'][0]['time']
+    listed = next(iter(params['series'].values()))
+    assert listed[0]['time'] == candles[0]['time'] - shift
+    # 元のリクエストは変更しない
+    assert 'BTCUSDT' in request['indicators'][1]['params']['series']
+
+
+def test_anonymize_backtest_symbols():
+    aapl = random_walk_candles(100)
+    request = {
+        '_mode': 'backtest',
+        'symbol': 'AAPL',
+        'symbols': [
+            {'symbol': 'AAPL', 'candleData': aapl},
+            {'symbol': 'MSFT', 'datasetHandle': 'ds-msft', 'metadata': {'exchange': 'NASDAQ'}}
+        ]
+    }
+
+    anonymized = anonymize(request)
+    first, second = anonymized['symbols']
+    assert anonymized['symbol'] == first['symbol']
+    assert first['symbol'] not in ('AAPL', 'MSFT') and second['symbol'] not in ('AAPL', 'MSFT')
+    assert first['symbol'] != second['symbol']
+    assert second['datasetHandle'] != 'ds-msft'
+    assert 'metadata' not in second
+
+    assert first['candleData'][0]['time'] != aapl[0]['time']
+    assert first['candleData'][0]['close'] != aapl[0]['close']
+    assert len(first['candleData']) == len(aapl)
+    # 元のリクエストは変更しない
+    assert request['symbols'][0]['symbol'] == 'AAPL'
+    assert request['symbols'][0]['candleData'][0] is aapl[0]
+
+
+def test_anonymized_backtest_runs(runtime):
+    request = {
+        '_mode': 'backtest',
+        'symbols': [
+            {'symbol': 'AAPL', 'candleData': random_walk_candles(300)},
+            {'symbol': 'MSFT', 'candleData': random_walk_candles(300, seed=2)}
+        ],
+        'indicators': {'fast': {'name': 'sma', 'params': {'period': 10}}},
+        'entry': [{'left': 'close', 'op': 'crossAbove', 'right': 'fast'}],
+        'exit': [{'left': 'close', 'op': 'crossBelow', 'right': 'fast'}]
+    }
+
+    response = runtime.handle(anonymize(request))
+    assert response['success'] is True, response
+    assert set(response['metadata']['symbols']).isdisjoint({'AAPL', 'MSFT'})
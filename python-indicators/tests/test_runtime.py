@@ -0,0 +1,216 @@
+"""
+リクエスト処理の組み合わせ (ディスクキャッシュ・同一リクエストの合流・上限・期限)
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import random_walk_candles
+from request_limits import LimitExceededError
+from scheduler import DeadlineExceededError, deadline_scope
+from single_flight import SingleFlight
+from talib_wrapper import pin_backend, set_profile
+
+
+def sma_request(candles, **options):
+    return {'name': 'sma', 'candleData': candles, 'params': {'period': 20}, **options}
+
+
+def test_limits_apply_to_cached_results(runtime, monkeypatch, tmp_path):
+    monkeypatch.setenv('INDICATOR_CACHE_DIR', str(tmp_path))
+    candles = random_walk_candles(5000)
+
+    first = runtime.handle(sma_request(candles))
+    assert first['metadata']['cache'] == 'miss'
+
+    limited = runtime.handle(sma_request(candles, limits={'maxOutputPoints': 10}))
+    assert limited['success'] is False
+    assert limited['error']['type'] == 'LimitExceededError'
+
+    again = runtime.handle(sma_request(candles))
+    assert again['metadata']['cache'] == 'hit'
+
+
+def test_limited_request_does_not_join_flight(runtime):
+    indicator = runtime.get_indicator('sma')
+    candles, _ = indicator.prepare_candles(sma_request(random_walk_candles(500)))
+    before = runtime.flight.stats()
+
+    with pytest.raises(LimitExceededError):
+        indicator.compute(candles, {'period': 20}, sma_request(None, limits={'maxOutputPoints': 10}))
+
+    after = runtime.flight.stats()
+    assert after['executed'] == before['executed']
+    assert after['coalesced'] == before['coalesced']
+
+
+def test_input_limit(runtime):
+    response = runtime.handle(sma_request(random_walk_candles(100), limits={'maxInputPoints': 50}))
+    assert response['error']['type'] == 'LimitExceededError'
+
+
+@pytest.mark.parametrize('payload', [b'[]', b'[{"name": "sma"}]', b'42', b'"sma"', b'null'])
+def test_non_object_request_is_an_error_response(runtime, payload):
+    response = json.loads(runtime.handle_bytes(payload))
+    assert response['success'] is False
+    assert response['error']['type'] == 'ValueError'
+
+
+@pytest.mark.parametrize('gap_factor', [0, -1.5, 'wide', None, True, float('nan')])
+def test_invalid_gap_factor_is_rejected(runtime, gap_factor):
+    candles = random_walk_candles(50)
+    for request in (sma_request(candles), {'_mode': 'registerDataset', 'candleData': candles}):
+        response = runtime.handle({**request, 'sanitize': {'gapFactor': gap_factor}})
+        assert response['success'] is False
+        assert response['error']['type'] == 'ValueError'
+        assert response['error']['message'] == 'gapFactor must be a positive number'
+
+
+def test_dataset_key_follows_version(runtime, monkeypatch, tmp_path):
+    monkeypatch.setenv('INDICATOR_CACHE_DIR', str(tmp_path))
+    candles = random_walk_candles(500)
+    handle = runtime.handle({'_mode': 'registerDataset', 'candleData': candles})['datasetHandle']
+    request = {'name': 'sma', 'datasetHandle': handle, 'params': {'period': 5}, 'latestOnly': True}
+    try:
+        first = runtime.handle(request)
+        assert first['metadata']['cache'] == 'miss'
+        assert runtime.handle(request)['metadata']['cache'] == 'hit'
+
+        # 最後の足を置き換えたら、同じハンドルでも前の結果を返さない
+        updated = dict(candles[-1], close=candles[-1]['close'] + 5, high=candles[-1]['high'] + 5)
+        runtime.handle({'_mode': 'appendCandles', 'datasetHandle': handle, 'candleData': [updated]})
+        second = runtime.handle(request)
+        assert second['metadata']['cache'] == 'miss'
+        assert second.values.values[-1] == pytest.approx(first.values.values[-1] + 1)
+
+        # 同じハンドルで別の列を登録し直しても、前の登録の結果は使わない
+        runtime.handle({'_mode': 'registerDataset', 'datasetHandle': handle, 'candleData': candles})
+        assert runtime.handle(request)['metadata']['cache'] == 'miss'
+    finally:
+        runtime.handle({'_mode': 'dropDataset', 'datasetHandle': handle})
+
+
+def test_key_hashes_only_input_columns(runtime):
+    indicator = runtime.get_indicator('sma')
+    candles = random_walk_candles(200)
+    key = indicator.cache_key(candles, {'period': 20}, {})
+
+    wider = [dict(candle, high=candle['high'] + 1) for candle in candles]
+    assert indicator.cache_key(wider, {'period': 20}, {}) == key
+    moved = [dict(candle, close=candle['close'] + 1) for candle in candles]
+    assert indicator.cache_key(moved, {'period': 20}, {}) != key
+
+
+def test_key_includes_backend_selection(runtime):
+    indicator = runtime.get_indicator('macd')
+    candles = random_walk_candles(200)
+    key = indicator.cache_key(candles, {}, {})
+    try:
+        pin_backend('numpy')
+        pinned = indicator.cache_key(candles, {}, {})
+        set_profile({'functions': {'MACD': {'1000': 'numba'}}})
+        profiled = indicator.cache_key(candles, {}, {})
+    finally:
+        pin_backend(None)
+        set_profile(None)
+    assert len({key, pinned, profiled}) == 3
+    assert indicator.cache_key(candles, {}, {}) == key
+
+
+def _leader_and_follower(flight, leader_fn, follower):
+    """leader_fn を実行中のキーに follower() を合流させ、(先行の結果または例外, 合流側の結果または例外)"""
+    started = threading.Event()
+    release = threading.Event()
+    outcome = {}
+
+    def leader():
+        def fn():
+            started.set()
+            release.wait(5)
+            return leader_fn()
+        try:
+            outcome['leader'] = flight.do('key', fn)
+        except BaseException as e:
+            outcome['leader'] = e
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(5)
+
+    def run_follower():
+        try:
+            outcome['follower'] = follower()
+        except BaseException as e:
+            outcome['follower'] = e
+
+    follower_thread = threading.Thread(target=run_follower)
+    follower_thread.start()
+    # 合流側が待ち始めてから先行の計算を終わらせる
+    for _ in range(500):
+        if flight.stats()['coalesced']:
+            break
+        time.sleep(0.001)
+    release.set()
+    thread.join(5)
+    follower_thread.join(5)
+    return outcome['leader'], outcome['follower']
+
+
+def test_follower_retries_after_leader_deadline():
+    flight = SingleFlight()
+
+    def leader_fn():
+        raise DeadlineExceededError("Request deadline exceeded")
+
+    leader, follower = _leader_and_follower(flight, leader_fn, lambda: flight.do('key', lambda: 'computed'))
+    assert isinstance(leader, DeadlineExceededError)
+    assert follower == ('computed', False)
+
+
+def test_follower_shares_other_errors():
+    flight = SingleFlight()
+
+    def leader_fn():
+        raise ValueError("Invalid parameters")
+
+    leader, follower = _leader_and_follower(flight, leader_fn, lambda: flight.do('key', lambda: 'computed'))
+    assert isinstance(leader, ValueError)
+    assert isinstance(follower, ValueError)
+
+
+def test_follower_stops_waiting_at_own_deadline():
+    flight = SingleFlight()
+
+    def follower():
+        with deadline_scope(time.monotonic() + 0.05):
+            start = time.monotonic()
+            try:
+                flight.do('key', lambda: 'computed')
+            finally:
+                follower.waited = time.monotonic() - start
+
+    leader, outcome = _leader_and_follower(flight, lambda: time.sleep(0.3) or 'slow', follower)
+    assert leader == ('slow', False)
+    assert isinstance(outcome, DeadlineExceededError)
+    assert follower.waited < 0.25
+
+
+def test_deadline_cancels_long_backtest(runtime):
+    start = time.monotonic()
+    response = runtime.handle({
+        '_mode': 'backtest',
+        'candleData': random_walk_candles(5000),
+        'indicators': {
+            'fast': {'name': 'sma', 'params': {'period': list(range(2, 60))}},
+            'slow': {'name': 'sma', 'params': {'period': list(range(20, 200, 2))}}
+        },
+        'entry': [{'left': 'fast', 'op': 'crossAbove', 'right': 'slow'}],
+        'exit': [{'left': 'fast', 'op': 'crossBelow', 'right': 'slow'}],
+        'deadlineMs': 100
+    })
+    assert response['success'] is False
+    assert response['error']['type'] == 'DeadlineExceededError'
+    assert time.monotonic() - start < 5
@@ -0,0 +1,78 @@
+"""
+インジケーター計算用スレッドプール
+TA-LibのC関数や大きなnumpy演算はGILを解放するため、
+同じ配列に対する独立した計算をスレッドで並行実行できる
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+from scheduler import current_deadline, deadline_scope
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def default_thread_count() -> int:
+    """スレッド数 (環境変数 INDICATOR_THREADS、未設定時はCPU数)"""
+    value = os.environ.get('INDICATOR_THREADS')
+    if value:
+        return max(1, int(value))
+    return os.cpu_count() or 1
+
+
+def configure(max_workers: int) -> None:
+    """
+    プールのスレッド数を設定 (既存のプールは処理中のタスク完了後に破棄)
+
+    Args:
+        max_workers: スレッド数
+    """
+    global _executor
+    with _lock:
+        previous = _executor
+        _executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='indicator-calc')
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """共有スレッドプールを取得 (初回呼び出し時に生成)"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=default_thread_count(), thread_name_prefix='indicator-calc')
+        return _executor
+
+
+def parallel_map(fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    """
+    共有プールで関数を並行適用し、入力順に結果を返す
+    要素が1つ以下の場合は呼び出し元のスレッドで実行する
+
+    Args:
+        fn: 各要素に適用する関数
+        items: 入力
+
+    Returns:
+        結果のリスト
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+
+    # 呼び出し元のリクエストの期限をプールのスレッドにも引き継ぐ (checkpoint() 用)
+    deadline = current_deadline()
+
+    def call(item: T) -> R:
+        with deadline_scope(deadline):
+            return fn(item)
+
+    executor = get_executor()
+    futures = [executor.submit(call, item) for item in items]
+    return [future.result() for future in futures]
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+zygoteサーバー (リクエストごとのプロセス分離を保ったまま起動コストを省く)
+
+親プロセスが numpy / TA-Lib とすべてのインジケーターを読み込んで待機し、
+接続ごとに os.fork() した子プロセスでリクエストを処理する。子は親の
+読み込み済みのヒープをコピーオンライトで引き継ぐため、import のコストがかからない。
+子はレスポンスを書いたら終了するので、クラッシュやメモリリークは他のリクエストに影響しない。
+
+1接続で1リクエストを処理する (フレーム形式は indicator_server.py と同じ)。
+子が異常終了した場合やタイムアウトで強制終了した場合は、親がエラーレスポンスを返す。
+子にはCPU時間とメモリの上限 (request_limits.apply_process_limits) を設定でき、
+超えたリクエストはその子だけが失敗する。
+
+使い方:
+    python zygote.py --socket /tmp/aiblack-zygote.sock --max-children 8 --timeout 30 \
+        --max-cpu-seconds 20 --max-memory-mb 2048
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import errno
+import select
+import signal
+import socket
+import argparse
+import traceback
+from typing import Any, Callable, Dict, Optional
+from indicator_runtime import IndicatorRuntime
+from indicator_server import FRAME_HEADER, DEFAULT_MAX_FRAME_BYTES, encode_frame
+from request_limits import apply_process_limits
+
+
+DEFAULT_SOCKET_PATH = '/tmp/aiblack-zygote.sock'
+DEFAULT_TIMEOUT = 30.0
+# 子プロセスの終了確認とタイムアウト確認の間隔 (秒)
+POLL_INTERVAL = 0.02
+
+
+def _recv_exact(conn: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = conn.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(conn: socket.socket, max_frame_bytes: int) -> Optional[bytes]:
+    """
+    フレームを1つ読み込む (ブロッキング)
+
+    Returns:
+        ペイロード (接続が閉じられた場合はNone)
+    """
+    header = _recv_exact(conn, FRAME_HEADER.size)
+    if header is None:
+        return None
+
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > max_frame_bytes:
+        raise ValueError(f"Frame too large: {length} bytes (max {max_frame_bytes})")
+
+    return _recv_exact(conn, length)
+
+
+def warm_up(runtime: IndicatorRuntime) -> None:
+    """
+    各インジケーターを小さな入力で一度計算し、初回だけ発生する処理
+    (遅延import、JITコンパイル、キャッシュ読み込み等) を親で済ませておく
+    """
+    candles = [
+        {'time': 1_700_000_000 + i * 60, 'open': 100.0 + i % 7, 'high': 101.0 + i % 7,
+         'low': 99.0 + i % 7, 'close': 100.5 + i % 5, 'volume': 1000.0}
+        for i in range(300)
+    ]
+    for name in runtime.indicators:
+        # 結果は使わず、失敗しても起動は続ける (子では通常どおりエラーレスポンスになる)
+        runtime.handle({'name': name, 'candleData': candles, 'params': {}, 'cache': False, 'coalesce': False})
+
+
+class _Child:
+    __slots__ = ('conn', 'started', 'timed_out')
+
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+        self.started = time.monotonic()
+        self.timed_out = False
+
+
+class Zygote:
+    """接続ごとに子プロセスをforkするサーバー"""
+
+    def __init__(
+        self,
+        runtime: IndicatorRuntime,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        max_children: int = os.cpu_count() or 1,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+        max_cpu_seconds: Optional[float] = None,
+        max_memory_mb: Optional[int] = None
+    ):
+        self.runtime = runtime
+        self.socket_path = socket_path
+        self.max_children = max(1, max_children)
+        self.timeout = timeout
+        self.max_frame_bytes = max_frame_bytes
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_memory_mb = max_memory_mb
+        self.children: Dict[int, _Child] = {}
+        self._stopping = False
+        self._listener: Optional[socket.socket] = None
+
+    def serve(self) -> None:
+        """ソケットを開いて終了シグナルまで待機"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._listener.listen(128)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._stop)
+
+        # 読み込み済みのオブジェクトをGCの対象外にし、子でのGCによるページのコピーを防ぐ
+        gc.freeze()
+        print(f"Indicator zygote listening on {self.socket_path}", file=sys.stderr)
+
+        try:
+            while not self._stopping:
+                self._reap()
+                self._enforce_timeouts()
+                if len(self.children) >= self.max_children:
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                try:
+                    readable, _, _ = select.select([self._listener], [], [], POLL_INTERVAL)
+                except InterruptedError:
+                    continue
+                if readable:
+                    self._accept()
+
+            # 処理中の子の終了を待つ
+            while self.children:
+                self._reap()
+                self._enforce_timeouts()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self._listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _accept(self) -> None:
+        try:
+            conn, _ = self._listener.accept()
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return
+            raise
+
+        pid = os.fork()
+        if pid == 0:
+            self._run_child(conn)
+        # 親は接続を保持し、子の異常終了時にエラーレスポンスを返す
+        self.children[pid] = _Child(conn)
+
+    def _run_child(self, conn: socket.socket) -> None:
+        """子プロセス: 1リクエストを処理して終了する (戻らない)"""
+        code = 1
+        try:
+            self._listener.close()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            apply_process_limits(self.max_cpu_seconds, self.max_memory_mb)
+
+            payload = recv_frame(conn, self.max_frame_bytes)
+            if payload is not None:
+                conn.sendall(encode_frame(self.runtime.handle_bytes(payload)))
+            code = 0
+        except BaseException:
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _reap(self) -> None:
+        """終了した子を回収し、異常終了ならエラーレスポンスを返す"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            child = self.children.pop(pid, None)
+            if child is None:
+                continue
+
+            if not (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0):
+                self._send_error(child, self._describe_exit(child, status))
+            child.conn.close()
+
+    def _enforce_timeouts(self) -> None:
+        now = time.monotonic()
+        for pid, child in self.children.items():
+            if not child.timed_out and now - child.started > self.timeout:
+                child.timed_out = True
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _describe_exit(self, child: _Child, status: int) -> Dict[str, Any]:
+        if child.timed_out:
+            return {'type': 'TimeoutError', 'message': f"Indicator process timed out after {self.timeout}s"}
+        if os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU:
+            return {
+                'type': 'LimitExceededError',
+                'message': f"Indicator process exceeded the CPU time limit of {self.max_cpu_seconds}s"
+            }
+        if os.WIFSIGNALED(status):
+            return {
+                'type': 'ChildProcessError',
+                'message': f"Indicator process terminated by signal {os.WTERMSIG(status)}"
+            }
+        return {
+            'type': 'ChildProcessError',
+            'message': f"Indicator process exited with code {os.WEXITSTATUS(status)}"
+        }
+
+    @staticmethod
+    def _send_error(child: _Child, error: Dict[str, Any]) -> None:
+        payload = json.dumps({'success': False, 'error': error}, ensure_ascii=False).encode('utf-8')
+        try:
+            child.conn.sendall(encode_frame(payload))
+        except OSError:
+            # クライアントが既に切断している
+            pass
+
+
+def _env_number(name: str, convert: Callable[[str], Any]) -> Any:
+    value = os.environ.get(name)
+    return convert(value) if value else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fork-per-request indicator server with a warm parent process')
+    parser.add_argument('--socket', default=os.environ.get('INDICATOR_ZYGOTE_SOCKET_PATH', DEFAULT_SOCKET_PATH))
+    parser.add_argument('--max-children', type=int, default=os.cpu_count() or 1,
+                        help='max concurrent child processes (further connections wait in the backlog)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds before a child is killed')
+    parser.add_argument('--max-frame-bytes', type=int, default=DEFAULT_MAX_FRAME_BYTES)
+    parser.add_argument('--max-cpu-seconds', type=float,
+                        default=_env_number('INDICATOR_CHILD_CPU_SECONDS', float),
+                        help='CPU time limit per child (SIGXCPU when exceeded)')
+    parser.add_argument('--max-memory-mb', type=int,
+                        default=_env_number('INDICATOR_CHILD_MEMORY_MB', int),
+                        help='memory a child may allocate beyond what it inherits (MemoryError when exceeded)')
+    parser.add_argument('--no-warm-up', action='store_true', help='skip computing each indicator once at startup')
+    args = parser.parse_args()
+
+    runtime = IndicatorRuntime()
+    if not args.no_warm_up:
+        warm_up(runtime)
+
+    Zygote(
+        runtime,
+        socket_path=args.socket,
+        max_children=args.max_children,
+        timeout=args.timeout,
+        max_frame_bytes=args.max_frame_bytes,
+        max_cpu_seconds=args.max_cpu_seconds,
+        max_memory_mb=args.max_memory_mb
+    ).serve()
+
+
+if __name__ == '__main__':
+    main()
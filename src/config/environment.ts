@@ -55,6 +55,13 @@ export const env = {
   // Python実行
   pythonPath: process.env.PYTHON_PATH || 'python3',
   pythonTimeout: parseInt(process.env.PYTHON_TIMEOUT || '30000', 10),
+  // 常駐インジケーターサーバーのソケット (空の場合はリクエストごとにプロセス起動)
+  pythonSocketPath: process.env.PYTHON_SOCKET_PATH || '',
+  pythonSocketPoolSize: parseInt(process.env.PYTHON_SOCKET_POOL_SIZE || '4', 10),
+  // zygoteサーバーのソケット (リクエストごとに子プロセスで実行、常駐サーバー未設定時に使用)
+  pythonZygoteSocketPath: process.env.PYTHON_ZYGOTE_SOCKET_PATH || '',
+  // HTTPクライアントが受け付ける場合、大きなレスポンスをPythonで圧縮して展開せずに転送する
+  pythonResponseCompression: process.env.PYTHON_RESPONSE_COMPRESSION !== 'false',
 } as const;
 
 /**
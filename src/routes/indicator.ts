@@ -2,9 +2,13 @@ import { Router, Request, Response } from 'express';
 import { pythonExecutor } from '../services/python-executor.service';
 import { IndicatorRequest } from '../types/indicator';
 import { logger } from '../utils/logger';
+import { PythonEncoding } from '../utils/python-payload';
 
 const router = Router();
 
+// Pythonが圧縮できる形式 (優先順)
+const PYTHON_ENCODINGS: PythonEncoding[] = ['zstd', 'gzip'];
+
 /**
  * POST /api/indicator/execute
  * インジケーターを実行
@@ -12,8 +16,10 @@ const router = Router();
  * Request Body:
  * {
  *   "name": "sma",
- *   "candleData": [...],
+ *   "candleData": [...],              // または "datasetHandle": "..." (登録済みデータセット)
  *   "params": { "period": 20 },
+ *   "output": "events",               // 省略可: クロス等が起きた足だけを返す (macd / bollinger / rsi)
+ *   "fingerprint": { "time": ..., "hash": "..." }, // 省略可: 前回の metadata.fingerprint (末尾の差分だけを返す)
  *   "metadata": { ... }
  * }
  */
@@ -33,7 +39,18 @@ router.post('/execute', async (req: Request, res: Response): Promise<void> => {
       return;
     }
 
-    if (!Array.isArray(request.candleData) || request.candleData.length === 0) {
+    if (request.datasetHandle !== undefined) {
+      if (typeof request.datasetHandle !== 'string' || !pythonExecutor.supportsDatasets()) {
+        res.status(400).json({
+          success: false,
+          error: {
+            type: 'ValidationError',
+            message: 'datasetHandle must be a string and requires the resident indicator server',
+          },
+        });
+        return;
+      }
+    } else if (!Array.isArray(request.candleData) || request.candleData.length === 0) {
       res.status(400).json({
         success: false,
         error: {
@@ -55,17 +72,58 @@ router.post('/execute', async (req: Request, res: Response): Promise<void> => {
       return;
     }
 
+    if (request.output !== undefined && request.output !== 'series' && request.output !== 'events') {
+      res.status(400).json({
+        success: false,
+        error: {
+          type: 'ValidationError',
+          message: "output must be 'series' or 'events'",
+        },
+      });
+      return;
+    }
+
+    if (
+      request.fingerprint !== undefined &&
+      request.fingerprint !== true &&
+      (typeof request.fingerprint !== 'object' ||
+        request.fingerprint === null ||
+        !Number.isInteger(request.fingerprint.time) ||
+        typeof request.fingerprint.hash !== 'string')
+    ) {
+      res.status(400).json({
+        success: false,
+        error: {
+          type: 'ValidationError',
+          message: 'fingerprint must be true or an object with integer time and string hash',
+        },
+      });
+      return;
+    }
+
     logger.info(`Indicator execution request: ${request.name}`, {
-      candleCount: request.candleData.length,
+      candleCount: request.candleData?.length ?? 0,
+      datasetHandle: request.datasetHandle,
       params: request.params,
     });
 
-    // Python実行
-    const result = await pythonExecutor.execute(request.name, request);
+    // Python実行 (クライアントが受け付ける形式なら、大きな結果は圧縮されたまま返る)
+    const passThroughEncodings = PYTHON_ENCODINGS.filter((encoding) => req.acceptsEncodings(encoding) === encoding);
+    const result = await pythonExecutor.execute(request.name, request, passThroughEncodings);
 
     // 結果返却
-    if (result.success) {
+    if ('body' in result) {
+      res.set('Content-Encoding', result.encoding);
+      res.vary('Accept-Encoding');
+      res.type('application/json').send(result.body);
+    } else if (result.success) {
       res.json(result);
+    } else if (result.error.type === 'QueueFullError') {
+      // 常駐サーバーのキューが満杯 (バックプレッシャー)
+      res.set('Retry-After', '1').status(503).json(result);
+    } else if (result.error.type === 'LimitExceededError') {
+      // 入力本数・推定出力点数・子プロセスのCPU時間の上限を超えた (python-indicators/request_limits.py)
+      res.status(413).json(result);
     } else {
       res.status(500).json(result);
     }
@@ -143,6 +201,38 @@ router.get('/health', async (_req: Request, res: Response): Promise<void> => {
   }
 });
 
+/**
+ * GET /api/indicator/metrics
+ * 常駐インジケーターサーバーのメトリクス (Prometheusテキスト形式)
+ */
+router.get('/metrics', async (_req: Request, res: Response): Promise<void> => {
+  try {
+    const metrics = await pythonExecutor.getMetrics();
+
+    if (metrics === null) {
+      res.status(503).json({
+        success: false,
+        error: {
+          type: 'UnavailableError',
+          message: 'Metrics require the resident indicator server (PYTHON_SOCKET_PATH)',
+        },
+      });
+      return;
+    }
+
+    res.type('text/plain; version=0.0.4').send(metrics);
+  } catch (error) {
+    logger.error('Failed to get indicator metrics', { error });
+    res.status(500).json({
+      success: false,
+      error: {
+        type: 'InternalError',
+        message: error instanceof Error ? error.message : 'Unknown error',
+      },
+    });
+  }
+});
+
 /**
  * GET /api/indicator/metadata
  * 全インジケーターのメタデータを取得
@@ -206,4 +296,107 @@ router.get('/metadata/:name', async (req: Request, res: Response): Promise<void>
   }
 });
 
+/**
+ * POST /api/indicator/datasets
+ * ローソク足をデータセットとして登録 (以降は datasetHandle で参照し、差分だけを追記する)
+ *
+ * Request Body:
+ * {
+ *   "candleData": [...],
+ *   "sanitize": { "nanPolicy": "drop" },  // 省略可
+ *   "prefixIndex": true                   // 省略可 (累積和のインデックスを保持する列、true なら close)
+ * }
+ */
+router.post('/datasets', async (req: Request, res: Response): Promise<void> => {
+  await handleDatasetRequest(res, () => {
+    if (!Array.isArray(req.body.candleData) || req.body.candleData.length === 0) {
+      return null;
+    }
+    return pythonExecutor.registerDataset(req.body.candleData, req.body.sanitize, req.body.prefixIndex);
+  });
+});
+
+/**
+ * POST /api/indicator/datasets/:handle/append
+ * 新しい足・更新された末尾の足だけを追記
+ *
+ * Request Body:
+ * {
+ *   "candleData": [...]   // 既存の足と同じ time の足は置き換え
+ * }
+ */
+router.post('/datasets/:handle/append', async (req: Request, res: Response): Promise<void> => {
+  await handleDatasetRequest(res, () => {
+    if (!Array.isArray(req.body.candleData) || req.body.candleData.length === 0) {
+      return null;
+    }
+    return pythonExecutor.appendCandles(req.params.handle as string, req.body.candleData);
+  });
+});
+
+/**
+ * DELETE /api/indicator/datasets/:handle
+ * データセットを削除
+ */
+router.delete('/datasets/:handle', async (req: Request, res: Response): Promise<void> => {
+  await handleDatasetRequest(res, async () => ({
+    success: true,
+    dropped: await pythonExecutor.dropDataset(req.params.handle as string),
+  }));
+});
+
+/**
+ * データセット操作の共通処理
+ * @param res レスポンス
+ * @param operation 操作 (candleData が不正な場合は null を返す)
+ */
+async function handleDatasetRequest(
+  res: Response,
+  operation: () => Promise<any> | null
+): Promise<void> {
+  if (!pythonExecutor.supportsDatasets()) {
+    res.status(503).json({
+      success: false,
+      error: {
+        type: 'UnavailableError',
+        message: 'Datasets require the resident indicator server (PYTHON_SOCKET_PATH)',
+      },
+    });
+    return;
+  }
+
+  try {
+    const pending = operation();
+    if (pending === null) {
+      res.status(400).json({
+        success: false,
+        error: {
+          type: 'ValidationError',
+          message: 'candleData must be a non-empty array',
+        },
+      });
+      return;
+    }
+
+    const result = await pending;
+    if (result.success) {
+      res.json(result);
+    } else if (result.error?.message?.startsWith('Unknown datasetHandle')) {
+      // 期限切れ等で削除された (クライアントは再登録する)
+      res.status(404).json(result);
+    } else {
+      res.status(500).json(result);
+    }
+  } catch (error) {
+    logger.error('Dataset request failed', { error });
+    res.status(500).json({
+      success: false,
+      error: {
+        type: 'InternalError',
+        message: error instanceof Error ? error.message : 'Unknown error',
+      },
+    });
+  }
+}
+
 export default router;
@@ -1,8 +1,17 @@
 import { spawn, ChildProcess } from 'child_process';
 import path from 'path';
-import { IndicatorRequest, IndicatorResponse, IndicatorErrorResponse } from '../types/indicator';
+import {
+  CandleData,
+  DatasetResponse,
+  EncodedIndicatorResponse,
+  IndicatorRequest,
+  IndicatorResponse,
+  IndicatorErrorResponse,
+} from '../types/indicator';
 import { logger } from '../utils/logger';
 import { env } from '../config/environment';
+import { pythonSocketClient, requestOnceRaw } from './python-socket-client.service';
+import { PythonEncoding, decodePythonPayload, detectEncoding } from '../utils/python-payload';
 
 /**
  * Python Indicator Executor Service
@@ -23,24 +32,37 @@ export class PythonExecutorService {
    * インジケーターを実行
    * @param indicatorName インジケーター名 (例: 'sma', 'ema')
    * @param request リクエストデータ
+   * @param passThroughEncodings 圧縮したまま返してよい形式 (HTTPクライアントが受け付ける形式)。
+   *   大きな成功レスポンスはPythonが圧縮し、展開せずに EncodedIndicatorResponse で返す
    * @returns インジケーター実行結果
    */
   async execute(
     indicatorName: string,
-    request: IndicatorRequest
-  ): Promise<IndicatorResponse | IndicatorErrorResponse> {
+    request: IndicatorRequest,
+    passThroughEncodings: PythonEncoding[] = []
+  ): Promise<IndicatorResponse | IndicatorErrorResponse | EncodedIndicatorResponse> {
     const scriptPath = this.getScriptPath(indicatorName);
+    const compression = env.pythonResponseCompression ? passThroughEncodings : [];
 
     logger.info(`Executing Python indicator: ${indicatorName}`, {
       scriptPath,
-      candleCount: request.candleData.length,
+      candleCount: request.candleData?.length ?? 0,
+      datasetHandle: request.datasetHandle,
       params: request.params,
     });
 
     try {
-      const result = await this.spawnPythonProcess(scriptPath, request);
+      // クライアントが指定した compression は使わず、転送できる形式だけをPythonに許す
+      const payload = await this.dispatchRaw(indicatorName, scriptPath, { ...request, compression });
+      const encoding = detectEncoding(payload);
+      // 圧縮されたレスポンスは成功レスポンスのみ (展開せずにそのまま返す)
+      const result: IndicatorResponse | IndicatorErrorResponse | EncodedIndicatorResponse = encoding
+        ? { success: true, encoding, body: payload }
+        : await this.decode(payload);
       logger.info(`Python indicator completed: ${indicatorName}`, {
         success: result.success,
+        encoding,
+        bytes: payload.length,
       });
       return result;
     } catch (error) {
@@ -82,7 +104,7 @@ export class PythonExecutorService {
     logger.info(`Getting metadata for indicator: ${indicatorName}`);
     
     // メタデータ取得モードで実行
-    const result = await this.spawnPythonProcess(scriptPath, {
+    const result = await this.dispatch(indicatorName, scriptPath, {
       name: indicatorName,
       candleData: [],
       params: {},
@@ -116,19 +138,150 @@ export class PythonExecutorService {
   }
 
   /**
-   * Pythonプロセスを起動してJSONデータをやり取り
+   * データセット (ハンドルで参照するローソク足) が使えるか
+   * 常駐サーバーのメモリに保持するため、ソケットモードでのみ利用できる
+   */
+  supportsDatasets(): boolean {
+    return pythonSocketClient.isEnabled();
+  }
+
+  /**
+   * ローソク足をデータセットとして登録
+   * @param candleData ローソク足データ配列
+   * @param sanitize サニタイズ設定 (追記時にも使用)
+   * @param prefixIndex 累積和のインデックスを保持する列 (true なら close、SMA・ボリンジャーバンドが使う)
+   * @returns ハンドルを含む登録結果
+   */
+  registerDataset(
+    candleData: CandleData[],
+    sanitize?: Record<string, any>,
+    prefixIndex?: boolean | string[]
+  ): Promise<DatasetResponse | IndicatorErrorResponse> {
+    return this.datasetRequest({ _mode: 'registerDataset', candleData, sanitize, prefixIndex });
+  }
+
+  /**
+   * データセットに新しい足・更新された末尾の足を追記
+   * @param datasetHandle データセットのハンドル
+   * @param candleData 追記するローソク足 (既存の足と同じ time の足は置き換え)
+   * @returns 追記結果
+   */
+  appendCandles(
+    datasetHandle: string,
+    candleData: CandleData[]
+  ): Promise<DatasetResponse | IndicatorErrorResponse> {
+    return this.datasetRequest({ _mode: 'appendCandles', datasetHandle, candleData });
+  }
+
+  /**
+   * データセットを削除
+   * @param datasetHandle データセットのハンドル
+   */
+  async dropDataset(datasetHandle: string): Promise<boolean> {
+    const result: any = await this.datasetRequest({ _mode: 'dropDataset', datasetHandle });
+    return result.success && result.dropped;
+  }
+
+  private async datasetRequest(request: object): Promise<any> {
+    if (!this.supportsDatasets()) {
+      throw new Error('Datasets require the resident indicator server (PYTHON_SOCKET_PATH)');
+    }
+    return pythonSocketClient.request(request);
+  }
+
+  /**
+   * 常駐インジケーターサーバーのメトリクスを取得 (Prometheusテキスト形式)
+   * プロセス起動モードではプロセスごとに値が消えるため取得しない
+   * @returns メトリクスのテキスト (常駐サーバー未設定時は null)
+   */
+  async getMetrics(): Promise<string | null> {
+    if (!pythonSocketClient.isEnabled()) {
+      return null;
+    }
+
+    const result: any = await pythonSocketClient.request({ _mode: 'metrics' });
+    if (!result.success) {
+      throw new Error(result.error?.message ?? 'Failed to get indicator metrics');
+    }
+    return result.metrics;
+  }
+
+  /**
+   * 実行して結果を解析
+   * @param indicatorName インジケーター名
    * @param scriptPath Pythonスクリプトのパス
    * @param request リクエストデータ
    * @returns 実行結果
    */
-  private spawnPythonProcess(
+  private async dispatch(
+    indicatorName: string,
     scriptPath: string,
     request: IndicatorRequest
   ): Promise<IndicatorResponse | IndicatorErrorResponse> {
+    return this.decode(await this.dispatchRaw(indicatorName, scriptPath, request));
+  }
+
+  /**
+   * Pythonのレスポンスを展開・解析
+   * @param payload レスポンスのペイロード
+   * @returns 解析結果
+   */
+  private async decode(payload: Buffer): Promise<IndicatorResponse | IndicatorErrorResponse> {
+    try {
+      return await decodePythonPayload(payload);
+    } catch (error) {
+      logger.error('Failed to parse Python output', {
+        stdout: payload.subarray(0, 500).toString('utf-8'),
+        error,
+      });
+      throw new Error('Invalid JSON response from Python');
+    }
+  }
+
+  /**
+   * 常駐サーバーが設定されていればソケット経由、zygoteサーバーが設定されていれば
+   * リクエストごとの子プロセス、どちらもなければプロセス起動で実行
+   * @param indicatorName インジケーター名
+   * @param scriptPath Pythonスクリプトのパス
+   * @param request リクエストデータ
+   * @returns レスポンスのペイロード (request.compression を指定した場合は圧縮されていることがある)
+   */
+  private dispatchRaw(
+    indicatorName: string,
+    scriptPath: string,
+    request: IndicatorRequest
+  ): Promise<Buffer> {
+    if (pythonSocketClient.isEnabled()) {
+      // 応答を待たなくなった後のリクエストはサーバー側で計算せずに捨てさせる
+      return pythonSocketClient.requestRaw({
+        ...request,
+        name: indicatorName,
+        deadlineMs: request.deadlineMs ?? this.timeout,
+      });
+    }
+    // 強制終了の前にPython側で計算を打ち切れるよう、同じ期限を渡す
+    const deadlineMs = request.deadlineMs ?? this.timeout;
+    if (env.pythonZygoteSocketPath) {
+      return requestOnceRaw(env.pythonZygoteSocketPath, { ...request, name: indicatorName, deadlineMs }, this.timeout);
+    }
+    return this.spawnPythonProcess(scriptPath, { ...request, deadlineMs });
+  }
+
+  /**
+   * Pythonプロセスを起動してJSONデータをやり取り
+   * @param scriptPath Pythonスクリプトのパス
+   * @param request リクエストデータ
+   * @returns stdoutのバイト列
+   */
+  private spawnPythonProcess(
+    scriptPath: string,
+    request: IndicatorRequest
+  ): Promise<Buffer> {
     return new Promise((resolve, reject) => {
       const pythonProcess: ChildProcess = spawn(this.pythonPath, [scriptPath]);
 
-      let stdout = '';
+      // 圧縮されたレスポンスがあるため、stdoutはバイト列のまま集める
+      const stdoutChunks: Buffer[] = [];
       let stderr = '';
       let timeoutId: NodeJS.Timeout;
 
@@ -140,7 +293,7 @@ export class PythonExecutorService {
 
       // stdout収集
       pythonProcess.stdout?.on('data', (data: Buffer) => {
-        stdout += data.toString();
+        stdoutChunks.push(data);
       });
 
       // stderr収集
@@ -151,8 +304,10 @@ export class PythonExecutorService {
       // プロセス終了
       pythonProcess.on('close', (code: number | null) => {
         clearTimeout(timeoutId);
+        const output = Buffer.concat(stdoutChunks);
 
         if (code !== 0) {
+          const stdout = output.toString('utf-8');
           const errorMessage = stderr || stdout || `Python process exited with code ${code}`;
           logger.error('Python process failed', {
             code,
@@ -173,16 +328,7 @@ export class PythonExecutorService {
           return;
         }
 
-        try {
-          const result = JSON.parse(stdout);
-          resolve(result);
-        } catch (error) {
-          logger.error('Failed to parse Python output', {
-            stdout: stdout.substring(0, 500),
-            error,
-          });
-          reject(new Error('Invalid JSON response from Python'));
-        }
+        resolve(output);
       });
 
       // エラーハンドリング
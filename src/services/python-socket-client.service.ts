@@ -0,0 +1,230 @@
+import net from 'net';
+import { IndicatorResponse, IndicatorErrorResponse } from '../types/indicator';
+import { logger } from '../utils/logger';
+import { env } from '../config/environment';
+import { decodePythonPayload } from '../utils/python-payload';
+
+type IndicatorResult = IndicatorResponse | IndicatorErrorResponse;
+
+interface PendingRequest {
+  resolve: (payload: Buffer) => void;
+  reject: (error: Error) => void;
+  timeoutId: NodeJS.Timeout;
+  settled: boolean;
+}
+
+/**
+ * 常駐インジケーターサーバーへの1本の接続
+ * 4バイト長 + JSON のフレームでリクエストをパイプライン送信し、
+ * 送信順に返るレスポンスを FIFO で対応付ける
+ */
+class PythonSocketConnection {
+  private readonly socket: net.Socket;
+  private readonly pending: PendingRequest[] = [];
+  private buffer: Buffer = Buffer.alloc(0);
+  public closed = false;
+
+  constructor(socketPath: string, private readonly timeout: number) {
+    this.socket = net.createConnection(socketPath);
+
+    this.socket.on('data', (data: Buffer) => this.onData(data));
+    this.socket.on('error', (error: Error) => {
+      logger.error('Python socket connection error', { error: error.message });
+      this.fail(error);
+    });
+    this.socket.on('close', () => this.fail(new Error('Python socket connection closed')));
+  }
+
+  /**
+   * 未応答リクエスト数
+   */
+  get inFlight(): number {
+    return this.pending.length;
+  }
+
+  /**
+   * リクエストを送信
+   * @param request リクエストデータ
+   * @returns レスポンスのペイロード (圧縮されている場合がある、decodePythonPayload で解析)
+   */
+  send(request: object): Promise<Buffer> {
+    return new Promise((resolve, reject) => {
+      const entry: PendingRequest = {
+        resolve,
+        reject,
+        settled: false,
+        timeoutId: setTimeout(() => {
+          // 応答順序を保つため、エントリは残したまま呼び出し側だけ失敗させる
+          entry.settled = true;
+          reject(new Error(`Python socket request timeout after ${this.timeout}ms`));
+        }, this.timeout),
+      };
+      this.pending.push(entry);
+
+      const payload = Buffer.from(JSON.stringify(request), 'utf-8');
+      const header = Buffer.alloc(4);
+      header.writeUInt32BE(payload.length, 0);
+      this.socket.write(Buffer.concat([header, payload]));
+    });
+  }
+
+  close(): void {
+    this.socket.end();
+  }
+
+  private onData(data: Buffer): void {
+    this.buffer = Buffer.concat([this.buffer, data]);
+
+    while (this.buffer.length >= 4) {
+      const length = this.buffer.readUInt32BE(0);
+      if (this.buffer.length < 4 + length) {
+        break;
+      }
+
+      const payload = this.buffer.subarray(4, 4 + length);
+      this.buffer = this.buffer.subarray(4 + length);
+
+      const entry = this.pending.shift();
+      if (!entry) {
+        logger.warn('Received unexpected response from Python socket');
+        continue;
+      }
+
+      clearTimeout(entry.timeoutId);
+      if (entry.settled) {
+        continue;
+      }
+      entry.settled = true;
+      entry.resolve(payload);
+    }
+  }
+
+  private fail(error: Error): void {
+    this.closed = true;
+    for (const entry of this.pending.splice(0)) {
+      clearTimeout(entry.timeoutId);
+      if (!entry.settled) {
+        entry.settled = true;
+        entry.reject(error);
+      }
+    }
+  }
+}
+
+/**
+ * Python Indicator Socket Client
+ * 常駐インジケーターサーバー (python-indicators/indicator_server.py) への接続プール
+ */
+export class PythonSocketClient {
+  private readonly connections: PythonSocketConnection[] = [];
+
+  constructor(
+    private readonly socketPath: string = env.pythonSocketPath,
+    private readonly poolSize: number = env.pythonSocketPoolSize,
+    private readonly timeout: number = env.pythonTimeout
+  ) {}
+
+  /**
+   * ソケットモードが有効か
+   */
+  isEnabled(): boolean {
+    return this.socketPath.length > 0;
+  }
+
+  /**
+   * リクエストを送信 (未応答数が最も少ない接続を使用)
+   * @param request リクエストデータ ('name' でインジケーターを指定)
+   * @returns 実行結果
+   */
+  request(request: object): Promise<IndicatorResult> {
+    return this.requestRaw(request).then(decodeResponse);
+  }
+
+  /**
+   * リクエストを送信してペイロードをそのまま返す (圧縮されたレスポンスを展開せずに転送する場合)
+   * @param request リクエストデータ
+   * @returns レスポンスのペイロード
+   */
+  requestRaw(request: object): Promise<Buffer> {
+    return this.acquire().send(request);
+  }
+
+  /**
+   * すべての接続を閉じる
+   */
+  close(): void {
+    for (const connection of this.connections.splice(0)) {
+      connection.close();
+    }
+  }
+
+  private acquire(): PythonSocketConnection {
+    // 切断済みの接続を取り除く
+    for (let i = this.connections.length - 1; i >= 0; i--) {
+      if (this.connections[i].closed) {
+        this.connections.splice(i, 1);
+      }
+    }
+
+    const idle = this.connections.find((connection) => connection.inFlight === 0);
+    if (idle) {
+      return idle;
+    }
+
+    if (this.connections.length < this.poolSize) {
+      const connection = new PythonSocketConnection(this.socketPath, this.timeout);
+      this.connections.push(connection);
+      return connection;
+    }
+
+    return this.connections.reduce((least, connection) =>
+      connection.inFlight < least.inFlight ? connection : least
+    );
+  }
+}
+
+/**
+ * 1リクエストごとに接続して実行
+ * zygoteサーバー (python-indicators/zygote.py) は接続ごとに子プロセスで応答するため、接続を使い回さない
+ * @param socketPath ソケットのパス
+ * @param request リクエストデータ
+ * @param timeout タイムアウト (ミリ秒)
+ * @returns 実行結果
+ */
+export function requestOnce(
+  socketPath: string,
+  request: object,
+  timeout: number = env.pythonTimeout
+): Promise<IndicatorResult> {
+  return requestOnceRaw(socketPath, request, timeout).then(decodeResponse);
+}
+
+/**
+ * 1リクエストごとに接続して実行し、ペイロードをそのまま返す
+ * @param socketPath ソケットのパス
+ * @param request リクエストデータ
+ * @param timeout タイムアウト (ミリ秒)
+ * @returns レスポンスのペイロード
+ */
+export function requestOnceRaw(
+  socketPath: string,
+  request: object,
+  timeout: number = env.pythonTimeout
+): Promise<Buffer> {
+  const connection = new PythonSocketConnection(socketPath, timeout);
+  return connection.send(request).finally(() => connection.close());
+}
+
+/**
+ * ペイロードを展開・解析
+ */
+async function decodeResponse(payload: Buffer): Promise<IndicatorResult> {
+  try {
+    return await decodePythonPayload(payload);
+  } catch {
+    throw new Error('Invalid JSON response from Python');
+  }
+}
+
+// シングルトンインスタンス
+export const pythonSocketClient = new PythonSocketClient();
@@ -34,9 +34,43 @@ export interface Metadata {
  */
 export interface IndicatorRequest {
   name: string;                      // インジケーター名 (例: 'sma', 'ema')
-  candleData: CandleData[];          // ローソク足データ配列
+  candleData: CandleData[];          // ローソク足データ配列 (datasetHandle 指定時は空でよい)
+  datasetHandle?: string;            // 登録済みデータセットのハンドル (常駐サーバー使用時)
   params: Record<string, any>;       // パラメータ (例: { period: 20 })
   metadata?: Metadata;               // メタデータ (オプション)
+  priority?: 'interactive' | 'batch'; // 優先クラス (常駐サーバー使用時、省略時は自動判定)
+  deadlineMs?: number;               // 受信からの期限 (ミリ秒、過ぎたら計算しない)
+  output?: 'series' | 'events';      // 'events' ならクロス等が起きた足だけを返す (macd / bollinger / rsi)
+  fingerprint?: true | ResultFingerprint; // 前回の結果のフィンガープリント (履歴が一致すれば末尾の差分だけを返す)
+  compression?: Array<'zstd' | 'gzip'>; // Pythonに圧縮を許す形式 (優先順、大きな成功レスポンスのみ圧縮される)
+  limits?: {                         // リクエストごとの上限 (Python側の設定値より小さい値のみ有効)
+    maxInputPoints?: number;         // 入力のローソク足の本数
+    maxOutputPoints?: number;        // 推定出力点数 (系列数 × 本数 × (1 + 上位足数))
+  };
+}
+
+/**
+ * 結果のフィンガープリント (レスポンスの metadata.fingerprint)
+ * 次のリクエストの fingerprint に渡すと、履歴が一致する場合は time 以降の点だけが返り
+ * metadata.delta = { since: time } となる (一致しなければ全系列で metadata.delta = false)
+ */
+export interface ResultFingerprint {
+  time: number;                      // 結果の最後の点の UNIX timestamp
+  hash: string;                      // time より前の全系列の点のハッシュ
+}
+
+/**
+ * データセット操作の結果 (登録・追記)
+ */
+export interface DatasetResponse {
+  success: true;
+  datasetHandle: string;             // データセットのハンドル
+  points: number;                    // 保持している本数
+  lastTime: number | null;           // 最後の足の UNIX timestamp
+  version: number;                   // 更新ごとに増えるバージョン
+  prefixIndex: string[];             // 累積和のインデックスを持つ列
+  appended?: number;                 // 追記した本数 (appendCandles)
+  replaced?: number;                 // 置き換えた既存の足の本数 (appendCandles)
 }
 
 // ===== レスポンス型 =====
@@ -49,6 +83,25 @@ export interface IndicatorResult {
   value: number | number[];          // 計算値 (単一またはMultiLine)
 }
 
+/**
+ * シグナルイベント (output: 'events' のレスポンスの events 配列の要素)
+ */
+export interface IndicatorEvent {
+  time: number;                      // イベントが起きた足の UNIX timestamp
+  type: string;                      // 種類 (例: 'bullishCross', 'crossAboveUpper', 'enterOverbought')
+  [field: string]: number | string;  // その足の値 (例: macd, signal, close, upper)
+}
+
+/**
+ * 圧縮されたままのインジケーターレスポンス (成功)
+ * Pythonが圧縮したJSONを展開せずにHTTPレスポンスへ転送する (Content-Encoding: encoding)
+ */
+export interface EncodedIndicatorResponse {
+  success: true;
+  encoding: 'zstd' | 'gzip';         // 圧縮形式
+  body: Buffer;                      // 圧縮されたJSON
+}
+
 /**
  * インジケーターレスポンス (成功)
  */
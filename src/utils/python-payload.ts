@@ -0,0 +1,55 @@
+import zlib from 'zlib';
+import { promisify } from 'util';
+
+/**
+ * Pythonのレスポンスの圧縮形式 (python-indicators/response_compression.py)
+ * リクエストの compression に優先順で指定すると、成功レスポンスが一定の大きさ以上の場合に
+ * 圧縮したバイト列が返る (先頭のマジックナンバーで判別、非圧縮なら '{' で始まるJSON)
+ */
+export type PythonEncoding = 'zstd' | 'gzip';
+
+const gunzip = promisify(zlib.gunzip);
+// zstd は Node 22.15 以降の zlib にのみある
+const zstdDecompress: ((buffer: Buffer) => Promise<Buffer>) | null =
+  typeof (zlib as any).zstdDecompress === 'function' ? promisify((zlib as any).zstdDecompress) : null;
+
+/**
+ * このNodeプロセスで展開できる圧縮形式 (優先順)
+ */
+export function supportedEncodings(): PythonEncoding[] {
+  return zstdDecompress ? ['zstd', 'gzip'] : ['gzip'];
+}
+
+/**
+ * 圧縮形式を判別
+ * @param payload Pythonのレスポンス
+ * @returns 圧縮形式 (非圧縮なら null)
+ */
+export function detectEncoding(payload: Buffer): PythonEncoding | null {
+  if (payload.length >= 4 && payload.readUInt32BE(0) === 0x28b52ffd) {
+    return 'zstd';
+  }
+  if (payload.length >= 2 && payload[0] === 0x1f && payload[1] === 0x8b) {
+    return 'gzip';
+  }
+  return null;
+}
+
+/**
+ * Pythonのレスポンスを展開してJSONとして解析
+ * @param payload Pythonのレスポンス (圧縮または非圧縮)
+ * @returns 解析結果
+ */
+export async function decodePythonPayload(payload: Buffer): Promise<any> {
+  const encoding = detectEncoding(payload);
+  let json = payload;
+  if (encoding === 'gzip') {
+    json = await gunzip(payload);
+  } else if (encoding === 'zstd') {
+    if (!zstdDecompress) {
+      throw new Error('zstd response requires Node.js with zlib zstd support');
+    }
+    json = await zstdDecompress(payload);
+  }
+  return JSON.parse(json.toString('utf-8'));
+}